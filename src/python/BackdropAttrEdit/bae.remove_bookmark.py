@@ -1,7 +1,7 @@
 """
-version=2
+version=3
 author=Liam Collod
-last_modified=22/03/2022
+last_modified=19/10/2026
 python=>2.7.1
 
 From the selected nodes, if it's a Backdrop, set the hideAsBookmark attribute
@@ -11,6 +11,8 @@ as true so the node doesn't appear in bookmarks.
 - Select all the backdropes nodes
     (you can also select other node types they will be filtered out)
 - run script in Python Tab
+    (the lxmcommon package must be importable: ``src/python`` on the
+    PYTHONPATH)
 
 [LICENSE]
 
@@ -32,6 +34,9 @@ limitations under the License.
 
 import NodegraphAPI
 
+# group the edits in a single undo entry and count them. see lxmcommon/
+from lxmcommon import transaction
+
 
 def bd_remove_bookmark(bdnode):
     """
@@ -52,12 +57,17 @@ def run():
 
     sel = NodegraphAPI.GetAllSelectedNodes()
     # remove nodes that are not Backdrops
-    sel = filter(lambda knode: knode.getType() == "Backdrop", sel)
+    sel = [knode for knode in sel if knode.getType() == "Backdrop"]
 
-    for node in sel:
-        bd_remove_bookmark(node)
+    with transaction.BulkEdit("[BackdropAttrEdit] Remove bookmark") as bulk:
+        for node in sel:
+            bd_remove_bookmark(node)
+            bulk.edit("node", node.getName())
 
-    print("[remove_bookmark][run] Finished.\n{} nodes processed.".format(sel))
+    print(
+        "[remove_bookmark][run] Finished.\n{} nodes processed."
+        "".format(bulk.count)
+    )
     return
 
 
@@ -1,17 +1,21 @@
 """
-VERSION = 0.0.6
+VERSION = 0.0.7
 
 Author: Liam Collod
-Last modified: 07/01/2022
+Last modified: 19/10/2026
 
 Script for Foundry's Katana software.
 Add global graph state variable based on a dictionnary.
 
 [HowTo]
 Modify the GGSV_DICT to add/delete gsvs, then run the script.
+The lxmcommon package must be importable (``src/python`` on the PYTHONPATH).
 """
 import NodegraphAPI
 
+# group the edits in a single undo entry and count them. see lxmcommon/
+from lxmcommon import transaction
+
 
 # each key is the gsv name, the value its the list of value the gsv can take.
 GGSV_DICT = {
@@ -21,13 +25,17 @@ GGSV_DICT = {
 
 
 def setup_gsvs():
-
-    for gsv_name, gsv_data in GGSV_DICT.items():
-        create_gsv(name=gsv_name, value_list=gsv_data)
+    """
+    Create the gsvs of GGSV_DICT in a single undo entry.
+    """
+    with transaction.BulkEdit("[CreateGSV] Setup gsvs") as bulk:
+        for gsv_name, gsv_data in GGSV_DICT.items():
+            create_gsv(name=gsv_name, value_list=gsv_data)
+            bulk.edit("gsv", gsv_name)
 
     print(
         "[CreateGSV][setup_gsvs] Finished, {} gsv added."
-        "".format(len(GGSV_DICT))
+        "".format(bulk.count)
     )
     return
 
@@ -58,7 +66,7 @@ def create_gsv(name, value_list):
     )
     for option_param, option_value in zip(new_gsv_param.getChildren(), value_list):
         option_param.setValue(option_value, 0)
-    
+
     print(
         "[CreateGSV][create_gsv] Gsv <{}> created with values <{}>."
         "".format(name, value_list)
@@ -1,14 +1,30 @@
 """
-version=4
+version=17
 author=Liam Collod
-last_modified=11/04/2022
+last_modified=19/10/2026
 python=>2.7.1
 """
+import bisect
+import fnmatch
+import hashlib
+import itertools
 import json
 import logging
+import marshal
+import math
+import multiprocessing
 import os
 import re
 import sys
+import tempfile
+import time
+import traceback
+from collections import OrderedDict, namedtuple
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
 
 
 # only for documentation. (keep compatibility with py2)
@@ -27,16 +43,44 @@ try:
 except ImportError:
     pass
 
+# group the graph edits in a single undo entry. see lxmcommon/
+from lxmcommon import transaction
+
+# lazy and structured logging. see lxmcommon/
+from lxmcommon.tracing import Tracer, get_env_level
+
 __all__ = [
     "GafferDict",
     "GafferChildrenDict",
     "TokenDict",
-    "D2gtGaffer"
+    "TokenBaker",
+    "TokenUnbaker",
+    "TokenResolver",
+    "LinkingRules",
+    "BuildPlan",
+    "D2gtGaffer",
+    "gaffer_export",
+    "load_gafferdict",
+    "write_gafferdict_stream",
+    "batch_prepare",
+    "batch_build"
 ]
 
 __PY3 = sys.version_info[0] == 3
 if __PY3:
     basestring = str
+    __replace = os.replace
+else:
+    FileNotFoundError = IOError
+
+    def __replace(src, dst):
+        # os.rename() can't overwrite on Windows
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+# increment when the cached GafferDict format changes
+__CACHE_VERSION = 2
 
 
 def setup_logging(level):
@@ -61,7 +105,9 @@ def setup_logging(level):
     return logger
 
 
-logger = setup_logging(logging.DEBUG)
+# ex: D2GT_LOG_LEVEL=DEBUG to log each package created
+logger = setup_logging(get_env_level("D2GT_LOG_LEVEL"))
+tracer = Tracer(logger)
 
 
 class BaseD2gtDict(dict):
@@ -125,7 +171,9 @@ class GafferDict(BaseD2gtDict):
     """
     Args:
         build_object(str or dict):
-        tokendict(TokenDict):
+        tokendict(TokenDict or None):
+            None if the children tokens are already baked (ex: from cache),
+            they are then only converted when accessed.
     """
     filecheck = "d2gt_gaffer"
 
@@ -135,15 +183,53 @@ class GafferDict(BaseD2gtDict):
 
     def _build(self, tokendict):
 
-        children = self.get("children")
-        for childname, childdata in children.items():
+        if tokendict is None:
+            self["children"] = GafferChildren(self.get("children"))
+            return
 
-            child = dict_bake_tokens(
-                sourcedict=childdata,
-                tokendict=tokendict
-            )
-            child = GafferChildrenDict(build_object=child, name=childname)
-            children[childname] = child
+        # a single baker so its cache is shared across all the children
+        baker = TokenBaker(tokendict)
+
+        # templates are baked once and shared by all the children using them
+        templates = dict(
+            (name, baker.bake(template))
+            for name, template in self.get("templates", {}).items()
+        )
+
+        children = GafferChildren()
+        for childname, childdata in self.get("children").items():
+
+            childdata = baker.bake(childdata)
+
+            if "template" not in childdata and "generate" not in childdata:
+                children.add(
+                    childname,
+                    GafferChildrenDict(build_object=childdata, name=childname)
+                )
+                continue
+
+            template = None
+            if "template" in childdata:
+                template = templates.get(childdata["template"])
+                if template is None:
+                    raise ValueError(
+                        "[GafferDict][_build] Template <{}> used by <{}> not "
+                        "found in templates.".format(childdata["template"], childname)
+                    )
+
+            entry = GafferChildrenEntry(childdata, template)
+            # children are only built when accessed
+            for name, variables in entry.iter_names(childname):
+                children.add(name, (entry, variables))
+
+            continue
+
+        self["children"] = children
+
+        if "linking" in self:
+            self["linking"] = baker.bake(self["linking"])
+            # the linking params of children not built yet are set on access
+            LinkingRules(self["linking"], children.iter_heads()).apply(children)
 
         return
 
@@ -170,6 +256,589 @@ class GafferDict(BaseD2gtDict):
         """
         return self.get("children")
 
+    def to_dict(self):
+        """
+        Returns:
+            dict:
+                copy of self made only of builtin types, with every child
+                built, so it can be serialized to json.
+        """
+        output = dict(self)
+        output["children"] = self.children.to_dict()
+        return output
+
+
+# name, path and class of a child, known without building it
+GafferChildHead = namedtuple("GafferChildHead", ("name", "path", "class_"))
+
+
+class GafferChildren(dict):
+    """
+    The ``children`` of a GafferDict as {name: GafferChildrenDict}.
+
+    Values that are not a GafferChildrenDict yet (a dict or a
+    (GafferChildrenEntry, variables) tuple) are only converted when first
+    accessed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(GafferChildren, self).__init__(*args, **kwargs)
+        # {name: {param path: value}} to set on children when built
+        self._pending_params = dict()
+
+    def __getitem__(self, name):
+
+        child = super(GafferChildren, self).__getitem__(name)
+        if isinstance(child, GafferChildrenDict):
+            return child
+
+        if isinstance(child, tuple):
+            entry, variables = child
+            child = entry.build(name, variables)
+        else:
+            child = GafferChildrenDict(child, name)
+
+        params = self._pending_params.pop(name, None)
+        if params:
+            child.setdefault("params", dict()).update(params)
+
+        super(GafferChildren, self).__setitem__(name, child)
+        return child
+
+    def add(self, name, child):
+        """
+        Args:
+            name(str):
+            child(GafferChildrenDict or tuple):
+
+        Raises:
+            ValueError: if a child with the same name already exists.
+        """
+        if name in self:
+            raise ValueError(
+                "[GafferChildren][add] Package name <{}> is already used."
+                "".format(name)
+            )
+        super(GafferChildren, self).__setitem__(name, child)
+        return
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+    def iter_heads(self):
+        """
+        Returns:
+            generator[GafferChildHead]:
+                name, path and class of each child, without building the
+                children generated by a GafferChildrenEntry.
+        """
+        for name in self:
+            child = super(GafferChildren, self).__getitem__(name)
+            if isinstance(child, tuple):
+                entry, variables = child
+                yield entry.get_head(name, variables)
+            else:
+                child = self[name]
+                yield GafferChildHead(child.name, child.path, child.class_)
+        return
+
+    def set_param(self, name, param_path, param_value):
+        """
+        Set a param on a child, delayed until it is built if it isn't yet.
+
+        Args:
+            name(str):
+            param_path(str):
+            param_value(any):
+        """
+        child = super(GafferChildren, self).__getitem__(name)
+        if isinstance(child, GafferChildrenDict):
+            child.setdefault("params", dict())[param_path] = param_value
+        else:
+            self._pending_params.setdefault(name, dict())[param_path] = param_value
+        return
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: {name: child as builtin types}, every child is built.
+        """
+        return dict((name, child.to_dict()) for name, child in self.items())
+
+
+class LayeredParams(MutableMapping):
+    """
+    Params looked up in multiple dicts, the first layer having the param wins.
+    Only the first layer is ever modified so the other ones can be shared
+    between children (copy-on-write).
+
+    Iteration order is the order of the last layer, then the params only
+    found in the previous layers.
+
+    Args:
+        *layers(dict):
+    """
+
+    def __init__(self, *layers):
+        self.layers = list(layers)
+
+    def __repr__(self):
+        return "LayeredParams({})".format(dict(self))
+
+    def __getitem__(self, key):
+        for layer in self.layers:
+            if key in layer:
+                return layer[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return any(key in layer for layer in self.layers)
+
+    def __setitem__(self, key, value):
+        self.layers[0][key] = value
+
+    def __delitem__(self, key):
+        # params from the shared layers can't be removed
+        del self.layers[0][key]
+
+    def __iter__(self):
+        seen = set()
+        for layer in reversed(self.layers):
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return len(set().union(*self.layers))
+
+    def copy(self):
+        """
+        Returns:
+            dict:
+        """
+        return dict(self.items())
+
+
+class LinkingRules(object):
+    """
+    Compile the ``linking`` key of a GafferDict, rules linking light groups
+    to geometry collections, into a CEL param per light package.
+
+    Lights linked to the same collections share the same CEL, built once
+    with duplicated paths and paths under another path removed.
+
+    Args:
+        linking(dict): baked ``linking`` value of the GafferDict
+        packages(iterable of GafferChildrenDict or GafferChildHead):
+    """
+
+    def __init__(self, linking, packages):
+
+        self.groups = linking.get("lights", {})
+        self.collections = linking.get("collections", {})
+        self.rules = linking.get("rules", [])
+
+        self.packages = dict((package.path, package) for package in packages)
+
+        # index of all the locations, including the ones created as default
+        # rigs, sorted to find descendants by bisection
+        locations = set(self.packages)
+        for path in self.packages:
+            location = path.rsplit("/", 1)[0]
+            while location and location not in locations:
+                locations.add(location)
+                location = location.rsplit("/", 1)[0]
+        self.locations = locations
+        self.paths = sorted(locations)
+        self.names = dict(
+            (package.name, path) for path, package in self.packages.items()
+        )
+
+        self._groups_cache = dict()
+        self._cel_cache = dict()
+        return
+
+    def resolve_group(self, group_name):
+        """
+        Args:
+            group_name(str): key of ``lights``
+
+        Raises:
+            ValueError: if the group doesn't exist.
+
+        Returns:
+            list of str:
+                paths of the light packages matching the group patterns
+                or under a package matching them.
+        """
+        lights = self._groups_cache.get(group_name)
+        if lights is not None:
+            return lights
+
+        patterns = self.groups.get(group_name)
+        if patterns is None:
+            raise ValueError(
+                "[LinkingRules][resolve_group] Light group <{}> not found."
+                "".format(group_name)
+            )
+        if isinstance(patterns, basestring):
+            patterns = [patterns]
+
+        matched = set()
+        wildcards = list()
+        for pattern in patterns:
+            if any(char in pattern for char in "*?["):
+                wildcards.append(fnmatch.translate(pattern))
+            elif pattern in self.locations:
+                matched.add(pattern)
+            elif pattern in self.names:
+                matched.add(self.names[pattern])
+
+        if wildcards:
+            regex = re.compile("|".join(wildcards))
+            matched.update(path for path in self.paths if regex.match(path))
+
+        lights = set()
+        for path in matched:
+            # descendants are contiguous as "0" follows "/"
+            start = bisect.bisect_left(self.paths, path + "/")
+            end = bisect.bisect_left(self.paths, path + "0")
+            lights.add(path)
+            lights.update(self.paths[start:end])
+
+        lights = sorted(
+            path for path in lights
+            if path in self.packages
+            and self.packages[path].class_ != DefaultRigPkg.class_
+        )
+        self._groups_cache[group_name] = lights
+        return lights
+
+    def get_cel(self, collection_names):
+        """
+        Args:
+            collection_names(frozenset of str): keys of ``collections``
+
+        Raises:
+            ValueError: if a collection doesn't exist.
+
+        Returns:
+            str: CEL of all the collections paths.
+        """
+        cel = self._cel_cache.get(collection_names)
+        if cel is not None:
+            return cel
+
+        cel_paths = set()
+        for collection_name in collection_names:
+            collection = self.collections.get(collection_name)
+            if collection is None:
+                raise ValueError(
+                    "[LinkingRules][get_cel] Collection <{}> not found."
+                    "".format(collection_name)
+                )
+            if isinstance(collection, basestring):
+                collection = [collection]
+            cel_paths.update(collection)
+
+        patterns = list()
+        kept = list()
+        # sorted with a trailing "/" so a path is directly followed by the
+        # paths under it (else "/a/b-x" sorts between "/a/b" and "/a/b/c")
+        for cel_path in sorted(cel_paths, key=lambda path: path + "/"):
+            if any(char in cel_path for char in "*?()$"):
+                patterns.append(cel_path)
+            # linking is inherited so a path under a kept path is not needed
+            elif not kept or not cel_path.startswith(kept[-1] + "/"):
+                kept.append(cel_path)
+
+        cel = " ".join(patterns + kept)
+        self._cel_cache[collection_names] = cel
+        return cel
+
+    def compile(self):
+        """
+        Raises:
+            ValueError: if a rule use a group or collection that doesn't exist.
+
+        Returns:
+            dict: {(light package path, param path): CEL}
+        """
+        # rules applied to each light param as a bit mask of their index
+        masks = dict()
+        for index, rule in enumerate(self.rules):
+
+            param_path = rule.get("param")
+            if not param_path:
+                param_path = LinkingParams[rule.get("target", "linking")]
+
+            group_names = rule.get("lights", [])
+            if isinstance(group_names, basestring):
+                group_names = [group_names]
+
+            for group_name in group_names:
+                for path in self.resolve_group(group_name):
+                    key = (path, param_path)
+                    masks[key] = masks.get(key, 0) | (1 << index)
+
+            continue
+
+        # lights with the same rules share the same CEL
+        mask_cels = dict()
+        output = dict()
+        for key, mask in masks.items():
+
+            cel = mask_cels.get(mask)
+            if cel is None:
+                collection_names = set()
+                for index, rule in enumerate(self.rules):
+                    if not mask & (1 << index):
+                        continue
+                    names = rule.get("collections", [])
+                    if isinstance(names, basestring):
+                        names = [names]
+                    collection_names.update(names)
+                cel = self.get_cel(frozenset(collection_names))
+                mask_cels[mask] = cel
+
+            output[key] = cel
+            continue
+
+        return output
+
+    def apply(self, children=None):
+        """
+        Set the compiled CEL params on the packages, overriding the existing
+        value.
+
+        Args:
+            children(GafferChildren or None):
+                set the params through it, so the children not built yet are
+                only built when accessed. Required if the packages given are
+                GafferChildHead.
+
+        Returns:
+            int: number of params set.
+        """
+        compiled = self.compile()
+        for (path, param_path), cel in compiled.items():
+            package = self.packages[path]
+            if children is None:
+                package.setdefault("params", dict())[param_path] = cel
+            else:
+                children.set_param(package.name, param_path, cel)
+        return len(compiled)
+
+
+class GafferChildrenEntry(object):
+    """
+    A ``children`` value using a template and/or generating multiple
+    children. Shared by all the children it generates : their params that
+    don't use a variable are shared with the entry and the template.
+
+    Args:
+        entrydata(dict): baked ``children`` value
+        template(dict or None): baked template used by the entry
+    """
+
+    def __init__(self, entrydata, template=None):
+
+        self.template = template or dict()
+        self.data = dict(
+            (key, value) for key, value in entrydata.items()
+            if key not in ("template", "generate", "params")
+        )
+        self.variables = self.get_variables(entrydata.get("generate"))
+
+        self.regex = None
+        if self.variables:
+            self.regex = re.compile(
+                r"\{(" + "|".join(map(re.escape, self.variables[0])) + r")\}"
+            )
+
+        # params using a variable are substituted per child
+        self.params = dict()
+        self.params_variable = dict()
+        for param_path, param_value in entrydata.get("params", {}).items():
+            if self._has_variable(param_path) or self._has_variable(param_value):
+                self.params_variable[param_path] = param_value
+            else:
+                self.params[param_path] = param_value
+
+        return
+
+    @staticmethod
+    def get_variables(generate):
+        """
+        Args:
+            generate(dict or None):
+                {"mode": "product" or "zip", "vars": {name: list or {"range": [start, stop, step]}}}
+
+        Raises:
+            ValueError: if <generate> is invalid (ex: a range step of 0).
+
+        Returns:
+            tuple[list of str, list of tuple] or None:
+                variables names, and a tuple of their values per child.
+        """
+        if not generate:
+            return None
+
+        names = list()
+        values = list()
+        for name, value in generate.get("vars", {}).items():
+
+            if isinstance(value, dict) and "range" in value:
+                start, stop, step = (list(value["range"]) + [1])[:3]
+                if not step:
+                    raise ValueError(
+                        "[GafferChildrenEntry][get_variables] Variable <{}> "
+                        "range step can't be 0.".format(name)
+                    )
+                count = int(math.ceil((stop - start) / float(step)))
+                value = [start + index * step for index in range(max(count, 0))]
+
+            if not isinstance(value, list):
+                raise ValueError(
+                    "[GafferChildrenEntry][get_variables] Variable <{}> must "
+                    "be a list or a range, got <{}>.".format(name, value)
+                )
+
+            names.append(name)
+            values.append(value)
+            continue
+
+        mode = generate.get("mode", "product")
+        if mode == "product":
+            combinations = list(itertools.product(*values))
+        elif mode == "zip":
+            if len(set(map(len, values))) > 1:
+                raise ValueError(
+                    "[GafferChildrenEntry][get_variables] Variables <{}> must "
+                    "have the same length in zip mode.".format(names)
+                )
+            combinations = list(zip(*values))
+        else:
+            raise ValueError(
+                "[GafferChildrenEntry][get_variables] Unsupported mode <{}>."
+                "".format(mode)
+            )
+
+        return names, combinations
+
+    def _has_variable(self, source):
+        return bool(
+            self.regex and isinstance(source, basestring)
+            and self.regex.search(source)
+        )
+
+    def substitute(self, source, variables):
+        """
+        Replace the ``{variable}`` in the string. Other braces are untouched.
+
+        Args:
+            source(any): non-string are returned as is.
+            variables(dict): {variable name: value}
+
+        Returns:
+            any:
+                <source> with the variables replaced. If <source> is only a
+                variable, the variable value is returned with its type.
+        """
+        if not self._has_variable(source):
+            return source
+
+        match = self.regex.match(source)
+        if match and match.end() == len(source):
+            return variables[match.group(1)]
+
+        return self.regex.sub(
+            lambda match: str(variables[match.group(1)]),
+            source
+        )
+
+    def iter_names(self, name):
+        """
+        Args:
+            name(str): key of the entry in ``children``
+
+        Returns:
+            generator[tuple[str, dict or None]]:
+                name and variables of each child to build.
+        """
+        if not self.variables:
+            yield name, None
+            return
+
+        names, combinations = self.variables
+        for combination in combinations:
+            variables = dict(zip(names, combination))
+            yield self.substitute(name, variables), variables
+
+        return
+
+    def get_head(self, name, variables=None):
+        """
+        Args:
+            name(str):
+            variables(dict or None): {variable name: value}
+
+        Returns:
+            GafferChildHead: of the child <build> would return.
+        """
+        heads = dict()
+        for key in ("parent", "class"):
+            if key in self.data:
+                heads[key] = self.substitute(self.data[key], variables)
+            else:
+                heads[key] = self.template.get(key, "")
+
+        path = str(heads["parent"]).rstrip("/") + "/" + name
+        return GafferChildHead(name, path, str(heads["class"]))
+
+    def build(self, name, variables=None):
+        """
+        Args:
+            name(str):
+            variables(dict or None): {variable name: value}
+
+        Returns:
+            GafferChildrenDict:
+        """
+        childdata = dict(
+            (key, value) for key, value in self.template.items()
+            if key != "params"
+        )
+        for key, value in self.data.items():
+            childdata[key] = self.substitute(value, variables)
+
+        params = dict()
+        for param_path, param_value in self.params_variable.items():
+            param_path = self.substitute(param_path, variables)
+            params[param_path] = self.substitute(param_value, variables)
+
+        childdata["params"] = LayeredParams(
+            params,
+            self.params,
+            self.template.get("params", {})
+        )
+        return GafferChildrenDict(childdata, name)
+
 
 class GafferChildrenDict(BaseD2gtDict):
     """
@@ -218,12 +887,12 @@ class GafferChildrenDict(BaseD2gtDict):
     def location(self):
         """
         CEL like path relative to the GafferThree CEL indicating where
-        self should be located.
+        self should be located. Root is always returned as "".
 
         Returns:
             str:
         """
-        return str(self.get("parent", ""))
+        return str(self.get("parent", "")).rstrip("/")
 
     @property
     def path(self):
@@ -262,66 +931,659 @@ class GafferChildrenDict(BaseD2gtDict):
         The params key that hold a pair of param_path:param_value
 
         Returns:
-            dict:
+            dict or LayeredParams:
         """
         return self.get("params", {})
 
+    def to_dict(self):
+        """
+        Returns:
+            dict: copy of self made only of builtin types.
+        """
+        output = dict(self)
+        if "params" in output:
+            output["params"] = dict(self.params.items())
+        return output
+
 
 class TokenDict(BaseD2gtDict):
     filecheck = "d2gt_token"
 
 
-DefaultRigPkg = GafferChildrenDict(
-    {"class": "RigPackage"},
-    name="rig"
-)
-
-
-class D2gtGaffer(object):
+class TokenBaker(object):
     """
-    A GafferThree node
+    Replace tokens by their value from a TokenDict in strings, and in the keys
+    and values of any nested dict/list structure.
 
-    Args:
-        gafferdict(GafferDict):
+    The token pattern is compiled once and each token is substituted in a
+    single pass over the string. Baked strings are cached as most of them
+    (param paths, class names) repeat across packages.
 
-    Attributes:
-        gd(GafferDict): gaffer to create as a dict object
-        packages(dict):
-            exemple:
-            {
-                "/rigA": PackageSuperToolAPI.Packages.GroupPackage,
-                "/rigA/corridor": ...,
-                "/rigA/corridor/top": ...,
-                "/artistic/keys": ...,
-                "/artistic": ...
-            }
-        node(NodegraphAPI.Node): GafferThree node created
+    Args:
+        tokendict(TokenDict):
+        cache_size(int or None):
+            maximum number of baked strings cached, the cache is cleared when
+            reached. Unlimited if None.
     """
 
-    def __init__(self, gafferdict):
-
-        self.gd = gafferdict
-        self.node = None  # type: NodegraphAPI.Node
-        self.packages = dict()
+    regex = re.compile(r"<([a-zA-Z0-9_]+)>")
 
-        return
+    def __init__(self, tokendict, cache_size=None):
+        self.tokendict = tokendict
+        self.cache_size = cache_size
+        self._cache = dict()
 
-    def get_package_at(self, path):
+    def bake_string(self, source):
         """
-
         Args:
-            path(str):
+            source(str): string with potential tokens.
+
+        Raises:
+            ValueError: if a token is not found in the TokenDict.
 
         Returns:
-            PackageSuperToolAPI.Packages.GroupPackage
+            str: <source> with the tokens baked
         """
-        if path == "" or path == "/":
-            return self.node.getRootPackage()  # type: PackageSuperToolAPI.Packages.RootPackage
 
-        # check first if the path is not already created
-        pkg = self.packages.get(path)  # type: PackageSuperToolAPI.Packages.GroupPackage
-        if pkg:
-            return pkg
+        baked = self._cache.get(source)
+        if baked is not None:
+            return baked
+
+        if "<" not in source:
+            baked = source
+        else:
+
+            def replace(match):
+                value = self.tokendict.get(match.group(1))
+                if value is None:
+                    raise ValueError(
+                        "[TokenBaker][bake_string] token <{}> for <{}> not "
+                        "found in token dict.".format(match.group(1), source)
+                    )
+                return str(value)
+
+            baked = self.regex.sub(replace, source)
+
+        if self.cache_size and len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[source] = baked
+        return baked
+
+    def bake(self, source):
+        """
+        Args:
+            source(any): object to bake, dict and list are processed recursively.
+
+        Returns:
+            any: new object with the tokens baked, <source> is not modified.
+        """
+
+        if isinstance(source, basestring):
+            return self.bake_string(source)
+
+        if isinstance(source, dict):
+            return dict(
+                (self.bake(key), self.bake(value))
+                for key, value in source.items()
+            )
+
+        if isinstance(source, (list, tuple)):
+            return [self.bake(value) for value in source]
+
+        return source
+
+
+class TokenResolver(object):
+    """
+    Merge multiple TokenDict layers (ex: render-engine, show, sequence) in a
+    single TokenDict where token values can use other tokens.
+
+    Each token is only resolved once, so resolving is linear in the total
+    number of tokens.
+
+    Args:
+        *layers(TokenDict or str):
+            TokenDict or path to a .json TokenDict, from the lowest to the
+            highest precedence.
+    """
+
+    def __init__(self, *layers):
+        self.layers = [
+            layer if isinstance(layer, TokenDict) else TokenDict(layer)
+            for layer in layers
+        ]
+        self._resolved = None  # type: Optional[TokenDict]
+
+    def resolve(self):
+        """
+        Raises:
+            ValueError: if a token is not found or tokens refer to each other.
+
+        Returns:
+            TokenDict: merged tokens with all their nested tokens baked.
+        """
+        if self._resolved is not None:
+            return self._resolved
+
+        tokens = dict()
+        for layer in self.layers:
+            tokens.update(layer)
+        tokens.pop("__type", None)
+
+        resolved = dict()
+
+        for name in tokens:
+
+            if name in resolved:
+                continue
+
+            # depth first, iterative to support long chains of tokens
+            stack = [name]
+            resolving = set(stack)
+            while stack:
+
+                current = stack[-1]
+                value = tokens[current]
+                if not isinstance(value, basestring) or "<" not in value:
+                    resolved[current] = value
+                    resolving.discard(stack.pop())
+                    continue
+
+                pending = None
+                for ref in TokenBaker.regex.findall(value):
+                    if ref in resolved:
+                        continue
+                    if ref not in tokens:
+                        raise ValueError(
+                            "[TokenResolver][resolve] token <{}> used by <{}> "
+                            "not found in token dicts.".format(ref, current)
+                        )
+                    if ref in resolving:
+                        cycle = stack[stack.index(ref):] + [ref]
+                        raise ValueError(
+                            "[TokenResolver][resolve] tokens refer to each "
+                            "other: {}".format(" -> ".join(cycle))
+                        )
+                    pending = ref
+                    break
+
+                if pending:
+                    stack.append(pending)
+                    resolving.add(pending)
+                    continue
+
+                resolved[current] = TokenBaker.regex.sub(
+                    lambda match: str(resolved[match.group(1)]),
+                    value
+                )
+                resolving.discard(stack.pop())
+                continue
+
+            continue
+
+        resolved["__type"] = TokenDict.filecheck
+        self._resolved = TokenDict(resolved)
+        return self._resolved
+
+
+class TokenUnbaker(object):
+    """
+    Reverse of TokenBaker: replace the values from a TokenDict by their token
+    in strings, and in the keys and values of any nested dict/list structure.
+
+    Only string values are used as numbers would match anywhere. Values are
+    matched longest first in a single pass, when multiple tokens share the
+    same value the first one in the TokenDict is used.
+
+    A value is only matched as a whole word: a value starting (ending) with a
+    letter, digit or ``_`` can't be preceded (followed) by one. So a token of
+    value ``1`` replace ``/lights/1`` but not ``10`` or ``v012``, a token of
+    value ``shaders.spot`` replace ``shaders.spot.exposure`` but not
+    ``shaders.spotlight``.
+
+    Args:
+        tokendict(TokenDict):
+    """
+
+    def __init__(self, tokendict):
+
+        self.tokens = OrderedDict()  # type: dict  # {value: token}
+        for token, value in tokendict.items():
+            if token == "__type" or not isinstance(value, basestring) or not value:
+                continue
+            self.tokens.setdefault(value, token)
+
+        values = sorted(self.tokens, key=len, reverse=True)
+        self.regex = None
+        if values:
+            self.regex = re.compile("|".join(map(self._get_pattern, values)))
+
+        self._cache = dict()
+        return
+
+    @staticmethod
+    def _get_pattern(value):
+        """
+        Args:
+            value(str): token value
+
+        Returns:
+            str: regex pattern only matching <value> as a whole word.
+        """
+        pattern = re.escape(value)
+        if re.match(r"\w", value[0]):
+            pattern = r"(?<!\w)" + pattern
+        if re.match(r"\w", value[-1]):
+            pattern = pattern + r"(?!\w)"
+        return pattern
+
+    def unbake_string(self, source):
+        """
+        Args:
+            source(str): string with potential token values.
+
+        Returns:
+            str: <source> with the token values replaced by their token
+        """
+
+        unbaked = self._cache.get(source)
+        if unbaked is not None:
+            return unbaked
+
+        if self.regex is None:
+            unbaked = source
+        else:
+            unbaked = self.regex.sub(
+                lambda match: "<{}>".format(self.tokens[match.group(0)]),
+                source
+            )
+
+        self._cache[source] = unbaked
+        return unbaked
+
+    def unbake(self, source):
+        """
+        Args:
+            source(any): object to unbake, dict and list are processed recursively.
+
+        Returns:
+            any: new object with the tokens restored, <source> is not modified.
+        """
+
+        if isinstance(source, basestring):
+            return self.unbake_string(source)
+
+        if isinstance(source, dict):
+            return OrderedDict(
+                (self.unbake(key), self.unbake(value))
+                for key, value in source.items()
+            )
+
+        if isinstance(source, (list, tuple)):
+            return [self.unbake(value) for value in source]
+
+        return source
+
+
+DefaultRigPkg = GafferChildrenDict(
+    {"class": "RigPackage"},
+    name="rig"
+)
+
+# param path root: Package method returning the node holding the param
+PackageNodes = {
+    "create": "getCreateNode",
+    "material": "getMaterialNode",
+    "shadowlinking": "getShadowLinkingNode",
+    "linking": "getLinkingNodes",
+    "orientconstraint": "getOrientConstraintNode",
+    "pointconstraint": "getPointConstraintNode",
+}
+
+# maximum number of strings cached by the TokenBaker of a streamed build
+StreamCacheSize = 10000
+# maximum number of param path sets whose grouped plans are cached
+GroupedPlansCacheSize = 1024
+
+# linking rule target: param path the CEL is set on
+LinkingParams = {
+    "linking": "linking.objects",
+    "shadowlinking": "shadowlinking.objects",
+}
+
+# param path root: parameters groups read by gaffer_export, "" is the whole node
+ExportParams = {
+    "create": ["transform"],
+    "material": ["shaders"],
+    "shadowlinking": [""],
+    "linking": [""],
+    "orientconstraint": [""],
+    "pointconstraint": [""],
+}
+
+# param path root: {param path pattern: default value} of the params that
+# gaffer_export skip when they have their default value. Patterns use
+# fnmatch syntax and are matched on the path without the root.
+ExportDefaults = {
+    "create": {
+        "transform.translate.*": 0,
+        "transform.rotate.*": 0,
+        "transform.scale.*": 1,
+    },
+    "shadowlinking": {"*": ""},
+    "linking": {"*": ""},
+    "orientconstraint": {"*": ""},
+    "pointconstraint": {"*": ""},
+}
+
+# string parameter created on the GafferThree node to record the json
+# {package path: [param path, ...]} set by the last build or sync, so the next
+# sync can reset the params removed from the GafferDict.
+ParamsRecordName = "d2gtParams"
+
+
+class ParamPlan(object):
+    """
+    How to set a param path on a package : which node to get, which
+    parameter path on it and how to convert the value.
+
+    The value conversion is learned the first time the parameter refuse
+    the value type.
+
+    Args:
+        param_path(str): ex: material.shaders.arnoldLightParams.exposure.value
+
+    Raises:
+        RuntimeError: if the param_path root is not supported.
+    """
+
+    __slots__ = ("path", "root", "method", "name", "coerce")
+
+    def __init__(self, param_path):
+
+        param_root, param_name = param_path.split(".", 1)
+
+        self.path = param_path
+        # safe format param_root
+        self.root = param_root.lower()
+        self.method = PackageNodes.get(self.root)
+        self.name = param_name
+        self.coerce = None
+
+        if self.method is None:
+            raise RuntimeError(
+                "The parameter <{}> root <{}> is not supported."
+                "".format(param_name, param_root)
+            )
+
+        return
+
+    @property
+    def depth(self):
+        return self.name.count(".")
+
+    def is_set(self, param, param_value):
+        """
+        Args:
+            param(NodegraphAPI.Parameter):
+            param_value(any):
+
+        Returns:
+            bool: True if the parameter already has the given value.
+        """
+        current = param.getValue(0)
+        if current == param_value:
+            return True
+        if isinstance(current, basestring):
+            return current == str(param_value)
+        return False
+
+    def set_value(self, param, param_value):
+        """
+        Args:
+            param(NodegraphAPI.Parameter):
+            param_value(any):
+        """
+        if self.coerce is not None:
+            param.setValue(self.coerce(param_value), 0)
+            return
+
+        try:
+            param.setValue(param_value, 0)
+        except TypeError as excp:
+            if "needs a string" not in excp.args[0]:
+                raise
+            self.coerce = str
+            param.setValue(str(param_value), 0)
+
+        return
+
+
+class ParamPlans(dict):
+    """
+    Cache of ParamPlan per package class and param path.
+
+    ``{(package class, param path): ParamPlan}``
+
+    Args:
+        cache_size(int or None):
+            maximum number of param path sets whose grouped plans are kept,
+            the least recently used are removed first. Default to
+            ``GroupedPlansCacheSize``, 0 for unlimited.
+    """
+
+    def __init__(self, cache_size=None):
+        super(ParamPlans, self).__init__()
+        self.cache_size = (
+            GroupedPlansCacheSize if cache_size is None else cache_size
+        )
+        # {(package class, tuple of param paths): list of (param root, list of ParamPlan)}
+        # ordered from the least to the most recently used.
+        self._grouped = OrderedDict()
+
+    def get_plan(self, package_class, param_path):
+        """
+        Args:
+            package_class(str or None):
+            param_path(str):
+
+        Returns:
+            ParamPlan:
+        """
+        key = (package_class, param_path)
+        plan = self.get(key)
+        if plan is None:
+            plan = ParamPlan(param_path)
+            self[key] = plan
+        return plan
+
+    def get_grouped(self, package_class, params):
+        """
+        Group the plans of the given params per node and sort them by
+        increasing depth. Result is cached for the same set of param paths,
+        up to ``cache_size`` sets.
+
+        Args:
+            package_class(str or None):
+            params(dict): param_path: param_value
+
+        Returns:
+            list of tuple[str, list of ParamPlan]:
+                list of (param root, plans to set on the corresponding node)
+        """
+        key = (package_class, tuple(params))
+        grouped = self._grouped.pop(key, None)
+        if grouped is not None:
+            self._grouped[key] = grouped
+            return grouped
+
+        per_root = OrderedDict()
+        for param_path in params:
+            plan = self.get_plan(package_class, param_path)
+            per_root.setdefault(plan.root, list()).append(plan)
+
+        grouped = list()
+        for param_root, plans in per_root.items():
+            plans.sort(key=lambda plan: plan.depth)
+            grouped.append((param_root, plans))
+
+        self._grouped[key] = grouped
+        if self.cache_size and len(self._grouped) > self.cache_size:
+            self._grouped.popitem(last=False)
+        return grouped
+
+
+class BuildPlan(BaseD2gtDict):
+    """
+    Flat list of the operations to build a GafferThree node, compiled from a
+    GafferDict with ``BuildPlan.compile()``. Doesn't need Katana so it can be
+    computed in advance and saved to disk with ``write()``.
+
+    Operations are lists so the plan stays serializable :
+
+    - ``["create", location, name, class]``: create a package under the
+      package at location ("" for the root package).
+    - ``["rebuild", param root]``: rebuild the dynamic parameters of the node.
+    - ``["set", param root, param name, param value]``: set a parameter.
+
+    "rebuild" and "set" apply to the last package created.
+
+    Args:
+        build_object(str or dict):
+    """
+    filecheck = "d2gt_plan"
+
+    OP_CREATE = "create"
+    OP_REBUILD = "rebuild"
+    OP_SET = "set"
+
+    @classmethod
+    def compile(cls, gafferdict, plans=None):
+        """
+        Args:
+            gafferdict(GafferDict):
+            plans(ParamPlans or None):
+                cache to reuse between compilations, a new one is used if None.
+
+        Raises:
+            RuntimeError: if a param_path root is not supported.
+
+        Returns:
+            BuildPlan:
+        """
+        if plans is None:
+            plans = ParamPlans()
+
+        ops = list()
+
+        # parents are always created first
+        for pkgdata in plan_packages(gafferdict.children.values()):
+
+            ops.append([cls.OP_CREATE, pkgdata.location, pkgdata.name, pkgdata.class_])
+
+            params = pkgdata.params
+            for param_root, node_plans in plans.get_grouped(pkgdata.class_, params):
+
+                if param_root == "material":
+                    ops.append([cls.OP_REBUILD, param_root])
+
+                for plan in node_plans:
+                    ops.append([cls.OP_SET, param_root, plan.name, params[plan.path]])
+
+                ops.append([cls.OP_REBUILD, param_root])
+                continue
+
+            continue
+
+        return cls({
+            "__type": cls.filecheck,
+            "name": gafferdict.name,
+            "rootLocation": gafferdict.rootLocation,
+            "syncSelection": gafferdict.syncSelection,
+            "ops": ops,
+        })
+
+    @property
+    def name(self):
+        return str(self.get("name"))
+
+    @property
+    def rootLocation(self):
+        return str(self.get("rootLocation", "/root/world/lgt/gaffer"))
+
+    @property
+    def syncSelection(self):
+        return bool(self.get("syncSelection", 1))
+
+    @property
+    def ops(self):
+        """
+        Returns:
+            list of list: operations in execution order.
+        """
+        return self.get("ops", [])
+
+    def write(self, filepath):
+        """
+        Args:
+            filepath(str): path to a .json file.
+        """
+        with open(filepath, "w") as planfile:
+            json.dump(self, planfile, separators=(",", ":"))
+        return
+
+
+class D2gtGaffer(object):
+    """
+    A GafferThree node
+
+    Args:
+        gafferdict(GafferDict):
+
+    Attributes:
+        gd(GafferDict): gaffer to create as a dict object
+        packages(dict):
+            exemple:
+            {
+                "/rigA": PackageSuperToolAPI.Packages.GroupPackage,
+                "/rigA/corridor": ...,
+                "/rigA/corridor/top": ...,
+                "/artistic/keys": ...,
+                "/artistic": ...
+            }
+        node(NodegraphAPI.Node): GafferThree node created
+        plans(ParamPlans):
+            how to set each param path per package class, shared between all
+            instances so it is only learned once per session. Its grouped
+            plans cache is bounded by ``GroupedPlansCacheSize``.
+    """
+
+    plans = ParamPlans()
+
+    def __init__(self, gafferdict):
+
+        self.gd = gafferdict
+        self.node = None  # type: NodegraphAPI.Node
+        self.packages = dict()
+
+        return
+
+    def get_package_at(self, path):
+        """
+
+        Args:
+            path(str):
+
+        Returns:
+            PackageSuperToolAPI.Packages.GroupPackage
+        """
+        if path == "" or path == "/":
+            return self.node.getRootPackage()  # type: PackageSuperToolAPI.Packages.RootPackage
+
+        # check first if the path is not already created
+        pkg = self.packages.get(path)  # type: PackageSuperToolAPI.Packages.GroupPackage
+        if pkg:
+            return pkg
 
         path = path[1::]  # remove the first "/"
         path_lvl = ""
@@ -342,94 +1604,1325 @@ class D2gtGaffer(object):
 
         return pkg
 
-    def create_package(self, data, parent=None):
-        """
-        Create the GafferThree package with the given class and name and
-        configured with the data provided. Data include parent
+    def create_package(self, data, parent=None):
+        """
+        Create the GafferThree package with the given class and name and
+        configured with the data provided. Data include parent
+
+        Args:
+            parent(PackageSuperToolAPI.Packages.GroupPackage):
+            data(GafferChildrenDict):
+        """
+        parent = parent or self.get_package_at(data.location)
+        pkg_name = data.name
+        pkg_class = data.class_
+
+        with transaction.BulkEdit("[d2gt] Create package {}".format(data.path)):
+
+            pkg = parent.createChildPackage(pkg_class, pkg_name)
+            self.packages[data.path] = pkg
+            transaction.edit("package", data.path)
+
+            modified = package_set_params(
+                package=pkg,
+                params=data.params,
+                plans=self.plans,
+                package_class=pkg_class
+            )
+            transaction.edit("parameter", data.path, count=len(modified))
+
+        tracer.debug(
+            "[D2gtGaffer][create_package] Finished for package <{name}>({class_})",
+            name=pkg_name,
+            class_=pkg_class
+        )
+        return pkg
+
+    def build(self, from_root=None, plan=None):
+        """
+
+        Args:
+            from_root(NodegraphAPI.GroupNode or None):
+                the root node the gafferthree should be added in.
+            plan(BuildPlan or None):
+                plan to execute, compiled from ``self.gd`` if None.
+
+        Returns:
+            NodegraphAPI.Node: created GafferThree node.
+        """
+        if plan is None:
+            with tracer.span("[BuildPlan][compile]") as span:
+                plan = BuildPlan.compile(self.gd, plans=self.plans)
+                span["ops"] = len(plan.ops)
+
+        span = tracer.span("[D2gtGaffer][build]", node=plan.name)
+        with span, transaction.BulkEdit("[d2gt] Build {}".format(plan.name)) as bulk:
+
+            # create the node or replace it if it exists
+            self.node = update_node(
+                node_name=plan.name,
+                node_type="GafferThree",
+                root=from_root
+            )
+            self.pkg_root = self.node.getRootPackage()
+
+            self.node.setRootLocation(plan.rootLocation)
+            self.node.setSyncSelection(plan.syncSelection)
+            transaction.edit("node", plan.name, count=2)
+
+            self.execute(plan)
+            span["packages"] = len(self.packages)
+            span["edits"] = bulk.count
+
+        return self.node
+
+    def execute(self, plan):
+        """
+        Replay the operations of the plan on ``self.node``. The package nodes
+        are only queried once per package.
+
+        Args:
+            plan(BuildPlan):
+
+        Raises:
+            RuntimeError: if a parameter doesn't exist on the package.
+        """
+        self.packages = dict()
+        package = None
+        package_path = None
+        package_class = None
+        # {package path: [param path, ...]} see gaffer_set_params_record()
+        record = dict()
+        # {param root: node} for the current package
+        nodes = dict()
+
+        for op in plan.ops:
+
+            if op[0] == BuildPlan.OP_CREATE:
+
+                location, name, package_class = op[1:]
+                if location:
+                    parent = self.packages[location]
+                else:
+                    parent = self.node.getRootPackage()
+
+                package = parent.createChildPackage(package_class, name)
+                package_path = location + "/" + name
+                self.packages[package_path] = package
+                transaction.edit("package", package_path)
+                nodes = dict()
+
+                tracer.debug(
+                    "[D2gtGaffer][execute] Created package <{name}>({class_})",
+                    name=name,
+                    class_=package_class
+                )
+                continue
+
+            param_root = op[1]
+            node = nodes.get(param_root)
+            if node is None:
+                node = package_get_node(package, param_root)
+                nodes[param_root] = node
+            check_dynamic = getattr(node, "checkDynamicParameters", None)
+
+            if op[0] == BuildPlan.OP_REBUILD:
+                if check_dynamic:
+                    check_dynamic()
+                continue
+
+            param_name, param_value = op[2:]
+            param = node.getParameter(param_name)
+            if param is None and check_dynamic:
+                # might have been created by a previously set parameter
+                check_dynamic()
+                param = node.getParameter(param_name)
+
+            if param is None:
+                raise RuntimeError(
+                    "The parameter <{}> for package <{}> doesn't exists on "
+                    "node <{}>.".format(param_name, package, node)
+                )
+
+            plan_path = param_root + "." + param_name
+            self.plans.get_plan(package_class, plan_path).set_value(param, param_value)
+            transaction.edit("parameter", package_path)
+            record.setdefault(package_path, list()).append(plan_path)
+            continue
+
+        for param_paths in record.values():
+            param_paths.sort()
+        gaffer_set_params_record(self.node, record)
+
+        tracer.debug(
+            "[D2gtGaffer][execute] Finished: {ops} operations for {packages} "
+            "packages.",
+            ops=len(plan.ops),
+            packages=len(self.packages)
+        )
+        return
+
+    def build_shards(self, from_root=None, by_rig=True, max_packages=None):
+        """
+        Split the GafferDict across multiple GafferThree nodes, chained inside
+        a Group node named like the GafferDict. See ``plan_shards()`` for how
+        packages are split.
+
+        All shards use the same rootLocation. The whole Group is replaced when
+        built again so shards not needed anymore are removed.
+
+        Args:
+            from_root(NodegraphAPI.GroupNode or None):
+                the root node the Group should be added in.
+            by_rig(bool): True to put each top-level rig in its own shard.
+            max_packages(int or None): maximum number of packages per shard.
+
+        Returns:
+            list of NodegraphAPI.Node: GafferThree node per shard in chain order.
+        """
+        shards = plan_shards(
+            self.gd.children.values(),
+            by_rig=by_rig,
+            max_packages=max_packages
+        )
+
+        bulk_name = "[d2gt] Build shards {}".format(self.gd.name)
+        with transaction.BulkEdit(bulk_name) as bulk:
+
+            self.node = update_node(
+                node_name=self.gd.name,
+                node_type="Group",
+                root=from_root
+            )
+
+            nodes = list()
+            port = self.node.getSendPort("in")
+
+            for index, (shard_name, packages) in enumerate(shards.items()):
+
+                sharddict = GafferDict(
+                    {
+                        "__type": GafferDict.filecheck,
+                        "name": "{}_{}".format(self.gd.name, shard_name),
+                        "rootLocation": self.gd.rootLocation,
+                        "syncSelection": self.gd.syncSelection,
+                        "children": OrderedDict(
+                            (package.name, package) for package in packages
+                        ),
+                    },
+                    tokendict=None
+                )
+                node = D2gtGaffer(sharddict).build(from_root=self.node)
+                NodegraphAPI.SetNodePosition(node, (0, -100 * index))
+
+                port.connect(node.getInputPortByIndex(0))
+                port = node.getOutputPortByIndex(0)
+                nodes.append(node)
+                transaction.edit("node", node.getName(), count=3)
+                continue
+
+            port.connect(self.node.getReturnPort("out"))
+            transaction.edit("node", self.gd.name)
+
+        tracer.info(
+            "[D2gtGaffer][build_shards] Finished for <{node}>: {shards} shards, "
+            "{edits} edits.",
+            node=self.gd.name,
+            shards=len(nodes),
+            edits=bulk.count
+        )
+        return nodes
+
+    def build_stream(self, filepath, tokendict=None, from_root=None):
+        """
+        Build the GafferThree node from a .ndjson GafferDict, reading and
+        creating the packages one line at a time so memory doesn't grow with
+        the number of packages. See ``write_gafferdict_stream()``.
+
+        Only the group packages (that can have children) are kept in
+        ``self.packages``.
+
+        Args:
+            filepath(str): path to a .ndjson GafferDict
+            tokendict(TokenDict or None): None if the children are already baked.
+            from_root(NodegraphAPI.GroupNode or None):
+                the root node the gafferthree should be added in.
+
+        Raises:
+            ValueError:
+                if a package is listed after a child of it, and it's not a
+                RigPackage that can use the one created for the child.
+
+        Returns:
+            NodegraphAPI.Node: created GafferThree node.
+        """
+        baker = None
+        if tokendict is not None:
+            baker = TokenBaker(tokendict, cache_size=StreamCacheSize)
+
+        bulk = transaction.BulkEdit("[d2gt] Build stream {}".format(filepath))
+        with open(filepath, "r") as streamfile, bulk:
+
+            header = json.loads(streamfile.readline())
+            header["children"] = dict()
+            self.gd = GafferDict(header, tokendict=None)
+
+            self.node = update_node(
+                node_name=self.gd.name,
+                node_type="GafferThree",
+                root=from_root
+            )
+            self.pkg_root = self.node.getRootPackage()
+            self.node.setRootLocation(self.gd.rootLocation)
+            self.node.setSyncSelection(self.gd.syncSelection)
+            transaction.edit("node", self.gd.name, count=2)
+
+            self.packages = dict()
+            record = dict()
+            count = 0
+
+            for line in streamfile:
+
+                line = line.strip()
+                if not line:
+                    continue
+
+                (name, childdata), = json.loads(line).items()
+                if baker:
+                    childdata = baker.bake(childdata)
+                data = GafferChildrenDict(childdata, name)
+
+                pkg = self.packages.get(data.path)
+                if pkg is not None:
+                    # created as a default rig for a previous child
+                    if data.class_ != DefaultRigPkg.class_:
+                        raise ValueError(
+                            "[D2gtGaffer][build_stream] Package <{}> must be "
+                            "listed before its children.".format(data.path)
+                        )
+                else:
+                    parent = self.get_package_at(data.location)
+                    pkg = parent.createChildPackage(data.class_, name)
+                    transaction.edit("package", data.path)
+                    if getattr(pkg, "createChildPackage", None):
+                        self.packages[data.path] = pkg
+
+                modified = package_set_params(
+                    package=pkg,
+                    params=data.params,
+                    plans=self.plans,
+                    package_class=data.class_
+                )
+                transaction.edit("parameter", data.path, count=len(modified))
+                if data.params:
+                    record[data.path] = sorted(data.params)
+                count += 1
+                continue
+
+            gaffer_set_params_record(self.node, record)
+
+        tracer.info(
+            "[D2gtGaffer][build_stream] Finished for node <{node}>: {packages} "
+            "packages, {edits} edits.",
+            node=self.gd.name,
+            packages=count,
+            edits=bulk.count
+        )
+        return self.node
+
+    def sync(self, from_root=None):
+        """
+        Update the existing GafferThree node to match the GafferDict by only
+        modifying what differs. Build it if it doesn't exist yet.
+
+        Args:
+            from_root(NodegraphAPI.GroupNode or None):
+                the root node the gafferthree should be added in if built.
+
+        Returns:
+            NodegraphAPI.Node: GafferThree node synced.
+        """
+        existing = NodegraphAPI.GetNode(self.gd.name)
+        if existing is None or existing.getType() != "GafferThree":
+            return self.build(from_root=from_root)
+
+        self.node = existing
+        self.pkg_root = self.node.getRootPackage()
+
+        with transaction.BulkEdit("[d2gt] Sync {}".format(self.gd.name)):
+            self.node.setRootLocation(str(self.gd.rootLocation))
+            self.node.setSyncSelection(self.gd.syncSelection)
+            transaction.edit("node", self.gd.name, count=2)
+            self.sync_packages()
+
+        return self.node
+
+    def sync_packages(self):
+        """
+        Diff the packages already on ``self.node`` against the GafferDict by
+        path, class and param values and only create, delete, reparent or
+        update the ones that differ.
+
+        Existing packages at the right path but with a different class are
+        recreated. Unwanted packages with the same name and class as a missing
+        one are reparented instead of being recreated.
+
+        The param paths set per package are recorded on the node (see
+        ``gaffer_set_params_record()``), params set by the previous build or
+        sync but removed from the GafferDict since are reset to their default
+        (see ``package_reset_params()``).
+
+        Returns:
+            OrderedDict: number of packages per action done.
+        """
+        stats = OrderedDict()
+        for action in ("created", "deleted", "reparented", "updated"):
+            stats[action] = 0
+
+        planned = plan_packages(self.gd.children.values())
+        wanted = set(pkgdata.path for pkgdata in planned)
+        # {path: package} of what's currently on the node
+        current = gaffer_get_packages(self.node)
+        previous_record = gaffer_get_params_record(self.node)
+        record = dict()
+
+        # {name: [path, ...]} existing packages not wanted where they are
+        orphans = dict()
+        for path in current:
+            if path not in wanted:
+                orphans.setdefault(path.rsplit("/", 1)[1], list()).append(path)
+
+        def forget(location, new_location=None):
+            # remove or move the location and its descendants from <current>
+            for path in list(current):
+                if not _is_under(path, location):
+                    continue
+                package = current.pop(path)
+                if new_location is not None:
+                    current[new_location + path[len(location):]] = package
+
+        bulk_name = "[d2gt] Sync packages {}".format(self.gd.name)
+        with transaction.BulkEdit(bulk_name) as bulk:
+
+            self.packages = dict()
+
+            for pkgdata in planned:
+
+                path = pkgdata.path
+                pkg = current.get(path)
+                previous_path = path
+                if pkgdata.params:
+                    record[path] = sorted(pkgdata.params)
+
+                if pkg is not None and package_get_class(pkg) != pkgdata.class_:
+                    pkg.delete()
+                    transaction.edit("package", path)
+                    forget(path)
+                    stats["deleted"] += 1
+                    pkg = None
+
+                if pkg is None:
+
+                    for orphan_path in orphans.get(pkgdata.name, list()):
+                        orphan = current.get(orphan_path)
+                        if (
+                                orphan is None
+                                or _is_under(path, orphan_path)
+                                or package_get_class(orphan) != pkgdata.class_
+                        ):
+                            continue
+                        self.get_package_at(pkgdata.location).adoptPackage(orphan)
+                        transaction.edit("package", path)
+                        forget(orphan_path, new_location=path)
+                        stats["reparented"] += 1
+                        previous_path = orphan_path
+                        pkg = orphan
+                        break
+
+                if pkg is None:
+                    self.create_package(
+                        data=pkgdata,
+                        parent=self.get_package_at(pkgdata.location)
+                    )
+                    stats["created"] += 1
+                    continue
+
+                self.packages[path] = pkg
+                modified = package_set_params(
+                    package=pkg,
+                    params=pkgdata.params,
+                    plans=self.plans,
+                    package_class=pkgdata.class_,
+                    only_changed=True
+                )
+                removed = set(previous_record.get(previous_path, list()))
+                removed.difference_update(pkgdata.params)
+                modified += package_reset_params(pkg, sorted(removed))
+                if modified:
+                    transaction.edit("parameter", path, count=len(modified))
+                    stats["updated"] += 1
+
+                continue
+
+            # parents are listed first, deleting them also delete their children
+            deleted = set()
+            for path, pkg in current.items():
+
+                if path in wanted:
+                    continue
+
+                ancestor = path.rsplit("/", 1)[0]
+                while ancestor and ancestor not in deleted:
+                    ancestor = ancestor.rsplit("/", 1)[0]
+                if ancestor:
+                    continue
+
+                pkg.delete()
+                transaction.edit("package", path)
+                deleted.add(path)
+                stats["deleted"] += 1
+
+            gaffer_set_params_record(self.node, record)
+
+        tracer.info(
+            "[D2gtGaffer][sync_packages] Finished for node <{node}>: {stats}, "
+            "{edits} edits.",
+            node=self.gd.name,
+            stats=dict(stats),
+            edits=bulk.count
+        )
+        return stats
+
+
+def write_gafferdict_stream(gafferdict, filepath):
+    """
+    Write the GafferDict as .ndjson : a first line with all the root keys
+    except ``children``, then one line per package as ``{name: package}``
+    with parents always listed before their children.
+
+    Packages are written baked, templates and generators expanded.
+
+    Args:
+        gafferdict(GafferDict):
+        filepath(str): path to the .ndjson file to write.
+    """
+    header = dict(
+        (key, value) for key, value in gafferdict.items()
+        if key not in ("children", "templates")
+    )
+
+    with open(filepath, "w") as streamfile:
+
+        streamfile.write(json.dumps(header) + "\n")
+
+        for pkgdata in plan_packages(gafferdict.children.values()):
+            line = {pkgdata.name: pkgdata.to_dict()}
+            streamfile.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+    return
+
+
+def get_cache_dir():
+    """
+    Returns:
+        str: directory for the cache files, from the ``D2GT_CACHE_DIR``
+            environment variable, else in the user Katana directory
+            (``KATANA_USER_RESOURCE_DIRECTORY``), else in the user home.
+    """
+    cache_dir = os.environ.get("D2GT_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+
+    user_dir = os.environ.get("KATANA_USER_RESOURCE_DIRECTORY")
+    if user_dir:
+        return os.path.join(user_dir, "d2gt_cache")
+
+    return os.path.join(os.path.expanduser("~"), ".d2gt", "cache")
+
+
+def _is_cache_dir_safe(cache_dir):
+    """
+    The cache files are loaded with marshal, so only the current user must
+    be able to write in the cache directory.
+
+    Args:
+        cache_dir(str): existing directory
+
+    Returns:
+        bool: False if the directory is writable by other users or owned by
+            another user. Always True where permissions are not available.
+    """
+    if not hasattr(os, "getuid"):
+        return True
+    stat = os.stat(cache_dir)
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def load_gafferdict(gaffer_path, token_path, cache_dir=None):
+    """
+    Load a GafferDict from its .json file baked with the given TokenDict
+    .json file. The validated and baked result is cached on disk in a
+    marshal file so unchanged files are not parsed and baked again. The
+    whole file is decoded in a single ``marshal.loads()``, children are
+    stored as plain dicts only converted to GafferChildrenDict when first
+    accessed.
+
+    For 5k lights of 6 params, a cached load is about 10x faster than a
+    parse and bake, about 4x once every child is accessed (as a build does):
+    creating the GafferChildrenDict objects is then the remaining cost.
+
+    Cache entries are keyed by the content of all the files, the cache
+    format and the python version (marshal is version specific), so an entry
+    can't be stale. Entries of previous versions of the same gaffer and token
+    files are removed when a new one is written.
+
+    The cache directory is created only accessible to the current user. If
+    it is writable by other users the cache is not used.
+
+    Args:
+        gaffer_path(str): path to a d2gt_gaffer .json file.
+        token_path(str or list of str):
+            path to a d2gt_token .json file, or to multiple ones merged with
+            ``TokenResolver`` from the lowest to the highest precedence.
+        cache_dir(str or None): ``get_cache_dir()`` if None.
+
+    Returns:
+        GafferDict:
+    """
+    cache_dir = cache_dir or get_cache_dir()
+    token_paths = [token_path] if isinstance(token_path, basestring) else token_path
+
+    for path in [gaffer_path] + list(token_paths):
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                "[load_gafferdict] Given filepath <{}> doesn't exists."
+                "".format(path)
+            )
+
+    with open(gaffer_path, "rb") as gafferfile:
+        gaffer_content = gafferfile.read()
+    token_contents = list()
+    for path in token_paths:
+        with open(path, "rb") as tokenfile:
+            token_contents.append(tokenfile.read())
+
+    # all the entries for these gaffer and token files share the same prefix
+    prefix = hashlib.sha1("\0".join(
+        os.path.abspath(path) for path in [gaffer_path] + list(token_paths)
+    ).encode("utf-8")).hexdigest()[:16]
+
+    key = hashlib.sha256()
+    key.update("{}:{}:{}".format(
+        __CACHE_VERSION, marshal.version, sys.version_info[:2]
+    ).encode("utf-8"))
+    for content in [gaffer_content] + token_contents:
+        key.update(str(len(content)).encode("utf-8"))
+        key.update(content)
+
+    cache_name = "{}_{}.marshal".format(prefix, key.hexdigest())
+    cache_path = os.path.join(cache_dir, cache_name)
+
+    if not os.path.isdir(cache_dir):
+        try:
+            os.makedirs(cache_dir, 0o700)
+        except OSError:
+            # created concurrently
+            if not os.path.isdir(cache_dir):
+                raise
+
+    use_cache = _is_cache_dir_safe(cache_dir)
+    if not use_cache:
+        logger.warning(
+            "[load_gafferdict] Cache directory <{}> is writable by other "
+            "users, the cache is not used.".format(cache_dir)
+        )
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            # a single read, marshal.load() reads the file object by small chunks
+            with open(cache_path, "rb") as cachefile:
+                data = marshal.loads(cachefile.read())
+            # children are plain dicts converted on access
+            gd = GafferDict(data, tokendict=None)
+            tracer.debug(
+                "[load_gafferdict] Loaded <{gaffer}> from cache <{cache}>.",
+                gaffer=gaffer_path,
+                cache=cache_path
+            )
+            return gd
+        except (EOFError, ValueError, TypeError) as excp:
+            logger.warning(
+                "[load_gafferdict] Invalid cache <{}>, rebuilding it: {}"
+                "".format(cache_path, excp)
+            )
+
+    tokendict = TokenResolver(*[
+        TokenDict(json.loads(content.decode("utf-8")))
+        for content in token_contents
+    ]).resolve()
+    gd = GafferDict(
+        json.loads(gaffer_content.decode("utf-8")),
+        tokendict=tokendict
+    )
+
+    if not use_cache:
+        return gd
+
+    # write to a temporary file first so the cache is never read half-written
+    fd, tmp_path = tempfile.mkstemp(prefix=cache_name, dir=cache_dir)
+    try:
+        data = dict(gd)
+        data["children"] = gd.children.to_dict()
+        with os.fdopen(fd, "wb") as cachefile:
+            cachefile.write(marshal.dumps(data))
+        __replace(tmp_path, cache_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    for filename in os.listdir(cache_dir):
+        if filename.startswith(prefix) and filename.endswith(".marshal"):
+            if filename != cache_name:
+                os.remove(os.path.join(cache_dir, filename))
+
+    tracer.debug(
+        "[load_gafferdict] Cached <{gaffer}> to <{cache}>.",
+        gaffer=gaffer_path,
+        cache=cache_path
+    )
+    return gd
+
+
+def _get_pool_context():
+    """
+    Process pools are never used in Katana, on any platform: forking a
+    multi-threaded Qt process can deadlock the child on a lock held by another
+    thread, and a spawned process starts a new interpreter that re-imports
+    ``__main__``, which is Katana itself.
+
+    Outside of Katana, processes are forked where possible, else spawned so a
+    script must use a ``if __name__ == "__main__"`` guard.
+
+    Returns:
+        multiprocessing context or None:
+            to create the pool with, None when running in Katana.
+    """
+    if "Katana" in sys.modules:
+        return None
+
+    # python 2 always fork on posix and spawn on Windows
+    if not hasattr(multiprocessing, "get_context"):
+        return multiprocessing
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def _batch_prepare_file(args):
+    """
+    Process pool worker for ``batch_prepare()``, must not raise.
+
+    Args:
+        args(tuple[str, str or list of str, bool]): gaffer_path, token_path, use_cache
+
+    Returns:
+        tuple[str, dict or None, str or None]:
+            gaffer_path, BuildPlan as a builtin dict, error traceback
+    """
+    gaffer_path, token_path, use_cache = args
+    try:
+        if use_cache:
+            gd = load_gafferdict(gaffer_path, token_path)
+        else:
+            if isinstance(token_path, basestring):
+                token_path = [token_path]
+            tokendict = TokenResolver(*token_path).resolve()
+            gd = GafferDict(gaffer_path, tokendict=tokendict)
+        plan = BuildPlan.compile(gd)
+    except Exception:
+        return gaffer_path, None, traceback.format_exc()
+
+    return gaffer_path, dict(plan), None
+
+
+def batch_prepare(paths, token_path, processes=None, use_cache=True):
+    """
+    Load, validate, bake and compile to a BuildPlan multiple GafferDict
+    files in a process pool. Doesn't need Katana.
+
+    Args:
+        paths(str or list of str):
+            directory of .json GafferDict files or list of GafferDict files.
+        token_path(str or list of str):
+            path to the d2gt_token .json file used for all of them, or to
+            multiple ones merged with ``TokenResolver``.
+        processes(int or None):
+            number of processes, cpu count if None. Run in the current
+            process if <= 1, or when running in Katana (see
+            ``_get_pool_context()``).
+        use_cache(bool): True to load the files with ``load_gafferdict()``.
+
+    Returns:
+        OrderedDict:
+            {gaffer_path: (BuildPlan or None, error traceback or None)} in
+            the order of <paths>.
+    """
+    if isinstance(paths, basestring):
+        directory = paths
+        paths = [
+            os.path.join(directory, filename)
+            for filename in sorted(os.listdir(directory))
+            if filename.endswith(".json")
+        ]
+        # if the token files are stored with the rigs
+        token_paths = [token_path] if isinstance(token_path, basestring) else token_path
+        token_abspaths = set(map(os.path.abspath, token_paths))
+        paths = [
+            path for path in paths if os.path.abspath(path) not in token_abspaths
+        ]
+
+    tasks = [(path, token_path, use_cache) for path in paths]
+    processes = processes or multiprocessing.cpu_count()
+
+    context = None
+    if processes > 1 and len(tasks) > 1:
+        context = _get_pool_context()
+        if context is None:
+            logger.info(
+                "[batch_prepare] Process pools are not used in Katana, "
+                "running in the current process."
+            )
+
+    if context is None:
+        results = list(map(_batch_prepare_file, tasks))
+    else:
+        pool = context.Pool(min(processes, len(tasks)))
+        try:
+            results = pool.map(_batch_prepare_file, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    output = OrderedDict()
+    for gaffer_path, plan, error in results:
+        if plan is not None:
+            plan = BuildPlan(plan)
+        else:
+            logger.error(
+                "[batch_prepare] Failed for <{}>:\n{}".format(gaffer_path, error)
+            )
+        output[gaffer_path] = (plan, error)
+
+    return output
+
+
+def batch_build(
+        paths,
+        token_path,
+        from_root=None,
+        processes=None,
+        use_cache=True
+):
+    """
+    Build a GafferThree node per GafferDict file. Files are prepared in
+    parallel with ``batch_prepare()`` and the nodes are then created one
+    after another. A file failing doesn't stop the others.
+
+    Args:
+        paths(str or list of str):
+            directory of .json GafferDict files or list of GafferDict files.
+        token_path(str or list of str):
+            path to the d2gt_token .json file used for all of them, or to
+            multiple ones merged with ``TokenResolver``.
+        from_root(NodegraphAPI.GroupNode or None):
+            the root node the gafferthrees should be added in.
+        processes(int or None):
+            number of processes for the preparation, cpu count if None.
+            Run in the current process if <= 1.
+        use_cache(bool): True to load the files with ``load_gafferdict()``.
+
+    Returns:
+        OrderedDict:
+            {
+                "timings": {"prepare": seconds, "build": seconds},
+                "results": {gaffer_path: {"node": str or None, "error": str or None}}
+            }
+    """
+    timings = OrderedDict()
+    results = OrderedDict()
+
+    start = time.time()
+    prepared = batch_prepare(
+        paths,
+        token_path=token_path,
+        processes=processes,
+        use_cache=use_cache
+    )
+    timings["prepare"] = time.time() - start
+
+    start = time.time()
+    for gaffer_path, (plan, error) in prepared.items():
 
-        Args:
-            parent(PackageSuperToolAPI.Packages.GroupPackage):
-            data(GafferChildrenDict):
-        """
-        parent = parent or self.get_package_at(data.location)
-        pkg_name = data.name
-        pkg_class = data.class_
-        pkg = parent.createChildPackage(pkg_class, pkg_name)
-        self.packages[data.path] = pkg
+        result = {"node": None, "error": error}
+        results[gaffer_path] = result
+        if plan is None:
+            continue
 
-        for parampath, paramvalue in data.params.items():
-            param = package_set_param(
-                package=pkg,
-                param_path=parampath,
-                param_value=paramvalue
+        try:
+            node = D2gtGaffer(gafferdict=None).build(from_root=from_root, plan=plan)
+            result["node"] = node.getName()
+        except Exception:
+            result["error"] = traceback.format_exc()
+            logger.error(
+                "[batch_build] Failed for <{}>:\n{}"
+                "".format(gaffer_path, result["error"])
             )
+
+        continue
+
+    timings["build"] = time.time() - start
+
+    failed = [path for path, result in results.items() if result["error"]]
+    tracer.info(
+        "[batch_build] Finished: {built} built, {failed} failed. "
+        "prepare={prepare:.3f}s build={build:.3f}s",
+        built=len(results) - len(failed),
+        failed=len(failed),
+        prepare=timings["prepare"],
+        build=timings["build"]
+    )
+    return OrderedDict([("timings", timings), ("results", results)])
+
+
+def package_get_class(package):
+    """
+    Args:
+        package(PackageSuperToolAPI.Packages.Package):
+
+    Returns:
+        str: Package class name as used in ``GafferChildrenDict.class_``
+    """
+    return package.__class__.__name__
+
+
+def gaffer_get_packages(node):
+    """
+    Args:
+        node(NodegraphAPI.Node): GafferThree node
+
+    Returns:
+        OrderedDict:
+            all the packages on the node as {path: package}, parents are
+            always listed before their children.
+    """
+    output = OrderedDict()
+    queue = [("", node.getRootPackage())]
+
+    # breadth first so parents are listed first
+    for path, package in queue:
+        get_children = getattr(package, "getChildPackages", None)
+        if not get_children:
             continue
+        for child in get_children():
+            child_path = path + "/" + child.getName()
+            output[child_path] = child
+            queue.append((child_path, child))
 
-        logger.debug(
-            "[D2gtGaffer][create_package] Finished for package <{}>({})"
-            "".format(pkg_name, pkg_class)
-        )
-        return pkg
+    return output
 
-    def build(self, from_root=None):
-        """
 
-        Args:
-            from_root(NodegraphAPI.GroupNode or None):
-                the root node the gafferthree should be added in.
+def param_get_values(param, param_path="", defaults=None):
+    """
+    Read the value of all the leaf parameters under the given one in a single
+    walk, skipping the ones that still have their default value:
 
-        Returns:
-            NodegraphAPI.Node: created GafferThree node.
-        """
-        logger.debug(
-            "[D2gtGaffer][build] Started with root={}".format(from_root)
-        )
+    - parameters driven by an expression.
+    - parameters using their node default (``getUseNodeDefault()``).
+    - parameters whose path match a pattern of <defaults> with the same value.
+    - parameters holding an ``enable`` and a ``value`` child (shader
+      parameters) that are not enabled.
+
+    Args:
+        param(NodegraphAPI.Parameter): parameter to start the walk from.
+        param_path(str): path of <param> to prefix the returned paths with.
+        defaults(dict or None):
+            {param path pattern: default value}, fnmatch patterns matched
+            against the returned paths.
 
-        # create the node or replace it if it exists
-        self.node = update_node(
-            node_name=self.gd.name,
-            node_type="GafferThree",
-            root=from_root
+    Returns:
+        OrderedDict: {param path: param value} in the parameters order.
+    """
+    output = OrderedDict()
+    defaults = [
+        (re.compile(fnmatch.translate(pattern)), value)
+        for pattern, value in (defaults or dict()).items()
+    ]
+
+    def is_default(path, param, value):
+
+        use_node_default = getattr(param, "getUseNodeDefault", None)
+        if use_node_default and use_node_default():
+            return True
+
+        for pattern, default in defaults:
+            if pattern.match(path):
+                return value == default
+        return False
+
+    stack = [(param_path, param)]
+    while stack:
+
+        path, param = stack.pop()
+        children = param.getChildren()
+
+        if not children:
+            if param.getType() != "group" and not param.isExpression():
+                value = param.getValue(0)
+                if not is_default(path, param, value):
+                    output[path] = value
+            continue
+
+        children = OrderedDict((child.getName(), child) for child in children)
+        if "enable" in children and "value" in children:
+            if not children["enable"].getValue(0):
+                continue
+            children = OrderedDict(
+                (name, children[name]) for name in ("enable", "value")
+            )
+
+        prefix = path + "." if path else ""
+        # reversed to pop them back in the parameters order
+        stack.extend(
+            (prefix + name, child) for name, child in reversed(children.items())
         )
-        self.pkg_root = self.node.getRootPackage()
+        continue
 
-        self.node.setRootLocation(str(self.gd.rootLocation))
-        self.node.setSyncSelection(self.gd.syncSelection)
+    return output
+
+
+def package_get_values(package, export_params=None, export_defaults=None):
+    """
+    Read the parameters of the package nodes that are not at their default
+    value, see ``param_get_values()``.
+
+    Args:
+        package(PackageSuperToolAPI.Packages.Package):
+        export_params(dict or None):
+            {param root: list of parameter group paths}, ``ExportParams`` if None.
+        export_defaults(dict or None):
+            {param root: {param path pattern: default value}},
+            ``ExportDefaults`` if None.
+
+    Returns:
+        OrderedDict:
+            {param path: param value} where param path start with a key of
+            ``PackageNodes``, as expected in ``GafferChildrenDict.params``
+    """
+    export_params = ExportParams if export_params is None else export_params
+    if export_defaults is None:
+        export_defaults = ExportDefaults
+    output = OrderedDict()
+
+    for param_root in sorted(export_params):
+
+        # not all the package classes have all the nodes (ex: rigs)
+        getter = getattr(package, PackageNodes[param_root], None)
+        node = getter() if getter else None
+        if node is None:
+            continue
+
+        for group_path in export_params[param_root]:
+
+            param = node.getParameters()
+            for name in group_path.split(".") if group_path else list():
+                param = param.getChild(name)
+                if param is None:
+                    break
+            if param is None:
+                continue
+
+            values = param_get_values(
+                param, group_path, export_defaults.get(param_root)
+            )
+            for param_path, param_value in values.items():
+                output[param_root + "." + param_path] = param_value
+
+        continue
+
+    return output
 
-        # we iter a first time through all packages to assign their parent
-        pkg2create_dict = self.gd.children
-        pkg2create_list = list(pkg2create_dict.values())  # type: List[GafferChildrenDict]
-        for pkg2create in pkg2create_list:
-            pkg = pkg2create_dict.get(pkg2create.direct_parent)  # type: GafferChildrenDict
-            if pkg:
-                pkg2create.parent = pkg
-
-        # reorder the list where firstindex = first package to create
-        pkg2create_prio = list()
-        pkg2create_low = list()
-        for pkg in pkg2create_list:
-            if pkg.children:
-                if pkg2create_prio and pkg2create_prio[-1].name == pkg.direct_parent:
-                    pkg2create_prio.append(pkg)
-                else:
-                    pkg2create_prio.insert(0, pkg)
-            else:
-                pkg2create_low.append(pkg)
 
-        pkg2create_list = pkg2create_prio
-        pkg2create_list.extend(pkg2create_low)
+def gaffer_export(
+        node,
+        tokendict=None,
+        export_params=None,
+        filepath=None,
+        export_defaults=None
+):
+    """
+    Export an existing GafferThree node back to a d2gt_gaffer dict that can
+    be used to build a GafferDict.
+
+    Args:
+        node(NodegraphAPI.Node): GafferThree node
+        tokendict(TokenDict or None):
+            if given, its values are replaced by their token in the class,
+            parent and params of the children.
+        export_params(dict or None):
+            {param root: list of parameter group paths}, ``ExportParams`` if None.
+        filepath(str or None): path of a .json file to also write the dict to.
+        export_defaults(dict or None):
+            {param root: {param path pattern: default value}} of the params
+            not exported when at their default, ``ExportDefaults`` if None.
+
+    Raises:
+        ValueError: if multiple packages have the same name.
+
+    Returns:
+        OrderedDict: d2gt_gaffer dict
+    """
+    unbaker = TokenUnbaker(tokendict) if tokendict else None
+    children = OrderedDict()
 
-        logger.debug(
-            "[D2gtGaffer][build] Packages to create are:\n    {}"
-            "".format(list(map(lambda p: p.path, pkg2create_list)))
+    for path, package in gaffer_get_packages(node).items():
+
+        location, name = path.rsplit("/", 1)
+        if name in children:
+            raise ValueError(
+                "[gaffer_export] Package <{}> is not the only package named <{}>"
+                ", names are unique in a GafferDict.".format(path, name)
+            )
+
+        child = OrderedDict()
+        child["parent"] = location
+        child["class"] = package_get_class(package)
+        child["params"] = package_get_values(
+            package, export_params, export_defaults
         )
+        if unbaker:
+            child = unbaker.unbake(child)
+
+        children[name] = child
+        continue
+
+    output = OrderedDict()
+    output["__type"] = GafferDict.filecheck
+    output["name"] = node.getName()
+
+    for param_name in ("rootLocation", "syncSelection"):
+        param = node.getParameter(param_name)
+        if param is not None:
+            output[param_name] = param.getValue(0)
+
+    output["children"] = children
 
-        # create the packages
-        for pkgdata in pkg2create_list:
-            self.create_package(data=pkgdata)
+    if filepath:
+        with open(filepath, "w") as file:
+            json.dump(output, file, indent=4)
+
+    tracer.info(
+        "[gaffer_export] Finished for node <{node}>: {packages} packages "
+        "exported.",
+        node=output["name"],
+        packages=len(children)
+    )
+    return output
+
+
+def plan_packages(packages):
+    """
+    Order the given packages so each one is listed after its parent. Missing
+    intermediate locations are added as ``DefaultRigPkg`` copies.
+
+    Parents are resolved from the package path so this runs in O(n) and the
+    result only depends on the order of <packages>. As a parent path is
+    always a strict prefix of its children's paths, the hierarchy can't
+    contain cycles.
+
+    Args:
+        packages(iterable of GafferChildrenDict):
+
+    Raises:
+        ValueError: if a path is invalid or used by more than one package.
+
+    Returns:
+        list of GafferChildrenDict: packages in creation order
+    """
+    bypath = OrderedDict()
+    for package in packages:
+
+        path = package.path
+        if "" in path.split("/")[1:]:
+            raise ValueError(
+                "[plan_packages] Package <{}> has an invalid path <{}>."
+                "".format(package.name, path)
+            )
+        if path in bypath:
+            raise ValueError(
+                "[plan_packages] Path <{}> is used by packages <{}> and <{}>."
+                "".format(path, bypath[path].name, package.name)
+            )
+
+        bypath[path] = package
+        continue
+
+    planned = set()
+    output = list()
+
+    for path in bypath:
+
+        # find the levels not planned yet, from the deepest to the highest
+        levels = list()
+        level = path
+        while level and level not in planned:
+            levels.append(level)
+            level = level.rsplit("/", 1)[0]
+
+        for level in reversed(levels):
+
+            package = bypath.get(level)
+            if package is None:
+                location, name = level.rsplit("/", 1)
+                package = DefaultRigPkg.copy()
+                package.name = name
+                package["parent"] = location
+
+            output.append(package)
+            planned.add(level)
             continue
 
-        return self.node
+        continue
+
+    return output
+
+
+def plan_shards(packages, by_rig=True, max_packages=None):
+    """
+    Split the given packages in multiple groups, to be built on different
+    GafferThree nodes.
+
+    With <by_rig>, each top-level package having children is a shard and
+    all the other top-level packages are in a "root" shard. A shard with more
+    than <max_packages> is split in parts, each part starting with copies of
+    the ancestors of its packages so they keep their transforms.
+
+    Packages without children are assigned to a part by a hash of their path
+    (see ``_get_shard_part()``), not by their position in the GafferDict:
+    adding or removing packages doesn't move the other ones as long as their
+    shard keeps the same number of parts. When it changes from n to n + 1
+    parts, only about 1 / (n + 1) of the packages move. The number of parts
+    is the lowest that keeps every part under <max_packages>, parts are
+    less balanced than a split in order so a few more may be needed.
+
+    Args:
+        packages(iterable of GafferChildrenDict):
+        by_rig(bool):
+        max_packages(int or None):
+
+    Raises:
+        ValueError: if <max_packages> is too low for the packages depth.
+
+    Returns:
+        OrderedDict:
+            {shard name: list of GafferChildrenDict} packages per shard, in
+            creation order.
+    """
+    planned = plan_packages(packages)
+    bypath = OrderedDict((package.path, package) for package in planned)
+    locations = set(package.location for package in planned)
+
+    groups = OrderedDict()
+    for package in planned:
+        if not by_rig:
+            shard_name = "shard"
+        else:
+            top_path = "/" + package.path.split("/")[1]
+            shard_name = bypath[top_path].name if top_path in locations else "root"
+        groups.setdefault(shard_name, list()).append(package)
+
+    if not max_packages:
+        return groups
+
+    for package in planned:
+        if package.path.count("/") > max_packages:
+            raise ValueError(
+                "[plan_shards] max_packages={} is too low for package "
+                "<{}>.".format(max_packages, package.path)
+            )
+
+    def split(group, count):
+        # {part index: list of packages} with their missing ancestors first
+        parts = dict()
+        parts_paths = dict()
+        for package in group:
+
+            if package.path in locations:
+                # added with the first of its descendants in each part
+                continue
+
+            index = _get_shard_part(package.path, count)
+            part = parts.setdefault(index, list())
+            part_paths = parts_paths.setdefault(index, set())
+
+            ancestors = list()
+            location = package.location
+            while location and location not in part_paths:
+                ancestors.append(bypath[location])
+                location = location.rsplit("/", 1)[0]
+
+            for ancestor in reversed(ancestors):
+                part.append(ancestor)
+                part_paths.add(ancestor.path)
+            part.append(package)
+            part_paths.add(package.path)
+            continue
+
+        return parts
+
+    output = OrderedDict()
+    for shard_name, group in groups.items():
+
+        count = int(math.ceil(len(group) / float(max_packages)))
+        parts = split(group, count)
+        while any(len(part) > max_packages for part in parts.values()):
+            count += 1
+            parts = split(group, count)
+
+        for index in sorted(parts):
+            name = shard_name if index == 0 else "{}_{}".format(shard_name, index)
+            output[name] = parts[index]
+
+    return output
+
+
+def _get_shard_part(path, count):
+    """
+    Jump consistent hash (Lamping & Veach) of the path: when <count> grows,
+    a path either keeps its part or moves to the new one.
+
+    Args:
+        path(str): package path
+        count(int): number of parts
+
+    Returns:
+        int: part index for the path, in [0, count[.
+    """
+    key = int(hashlib.sha1(path.encode("utf-8")).hexdigest()[:16], 16)
+    index, jump = -1, 0
+    while jump < count:
+        index = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((index + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return index
+
+
+def _is_under(path, location):
+    """
+    Returns:
+        bool: True if path is location or one of its descendant.
+    """
+    return path == location or path.startswith(location + "/")
 
 
 def update_node(node_name, node_type, root=None):
@@ -440,43 +2933,52 @@ def update_node(node_name, node_type, root=None):
     Returns:
         NodegraphAPI.Node: newly created node
     """
-    new = NodegraphAPI.CreateNode(node_type, root or NodegraphAPI.GetRootNode())
-    if new.getType() == "Group":
-        new_in = new.addInputPort("in")
-        new_out = new.addOutputPort("out")
-    else:
-        new_in = new.getInputPortByIndex(0)
-        new_out = new.getOutputPortByIndex(0)
+    with transaction.BulkEdit("[d2gt] Update node {}".format(node_name)):
+
+        new = NodegraphAPI.CreateNode(node_type, root or NodegraphAPI.GetRootNode())
+        if new.getType() == "Group":
+            new_in = new.addInputPort("in")
+            new_out = new.addOutputPort("out")
+        else:
+            new_in = new.getInputPortByIndex(0)
+            new_out = new.getOutputPortByIndex(0)
 
-    existingn = NodegraphAPI.GetNode(node_name)
-    if existingn:
+        existingn = NodegraphAPI.GetNode(node_name)
+        if existingn:
 
-        # we assume there is only 1 input/output port with only one connection
-        in_port = existingn.getInputPorts()[0]
-        in_port = in_port.getConnectedPort(0)
-        out_port = existingn.getOutputPorts()[0]
-        out_port = out_port.getConnectedPort(0)
-        pos = NodegraphAPI.GetNodePosition(existingn)  # type: tuple
+            # we assume there is only 1 input/output port with only one connection
+            in_port = existingn.getInputPorts()[0]
+            in_port = in_port.getConnectedPort(0)
+            out_port = existingn.getOutputPorts()[0]
+            out_port = out_port.getConnectedPort(0)
+            pos = NodegraphAPI.GetNodePosition(existingn)  # type: tuple
 
-        existingn.delete()
+            existingn.delete()
 
-        NodegraphAPI.SetNodePosition(new, pos)
-        if in_port:
-            in_port.connect(new_in)
-        if out_port:
-            out_port.connect(new_out)
+            NodegraphAPI.SetNodePosition(new, pos)
+            if in_port:
+                in_port.connect(new_in)
+            if out_port:
+                out_port.connect(new_out)
 
-        logger.info("[update_node] Found existing node, it has been updated.")
+            logger.info("[update_node] Found existing node, it has been updated.")
 
-    new.setName(node_name)
-    logger.info("[update_node] Finished for node <{}>".format(node_name))
+        new.setName(node_name)
+        transaction.edit("node", node_name)
+
+    tracer.info("[update_node] Finished for node <{node}>", node=node_name)
     return new
 
 
 def dict_bake_tokens(sourcedict, tokendict):
     """
     Find tokens in keys and values of <sourcedict> and replace them by their
-    corresponding value stored in <tokendict>.
+    corresponding value stored in <tokendict>. Nested dict and list are
+    processed too.
+
+    <sourcedict> is modified in place, like before TokenBaker existed. Prefer
+    using a single ``TokenBaker.bake()`` (that returns a new object) when
+    baking multiple dicts with the same TokenDict.
 
     Args:
         sourcedict(dict):
@@ -485,114 +2987,262 @@ def dict_bake_tokens(sourcedict, tokendict):
     Returns:
         dict: sourcedict with the token baked
     """
-    regex = r"<[a-zA-Z0-9_]+>"
+    baked = TokenBaker(tokendict).bake(sourcedict)
+    sourcedict.clear()
+    sourcedict.update(baked)
+    return sourcedict
 
-    for k, v in list(sourcedict.items()):
 
-        if isinstance(k, basestring):
+def package_get_node(package, param_root):
+    """
 
-            for token in set(re.findall(regex, k)):
-                if sourcedict.get(k) is not None: del sourcedict[k]
-                # remove the "<>" with [1::][:-1]
-                k2 = tokendict.get(token[1::][:-1])
-                if k2 is None:
-                    raise ValueError(
-                        "[dict_bake_tokens] Key <{}> not found in token dict."
-                        "".format(k)
-                    )
-                k2 = k.replace(token, k2)
-                sourcedict[k2] = v
+    Args:
+        package(PackageSuperToolAPI.Packages.Package):
+        param_root(str): key of ``PackageNodes``, case-insensitive.
 
-        if isinstance(v, dict):
+    Raises:
+        RuntimeError: if param_root is not supported or doesn't return a node.
 
-            sourcedict[k] = dict_bake_tokens(v, tokendict)
+    Returns:
+        NodegraphAPI.Node: node of the package corresponding to param_root
+    """
+    method = PackageNodes.get(param_root.lower())
+    if method is None:
+        raise RuntimeError(
+            "The parameter root <{}> is not supported.".format(param_root)
+        )
 
-        elif isinstance(v, basestring):
+    node = getattr(package, method)()
+    if node is None:
+        raise RuntimeError(
+            "The parameter root <{}> for package <{}> doesn't return a node."
+            "".format(param_root, package)
+        )
 
-            for token in set(re.findall(regex, v)):
-                v2 = tokendict.get(token[1::][:-1])
-                if v2 is None:
-                    raise ValueError(
-                        "[dict_bake_tokens] token <{}> for key <{}> not found"
-                        " in token dict.".format(token, k)
-                    )
-                v2 = v.replace(token, str(v2))
-                sourcedict[k] = v2
+    return node
 
-        continue
 
-    return sourcedict
+def package_set_params(
+        package,
+        params,
+        plans=None,
+        package_class=None,
+        only_changed=False
+):
+    """
+    Set multiple parameters on the package.
 
+    Params are grouped per node and the node's dynamic parameters are only
+    rebuilt once all of its params are set (+ once before for the material
+    node). Params are set by increasing depth so a parent (ex: the shader
+    name) is set before its dynamic children. If a param is still not found,
+    dynamic parameters are rebuilt once more before failing.
 
-def package_set_param(package, param_path, param_value):
-    """
+    With <only_changed>, parameters already at the given value are skipped
+    and dynamic parameters are only rebuilt for nodes that were modified.
 
     Args:
-        param_value(any): value to set on the parameter found.
         package(PackageSuperToolAPI.Packages.Package):
-        param_path(str):
-            ex: material.shaders.arnoldLightParams.exposure.value
+        params(dict):
+            param_path: param_value where param_path always start with
+            a key of ``PackageNodes``
+            ex: {"material.shaders.arnoldLightParams.exposure.value": 2}
+        plans(ParamPlans or None):
+            cache to reuse between packages, a new one is used if None.
+        package_class(str or None):
+            class of the package, key used to store plans in the cache.
+        only_changed(bool):
+            True to only set parameters that doesn't already have the value.
+            For packages that already exist.
 
     Raises:
-        RuntimeError: if param_path is invalid somehow.
+        RuntimeError: if a param_path is invalid somehow.
 
     Returns:
-        NodegraphAPI.Parameter: parameter found and modified
+        list of NodegraphAPI.Parameter: parameters found and modified
     """
-    param_root, param_name = param_path.split(".", 1)
-    # safe format param_root
-    param_root = param_root.lower()
+    if plans is None:
+        plans = ParamPlans()
 
-    if param_root == "create":
-        node = package.getCreateNode()
+    output = list()
 
-    elif param_root == "material":
-        node = package.getMaterialNode()
-        node.checkDynamicParameters()
+    for param_root, node_plans in plans.get_grouped(package_class, params):
 
-    elif param_root == "shadowlinking":
-        node = package.getShadowLinkingNode()
+        node = package_get_node(package, param_root)
+        check_dynamic = getattr(node, "checkDynamicParameters", None)
+        modified = False
 
-    elif param_root == "linking":
-        node = package.getLinkingNodes()
+        # an existing node already has its dynamic parameters built
+        if param_root == "material" and not only_changed:
+            node.checkDynamicParameters()
 
-    elif param_root == "orientconstraint":
-        node = package.getOrientConstraintNode()
+        for plan in node_plans:
 
-    elif param_root == "pointconstraint":
-        node = package.getPointConstraintNode()
+            param = node.getParameter(plan.name)
+            if param is None and check_dynamic:
+                # might have been created by a previously set parameter
+                check_dynamic()
+                param = node.getParameter(plan.name)
 
-    else:
-        raise RuntimeError(
-            "The parameter <{}> root <{}> is not supported."
-            "".format(param_name, param_root)
-        )
+            if param is None:
+                raise RuntimeError(
+                    "The parameter <{}> for package <{}> doesn't exists on "
+                    "node <{}>.".format(plan.name, package, node)
+                )
+
+            param_value = params[plan.path]
+            if only_changed and plan.is_set(param, param_value):
+                continue
+
+            plan.set_value(param, param_value)
+            output.append(param)
+            modified = True
+            continue
+
+        if check_dynamic and (modified or not only_changed):
+            check_dynamic()
+
+        continue
+
+    return output
+
+
+def package_reset_params(package, param_paths, export_defaults=None):
+    """
+    Reset the parameters of the package to their default value, used for
+    params not in the GafferDict anymore:
+
+    - parameters that can use their node default are set to use it.
+    - shader parameters are disabled (``enable`` set to 0).
+    - parameters matching a pattern of <export_defaults> get its value.
+
+    Other parameters have no known default and are left as is with a warning.
+
+    Args:
+        package(PackageSuperToolAPI.Packages.Package):
+        param_paths(list of str):
+            param paths that always start with a key of ``PackageNodes``
+        export_defaults(dict or None):
+            {param root: {param path pattern: default value}},
+            ``ExportDefaults`` if None.
+
+    Returns:
+        list of str: param paths reset.
+    """
+    if export_defaults is None:
+        export_defaults = ExportDefaults
+    output = list()
+    # {param root: node}
+    nodes = dict()
+
+    for param_path in param_paths:
+
+        param_root, param_name = param_path.split(".", 1)
+        param_root = param_root.lower()
+        node = nodes.get(param_root)
+        if node is None:
+            node = package_get_node(package, param_root)
+            nodes[param_root] = node
+
+        param = node.getParameter(param_name)
+        if param is None:
+            # dynamic parameter removed with its parent
+            continue
+
+        if getattr(param, "setUseNodeDefault", None):
+            if not param.getUseNodeDefault():
+                param.setUseNodeDefault(True)
+                output.append(param_path)
+            continue
+
+        names = param_name.split(".")
+        if (
+                param_root == "material"
+                and names[0] == "shaders"
+                and len(names) > 3
+                and names[3] in ("enable", "value")
+        ):
+            enable = node.getParameter(".".join(names[:3] + ["enable"]))
+            if enable is not None and enable.getValue(0):
+                enable.setValue(0, 0)
+                output.append(param_path)
+            continue
+
+        for pattern, default in export_defaults.get(param_root, dict()).items():
+            if fnmatch.fnmatchcase(param_name, pattern):
+                if param.getValue(0) != default:
+                    param.setValue(default, 0)
+                    output.append(param_path)
+                break
+        else:
+            logger.warning(
+                "[package_reset_params] No default known for parameter <{}> "
+                "of package <{}>, left as is.".format(param_path, package)
+            )
+
+        continue
+
+    return output
 
-    if node is None:
-        raise RuntimeError(
-            "The parameter_path <{}> for package <{}> doesn't return a node."
-            "".format(param_path, package)
-        )
 
-    param = node.getParameter(param_name)
+def gaffer_get_params_record(node):
+    """
+    Args:
+        node(NodegraphAPI.Node): GafferThree node
+
+    Returns:
+        dict:
+            {package path: [param path, ...]} set by the last build or sync,
+            empty if the node has no record.
+    """
+    param = node.getParameter(ParamsRecordName)
     if param is None:
-        raise RuntimeError(
-            "The parameter <{}> for package <{}> doesn't exists on node <{}>."
-            "".format(param_name, package, node)
+        return dict()
+    try:
+        return json.loads(param.getValue(0) or "{}")
+    except ValueError:
+        logger.warning(
+            "[gaffer_get_params_record] Invalid record on node <{}>, "
+            "ignored.".format(node.getName())
         )
+        return dict()
 
-    try:
-        param.setValue(param_value, 0)
-    except TypeError as excp:
-        if "needs a string" in excp.args[0]:
-            param.setValue(str(param_value), 0)
 
-    try:
-        node.checkDynamicParameters()
-    except AttributeError:
-        pass
+def gaffer_set_params_record(node, record):
+    """
+    Store the record on the node, the parameter is only modified if the
+    record changed.
+
+    Args:
+        node(NodegraphAPI.Node): GafferThree node
+        record(dict): {package path: [param path, ...]}
+    """
+    value = json.dumps(record, sort_keys=True, separators=(",", ":"))
+    param = node.getParameter(ParamsRecordName)
+    if param is None:
+        node.getParameters().createChildString(ParamsRecordName, value)
+    elif param.getValue(0) != value:
+        param.setValue(value, 0)
+    return
 
-    return param
+
+def package_set_param(package, param_path, param_value):
+    """
+    Prefer ``package_set_params()`` when setting multiple parameters.
+
+    Args:
+        param_value(any): value to set on the parameter found.
+        package(PackageSuperToolAPI.Packages.Package):
+        param_path(str):
+            ex: material.shaders.arnoldLightParams.exposure.value
+
+    Raises:
+        RuntimeError: if param_path is invalid somehow.
+
+    Returns:
+        NodegraphAPI.Parameter: parameter found and modified
+    """
+    return package_set_params(package, {param_path: param_value})[0]
 
 
 def __test01():
@@ -639,7 +3289,7 @@ def __test01():
         }
     }
     gd = GafferDict(scene, tokendict=td)
-    print(json.dumps(gd, indent=4))
+    print(json.dumps(gd.to_dict(), indent=4))
     gaffer = D2gtGaffer(gafferdict=gd)
     gaffer_node = gaffer.build()
 
@@ -0,0 +1,283 @@
+"""
+python>3
+
+Measure how d2gt scale with the number of packages in the GafferDict, using
+the stand-in PackageSuperToolAPI from ``standin_packagesupertoolapi.py``.
+
+For each size and hierarchy shape (``wide``: every light under one rig,
+``deep``: chains of nested rigs with lights at each level) the steps are
+timed and their peak memory and API call counts are recorded:
+
+- load: parse the GafferDict and TokenDict .json files
+- bake: build the GafferDict (token baking of every child)
+- order: ``plan_packages()`` on the children
+- build: ``D2gtGaffer.build()`` on a stand-in GafferThree node
+
+The built package tree is then checked against the GafferDict.
+
+Results can be stored as a named baseline in ``d2gt.benchmark.json`` to
+compare revisions::
+
+    python d2gt.benchmark.py --save baseline
+    # ... modify d2gt.py ...
+    python d2gt.benchmark.py --compare baseline
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+THIS_DIR = Path(__file__).parent
+BASELINES_PATH = THIS_DIR / "d2gt.benchmark.json"
+
+sys.path.insert(0, str(THIS_DIR))
+sys.path.insert(0, str(THIS_DIR.parent))
+# for lxmcommon
+sys.path.append(str(THIS_DIR.parent.parent))
+
+import d2gt
+
+import standin_packagesupertoolapi as standin
+
+# per-package debug messages would be measured too
+d2gt.logger.setLevel(logging.WARNING)
+
+SIZES = [10, 100, 1000, 10000, 20000]
+SHAPES = ["wide", "deep"]
+STEPS = ["load", "bake", "order", "build"]
+# number of nested rigs per chain for the deep shape
+DEPTH = 32
+# number of lights in each rig for the deep shape
+LIGHTS_PER_RIG = 7
+
+
+def measure(func):
+    """
+    Args:
+        func(callable): function to call without arguments
+
+    Returns:
+        tuple(any, dict):
+            result of func and its time (seconds), peak memory (bytes) and
+            API calls.
+    """
+    standin.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    result = func()
+
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, {
+        "time": round(elapsed, 6),
+        "peak_memory": peak,
+        "calls": sum(standin.CALLS.values()),
+    }
+
+
+def generate_children(size, shape):
+    """
+    Args:
+        size(int): number of packages to generate
+        shape(str): "wide" or "deep"
+
+    Returns:
+        dict: unbaked children of a GafferDict
+    """
+    children = dict()
+
+    def add_light(index, parent):
+        children["lg{}".format(index)] = {
+            "parent": parent,
+            "class": "<lg_spot>",
+            "params": {
+                "<exposure>": index % 10,
+                "<intensity>": 1.0,
+                "create.transform.translate.x": index,
+            }
+        }
+
+    if shape == "wide":
+        children["rig"] = {"parent": "", "class": "RigPackage"}
+        for index in range(size - 1):
+            add_light(index, "/rig")
+        return children
+
+    index = 0
+    location = ""
+    rig_index = 0
+    while index < size:
+
+        if rig_index % DEPTH == 0:
+            location = ""
+        name = "rig{}".format(rig_index)
+        children[name] = {
+            "parent": location,
+            "class": "RigPackage",
+            "params": {"create.transform.translate.y": rig_index},
+        }
+        location += "/" + name
+        rig_index += 1
+        index += 1
+
+        for _ in range(min(LIGHTS_PER_RIG, size - index)):
+            add_light(index, location)
+            index += 1
+
+    return children
+
+
+def write_files(size, shape, directory):
+    """
+    Returns:
+        tuple(str, str): path of the GafferDict and TokenDict .json files
+    """
+    tokens = {
+        "__type": "d2gt_token",
+        "lg_spot": "ArnoldSpotLightPackage",
+        "exposure": "material.shaders.arnoldLightParams.exposure.value",
+        "intensity": "material.shaders.arnoldLightParams.intensity.value",
+    }
+    scene = {
+        "__type": "d2gt_gaffer",
+        "name": "GafferThree_benchmark",
+        "children": generate_children(size, shape),
+    }
+
+    gaffer_path = Path(directory) / "gaffer_{}_{}.json".format(shape, size)
+    token_path = Path(directory) / "token.json"
+    gaffer_path.write_text(json.dumps(scene))
+    token_path.write_text(json.dumps(tokens))
+    return str(gaffer_path), str(token_path)
+
+
+def check_tree(node, gafferdict):
+    """
+    Raises:
+        AssertionError: if the packages on the node doesn't match the GafferDict
+    """
+    tree = standin.get_tree(node)
+    children = list(gafferdict.children.values())
+    assert len(tree) == len(children), (len(tree), len(children))
+
+    for pkgdata in children:
+        class_, params = tree[pkgdata.path]
+        assert class_ == pkgdata.class_, (pkgdata.path, class_)
+        for param_path, value in pkgdata.params.items():
+            assert params[param_path] == value, (pkgdata.path, param_path)
+
+    return
+
+
+def bench_size(size, shape):
+    """
+    Args:
+        size(int): number of packages in the GafferDict.
+        shape(str): "wide" or "deep"
+
+    Returns:
+        dict: measures for each benchmarked step.
+    """
+    result = dict()
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        gaffer_path, token_path = write_files(size, shape, directory)
+        (scene, tokendict), result["load"] = measure(
+            lambda: (
+                json.loads(Path(gaffer_path).read_text()),
+                d2gt.TokenDict(token_path),
+            )
+        )
+
+    gafferdict, result["bake"] = measure(
+        lambda: d2gt.GafferDict(scene, tokendict=tokendict)
+    )
+    _, result["order"] = measure(
+        lambda: d2gt.plan_packages(gafferdict.children.values())
+    )
+
+    update_node = d2gt.update_node
+    d2gt.update_node = lambda node_name, node_type, root=None: (
+        standin.GafferThreeNode(node_name)
+    )
+    try:
+        gaffer = d2gt.D2gtGaffer(gafferdict=gafferdict)
+        node, result["build"] = measure(gaffer.build)
+    finally:
+        d2gt.update_node = update_node
+
+    check_tree(node, gafferdict)
+    result["packages"] = len(gaffer.packages)
+    return result
+
+
+def compare(results, baseline):
+    """
+    Print the ratio current/baseline for each measure.
+    """
+    for key, steps in results.items():
+        base_steps = baseline.get(key)
+        if not base_steps:
+            print("[compare] {} missing from baseline".format(key))
+            continue
+
+        for step in STEPS:
+            line = ["{:>11} {:<5}".format(key, step)]
+            for measure_name in ("time", "peak_memory", "calls"):
+                current = steps[step][measure_name]
+                base = base_steps[step][measure_name]
+                ratio = current / base if base else float("nan")
+                line.append("{}={:.2f}x".format(measure_name, ratio))
+            print(" ".join(line))
+
+    return
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--shapes", nargs="+", default=SHAPES, choices=SHAPES)
+    parser.add_argument("--save", metavar="LABEL", help="store as baseline")
+    parser.add_argument("--compare", metavar="LABEL", help="baseline to compare to")
+    args = parser.parse_args()
+
+    results = dict()
+    for shape in args.shapes:
+        for size in args.sizes:
+            key = "{}_{}".format(shape, size)
+            results[key] = bench_size(size=size, shape=shape)
+            print(
+                "{:>11} packages={:>6} ".format(key, results[key]["packages"])
+                + " ".join(
+                    "{}={:.4f}s".format(step, results[key][step]["time"])
+                    for step in STEPS
+                )
+                + " build_calls={}".format(results[key]["build"]["calls"])
+            )
+
+    baselines = dict()
+    if BASELINES_PATH.exists():
+        baselines = json.loads(BASELINES_PATH.read_text())
+
+    if args.compare:
+        compare(results, baselines.get(args.compare, dict()))
+
+    if args.save:
+        baselines[args.save] = results
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=4, sort_keys=True))
+        print("[main] Baseline <{}> saved to {}".format(args.save, BASELINES_PATH))
+
+    return
+
+
+if __name__ == '__main__':
+    main()
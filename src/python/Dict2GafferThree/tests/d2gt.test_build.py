@@ -0,0 +1,682 @@
+"""
+python>3
+
+Build packages using the stand-in API from standin_packagesupertoolapi.py
+"""
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# for lxmcommon
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+import d2gt
+from lxmcommon import tracing
+from lxmcommon import transaction
+
+import standin_packagesupertoolapi as standin
+
+
+def test01():
+    """
+    test dynamic parameters are only rebuilt once per node.
+    """
+    standin.reset()
+
+    params = {
+        "material.shaders.arnoldLightParams.param{}.value".format(i): i
+        for i in range(40)
+    }
+    params["create.transform.translate.x"] = 5
+    params["create.name"] = 12  # needs a string
+
+    data = d2gt.GafferChildrenDict(
+        {"class": "ArnoldSpotLightPackage", "params": params},
+        name="lg_spot"
+    )
+
+    node = standin.GafferThreeNode("GafferThree_test")
+    gaffer = d2gt.D2gtGaffer(gafferdict=None)
+    gaffer.node = node
+    pkg = gaffer.create_package(data=data, parent=node.getRootPackage())
+
+    # material: once before and once after. create: once after.
+    assert standin.CALLS["Node.checkDynamicParameters"] == 3, standin.CALLS
+    assert pkg.nodes["material"].getParameter(
+        "shaders.arnoldLightParams.param39.value"
+    ).value == 39
+    assert pkg.nodes["create"].getParameter("name").value == "12"
+
+    print("[test01] Finished")
+    return
+
+
+def test02():
+    """
+    test param plans are learned once per package class.
+    """
+    standin.reset()
+
+    node = standin.GafferThreeNode("GafferThree_test")
+    gaffer = d2gt.D2gtGaffer(gafferdict=None)
+    gaffer.node = node
+    gaffer.plans = d2gt.ParamPlans()
+
+    for index in range(3):
+        data = d2gt.GafferChildrenDict(
+            {
+                "class": "ArnoldSpotLightPackage",
+                "params": {"create.name": index, "create.transform.x": index}
+            },
+            name="lg_spot{}".format(index)
+        )
+        gaffer.create_package(data=data, parent=node.getRootPackage())
+
+    assert len(gaffer.plans) == 2, gaffer.plans
+    # only the first package needed a retry for the string conversion
+    assert standin.CALLS["Parameter.setValue"] == 3 * 2 + 1, standin.CALLS
+    assert node.getRootPackage().children[2].nodes["create"].getParameter(
+        "name"
+    ).value == "2"
+
+    # grouped plans cache only keep the most recently used param path sets
+    plans = d2gt.ParamPlans(cache_size=2)
+    first = plans.get_grouped(None, {"create.a": 0})
+    plans.get_grouped(None, {"create.b": 0})
+    assert plans.get_grouped(None, {"create.a": 0}) is first
+    plans.get_grouped(None, {"create.c": 0})
+    assert len(plans._grouped) == 2, plans._grouped
+    assert (None, ("create.b",)) not in plans._grouped, plans._grouped
+    assert plans.get_grouped(None, {"create.a": 0}) is first
+
+    print("[test02] Finished")
+    return
+
+
+def _get_gafferdict(children):
+
+    scene = {
+        "__type": "d2gt_gaffer",
+        "name": "GafferThree_test",
+        "children": children,
+    }
+    return d2gt.GafferDict(scene, tokendict=d2gt.TokenDict({"__type": "d2gt_token"}))
+
+
+def _get_tree(node):
+    """
+    Returns:
+        dict: {path: (class, {param path: value})} of all packages on the node
+    """
+    tree = dict()
+    for path, pkg in d2gt.gaffer_get_packages(node).items():
+        params = {
+            root + "." + param_path: param.value
+            for root, pkg_node in pkg.nodes.items()
+            for param_path, param in pkg_node.parameters.items()
+        }
+        tree[path] = (d2gt.package_get_class(pkg), params)
+    return tree
+
+
+def test03():
+    """
+    test syncing an existing gaffer only modify what changed.
+    """
+    children = {
+        "rig": {"parent": "", "class": "RigPackage"},
+        "lg_key": {
+            "parent": "/rig",
+            "class": "ArnoldSpotLightPackage",
+            "params": {"material.shaders.arnoldLightParams.exposure.value": 1}
+        },
+        "lg_fill": {
+            "parent": "/rig",
+            "class": "ArnoldSpotLightPackage",
+            "params": {"material.shaders.arnoldLightParams.exposure.value": 2}
+        },
+        "lg_rim": {"parent": "/rig", "class": "ArnoldQuadLightPackage"},
+        "lg_old": {"parent": "", "class": "ArnoldQuadLightPackage"},
+    }
+
+    node = standin.GafferThreeNode("GafferThree_test")
+    gaffer = d2gt.D2gtGaffer(gafferdict=_get_gafferdict(children))
+    gaffer.node = node
+    stats = gaffer.sync_packages()
+    assert stats["created"] == 5, stats
+
+    # no-op sync
+    standin.reset()
+    stats = gaffer.sync_packages()
+    assert not any(stats.values()), stats
+    assert standin.CALLS["Parameter.setValue"] == 0, standin.CALLS
+    assert standin.CALLS["Node.checkDynamicParameters"] == 0, standin.CALLS
+
+    # modified sync
+    children["lg_key"]["params"] = {
+        "material.shaders.arnoldLightParams.exposure.value": 5
+    }
+    children["lg_fill"]["parent"] = "/rig/fills"
+    children["lg_rim"]["class"] = "ArnoldSpotLightPackage"
+    del children["lg_old"]
+
+    gafferdict = _get_gafferdict(children)
+    gaffer = d2gt.D2gtGaffer(gafferdict=gafferdict)
+    gaffer.node = node
+    standin.reset()
+    stats = gaffer.sync_packages()
+
+    assert stats["updated"] == 1, stats
+    assert stats["reparented"] == 1, stats
+    # lg_rim recreated, /rig/fills added
+    assert stats["created"] == 2, stats
+    # lg_rim and lg_old
+    assert stats["deleted"] == 2, stats
+
+    # result must be the same as a build from scratch
+    expected = standin.GafferThreeNode("GafferThree_expected")
+    gaffer = d2gt.D2gtGaffer(gafferdict=gafferdict)
+    gaffer.node = expected
+    gaffer.sync_packages()
+    assert _get_tree(node) == _get_tree(expected), (_get_tree(node), _get_tree(expected))
+
+    print("[test03] Finished")
+    return
+
+
+def test04():
+    """
+    test exporting a gaffer back to a dict round-trips with the tokens.
+    """
+    tokendict = d2gt.TokenDict({
+        "__type": "d2gt_token",
+        "lg_spot": "ArnoldSpotLightPackage",
+        "exposure": "shaders.arnoldLightParams.exposure",
+        "color": "shaders.arnoldLightParams.color",
+    })
+    children = {
+        "rig": {"parent": "", "class": "RigPackage"},
+        "lg_key": {
+            "parent": "/rig",
+            "class": "<lg_spot>",
+            "params": {
+                "material.<exposure>.enable": 1,
+                "material.<exposure>.value": 3,
+                "material.<color>.enable": 1,
+                "material.<color>.value.i0": 0.5,
+                "material.<color>.value.i1": 0.2,
+                "create.transform.translate.x": 10,
+            }
+        },
+        "lg_fill": {
+            "parent": "/rig",
+            "class": "<lg_spot>",
+            "params": {
+                "material.<exposure>.enable": 0,
+                "material.<exposure>.value": 2,
+            }
+        },
+    }
+    scene = {
+        "__type": "d2gt_gaffer",
+        "name": "GafferThree_test",
+        "rootLocation": "/root/world/lgt/test",
+        "children": children,
+    }
+
+    # GafferDict bake the children in place
+    expected = json.loads(json.dumps(children))
+
+    node = standin.GafferThreeNode("GafferThree_test")
+    gaffer = d2gt.D2gtGaffer(gafferdict=d2gt.GafferDict(scene, tokendict=tokendict))
+    gaffer.node = node
+    node.setRootLocation(gaffer.gd.rootLocation)
+    node.setSyncSelection(gaffer.gd.syncSelection)
+    gaffer.sync_packages()
+
+    standin.reset()
+    exported = d2gt.gaffer_export(node, tokendict=tokendict)
+    # all values of a node are read in a single walk
+    assert standin.CALLS["Node.getParameters"] == 3 * 6, standin.CALLS
+    assert standin.CALLS["Node.getParameter"] == 0, standin.CALLS
+
+    assert exported["rootLocation"] == "/root/world/lgt/test", exported
+    assert list(exported["children"]) == ["rig", "lg_key", "lg_fill"], exported
+    lg_key = exported["children"]["lg_key"]
+    assert lg_key["class"] == "<lg_spot>", lg_key
+    assert lg_key["params"] == expected["lg_key"]["params"], lg_key
+    # disabled shader params are not exported
+    assert exported["children"]["lg_fill"]["params"] == {}, exported
+
+    # rebuilding the export gives the same gaffer
+    rebuilt = standin.GafferThreeNode("GafferThree_rebuilt")
+    gaffer = d2gt.D2gtGaffer(
+        gafferdict=d2gt.GafferDict(
+            json.loads(json.dumps(exported)),
+            tokendict=tokendict
+        )
+    )
+    gaffer.node = rebuilt
+    gaffer.sync_packages()
+    tree, rebuilt_tree = _get_tree(node), _get_tree(rebuilt)
+    assert sorted(tree) == sorted(rebuilt_tree), (tree, rebuilt_tree)
+    # lg_fill disabled params stay at the package defaults
+    assert tree["/rig/lg_key"] == rebuilt_tree["/rig/lg_key"], (tree, rebuilt_tree)
+
+    print("[test04] Finished")
+    return
+
+
+def test05():
+    """
+    test a BuildPlan saved to disk builds the same gaffer as the GafferDict.
+    """
+    children = {
+        "lg_key": {
+            "parent": "/rig/keys",
+            "class": "ArnoldSpotLightPackage",
+            "params": {
+                "material.shaders.arnoldLightParams.exposure.value": 4,
+                "material.shaders.arnoldLightParams.color.value.i0": 0.2,
+                "create.name": 3,
+            }
+        },
+        "lg_fill": {"parent": "/rig", "class": "ArnoldQuadLightPackage"},
+    }
+    gafferdict = _get_gafferdict(children)
+
+    plan = d2gt.BuildPlan.compile(gafferdict)
+    # rig + keys + 2 lights, material: 2 rebuilds + 2 sets, create: 1 rebuild + 1 set
+    assert len(plan.ops) == 4 + 4 + 2, plan.ops
+
+    filepath = os.path.join(tempfile.mkdtemp(), "plan.json")
+    plan.write(filepath)
+    plan = d2gt.BuildPlan(filepath)
+
+    standin.reset()
+    node = standin.GafferThreeNode("GafferThree_test")
+    gaffer = d2gt.D2gtGaffer(gafferdict=None)
+    gaffer.node = node
+    gaffer.execute(plan)
+    # nodes are only queried once per package
+    assert standin.CALLS["Package.getMaterialNode"] == 1, standin.CALLS
+
+    expected = standin.GafferThreeNode("GafferThree_expected")
+    gaffer = d2gt.D2gtGaffer(gafferdict=gafferdict)
+    gaffer.node = expected
+    gaffer.sync_packages()
+    assert _get_tree(node) == _get_tree(expected), (_get_tree(node), _get_tree(expected))
+
+    print("[test05] Finished")
+    return
+
+
+def test06():
+    """
+    test building from a .ndjson GafferDict one package at a time.
+    """
+    tokendict = d2gt.TokenDict({"__type": "d2gt_token", "lg_spot": "ArnoldSpotLightPackage"})
+    children = dict()
+    for index in range(200):
+        children[f"lg{index}"] = {
+            "parent": f"/rig/sub{index % 4}",
+            "class": "ArnoldSpotLightPackage",
+            "params": {"material.shaders.arnoldLightParams.exposure.value": index},
+        }
+    # listed after its children, but a rig so the default one is used
+    children["sub0"] = {
+        "parent": "/rig",
+        "class": "RigPackage",
+        "params": {"create.transform.translate.x": 2},
+    }
+    gafferdict = _get_gafferdict(children)
+
+    filepath = os.path.join(tempfile.mkdtemp(), "gaffer.ndjson")
+    d2gt.write_gafferdict_stream(gafferdict, filepath)
+    with open(filepath) as streamfile:
+        lines = streamfile.readlines()
+    # header + rig + 4 sub + 200 lights
+    assert len(lines) == 1 + 1 + 4 + 200, len(lines)
+
+    update_node = d2gt.update_node
+    d2gt.update_node = lambda node_name, node_type, root=None: (
+        standin.GafferThreeNode(node_name)
+    )
+    try:
+        gaffer = d2gt.D2gtGaffer(gafferdict=None)
+        node = gaffer.build_stream(filepath)
+    finally:
+        d2gt.update_node = update_node
+
+    # only group packages are kept
+    assert sorted(gaffer.packages) == [
+        "/rig", "/rig/sub0", "/rig/sub1", "/rig/sub2", "/rig/sub3"
+    ], sorted(gaffer.packages)
+
+    expected = standin.GafferThreeNode("GafferThree_expected")
+    gaffer = d2gt.D2gtGaffer(gafferdict=gafferdict)
+    gaffer.node = expected
+    gaffer.sync_packages()
+    assert _get_tree(node) == _get_tree(expected)
+
+    # unbaked stream with a light listed after its child
+    with open(filepath, "w") as streamfile:
+        streamfile.write(json.dumps({"__type": "d2gt_gaffer", "name": "GafferThree_test"}) + "\n")
+        streamfile.write(json.dumps({"lg_a": {"parent": "/lg_b", "class": "RigPackage"}}) + "\n")
+        streamfile.write(json.dumps({"lg_b": {"parent": "", "class": "<lg_spot>"}}) + "\n")
+
+    d2gt.update_node = lambda node_name, node_type, root=None: (
+        standin.GafferThreeNode(node_name)
+    )
+    try:
+        d2gt.D2gtGaffer(gafferdict=None).build_stream(filepath, tokendict=tokendict)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a light listed after its child should raise")
+    finally:
+        d2gt.update_node = update_node
+
+    print("[test06] Finished")
+    return
+
+
+def test07():
+    """
+    test the order of the graph calls recorded during a build.
+    """
+    children = {
+        "rig": {"parent": "", "class": "RigPackage"},
+        "lg_key": {
+            "parent": "/rig",
+            "class": "ArnoldSpotLightPackage",
+            "params": {
+                "material.shaders.arnoldLightParams.exposure.value": 1,
+                "create.transform.translate.x": 2,
+            }
+        },
+    }
+    gafferdict = _get_gafferdict(children)
+
+    standin.reset()
+    standin.record()
+    update_node = d2gt.update_node
+    d2gt.update_node = lambda node_name, node_type, root=None: (
+        standin.GafferThreeNode(node_name)
+    )
+    try:
+        node = d2gt.D2gtGaffer(gafferdict=gafferdict).build()
+    finally:
+        d2gt.update_node = update_node
+        standin.record(False)
+
+    calls = [call[0] for call in standin.HISTORY]
+    created = [call[2][1] for call in standin.HISTORY if call[0] == "Package.createChildPackage"]
+    assert created == ["rig", "lg_key"], created
+    # the light params are only set once the light exists
+    assert calls.index("Parameter.setValue") > calls.index("Package.createChildPackage", 1)
+    assert calls.count("Parameter.setValue") == 2, calls
+    assert standin.get_tree(node) == _get_tree(node)
+
+    print("[test07] Finished")
+    return
+
+
+def test08():
+    """
+    test a build is a single undo group and count its edits.
+    """
+    children = {
+        "lg{}".format(index): {
+            "parent": "/rig",
+            "class": "ArnoldSpotLightPackage",
+            "params": {"material.shaders.arnoldLightParams.exposure.value": index}
+        }
+        for index in range(100)
+    }
+    gafferdict = _get_gafferdict(children)
+
+    standin.reset()
+    transaction.Utils = standin
+    update_node = d2gt.update_node
+    d2gt.update_node = lambda node_name, node_type, root=None: (
+        standin.GafferThreeNode(node_name)
+    )
+    try:
+        gaffer = d2gt.D2gtGaffer(gafferdict=gafferdict)
+        with transaction.BulkEdit("test08") as bulk:
+            gaffer.build()
+    finally:
+        d2gt.update_node = update_node
+        transaction.Utils = None
+
+    # rootLocation + syncSelection, rig + 100 lights, 100 params
+    assert bulk.count == 2 + 101 + 100, bulk.count
+    assert dict(bulk.counts) == {"node": 2, "package": 101, "parameter": 100}, bulk.counts
+    # the nested BulkEdit of the build is merged in the outermost one
+    assert standin.CALLS["UndoStack.OpenGroup"] == 1, standin.CALLS
+    assert standin.CALLS["UndoStack.CloseGroup"] == 1, standin.CALLS
+    assert transaction.get_current() is None
+
+    print("[test08] Finished")
+    return
+
+
+def test09():
+    """
+    test disabled tracing is cheap and events go to the json sink.
+    """
+    logger = logging.getLogger("test09")
+    logger.setLevel(logging.INFO)
+    tracer = tracing.Tracer(logger)
+    values = list(range(50))
+
+    start = time.perf_counter()
+    for index in range(100000):
+        tracer.debug("[test09] <{index}> values={values}", index=index, values=values)
+    lazy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for index in range(100000):
+        logger.debug("[test09] <{}> values={}".format(index, values))
+    eager = time.perf_counter() - start
+
+    print(f"[test09] 100k disabled events: lazy={lazy:.4f}s eager={eager:.4f}s")
+    assert lazy < eager, (lazy, eager)
+
+    children = {
+        "lg{}".format(index): {"parent": "/rig", "class": "ArnoldSpotLightPackage"}
+        for index in range(10)
+    }
+    gafferdict = _get_gafferdict(children)
+
+    stream = io.StringIO()
+    tracing.set_sink(stream)
+    update_node = d2gt.update_node
+    d2gt.update_node = lambda node_name, node_type, root=None: (
+        standin.GafferThreeNode(node_name)
+    )
+    try:
+        d2gt.D2gtGaffer(gafferdict=gafferdict).build()
+    finally:
+        d2gt.update_node = update_node
+        tracing.set_sink(None)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    spans = {record["span"]: record for record in records if "span" in record}
+    assert spans["[D2gtGaffer][build]"]["packages"] == 11, spans
+    assert spans["[D2gtGaffer][build]"]["duration"] >= 0, spans
+    assert spans["[BuildPlan][compile]"]["ops"] > 0, spans
+    created = [record for record in records if "Created package" in record["event"]]
+    assert len(created) == 11, created
+    assert created[0]["tool"] == "d2gt" and created[0]["level"] == "DEBUG"
+
+    print("[test09] Finished")
+    return
+
+
+def test10():
+    """
+    test gaffer_export skips the params at their default value.
+    """
+    children = {
+        "lg_key": {
+            "parent": "",
+            "class": "ArnoldSpotLightPackage",
+            "params": {
+                "create.transform.translate.x": 0,
+                "create.transform.rotate.y": 15,
+                "create.transform.scale.x": 1,
+                "create.transform.scale.y": 2,
+                "linking.objects": "",
+                "shadowlinking.objects": "/root/world/geo/chars",
+            }
+        },
+    }
+    node = standin.GafferThreeNode("GafferThree_test")
+    gaffer = d2gt.D2gtGaffer(gafferdict=_get_gafferdict(children))
+    gaffer.node = node
+    gaffer.sync_packages()
+
+    params = d2gt.gaffer_export(node)["children"]["lg_key"]["params"]
+    assert params == {
+        "create.transform.rotate.y": 15,
+        "create.transform.scale.y": 2,
+        "shadowlinking.objects": "/root/world/geo/chars",
+    }, params
+
+    params = d2gt.gaffer_export(node, export_defaults={})["children"]["lg_key"]["params"]
+    assert params == children["lg_key"]["params"], params
+
+    print("[test10] Finished")
+    return
+
+
+def test11():
+    """
+    test syncing resets the params removed from the GafferDict.
+    """
+    children = {
+        "lg_key": {
+            "parent": "/rig",
+            "class": "ArnoldSpotLightPackage",
+            "params": {
+                "material.shaders.arnoldLightParams.exposure.enable": 1,
+                "material.shaders.arnoldLightParams.exposure.value": 3,
+                "create.transform.translate.x": 5,
+                "linking.objects": "/root/world/geo/chars",
+            }
+        },
+    }
+    update_node = d2gt.update_node
+    d2gt.update_node = lambda node_name, node_type, root=None: (
+        standin.GafferThreeNode(node_name)
+    )
+    try:
+        node = d2gt.D2gtGaffer(gafferdict=_get_gafferdict(children)).build()
+    finally:
+        d2gt.update_node = update_node
+
+    record = d2gt.gaffer_get_params_record(node)
+    assert record == {"/rig/lg_key": sorted(children["lg_key"]["params"])}, record
+
+    # the light moved under another rig, its params are still reset
+    children["lg_key"]["parent"] = "/rig/keys"
+    children["lg_key"]["params"] = {"create.transform.translate.x": 5}
+    gaffer = d2gt.D2gtGaffer(gafferdict=_get_gafferdict(children))
+    gaffer.node = node
+    stats = gaffer.sync_packages()
+    assert stats["reparented"] == 1 and stats["updated"] == 1, stats
+
+    params = _get_tree(node)["/rig/keys/lg_key"][1]
+    assert params["material.shaders.arnoldLightParams.exposure.enable"] == 0, params
+    assert params["create.transform.translate.x"] == 5, params
+    assert params["linking.objects"] == "", params
+    assert d2gt.gaffer_get_params_record(node) == {
+        "/rig/keys/lg_key": ["create.transform.translate.x"]
+    }
+
+    # the params removed are exported as defaults
+    exported = d2gt.gaffer_export(node)["children"]["lg_key"]["params"]
+    assert exported == children["lg_key"]["params"], exported
+
+    children["lg_key"]["params"] = dict()
+    gaffer = d2gt.D2gtGaffer(gafferdict=_get_gafferdict(children))
+    gaffer.node = node
+    gaffer.sync_packages()
+    params = _get_tree(node)["/rig/keys/lg_key"][1]
+    assert params["create.transform.translate.x"] == 0, params
+
+    # nothing left to reset
+    standin.reset()
+    stats = gaffer.sync_packages()
+    assert not any(stats.values()), stats
+    assert standin.CALLS["Parameter.setValue"] == 0, standin.CALLS
+
+    print("[test11] Finished")
+    return
+
+
+def test12():
+    """
+    test token values are only unbaked as whole words.
+    """
+    unbaker = d2gt.TokenUnbaker(d2gt.TokenDict({
+        "__type": "d2gt_token",
+        "take": "1",
+        "spot": "shaders.spot",
+        "lgt": "/root/world/lgt/",
+    }))
+    assert unbaker.unbake_string("1") == "<take>"
+    assert unbaker.unbake_string("/lights/1/key") == "/lights/<take>/key"
+    for source in ("10", "v012", "/lights/v1", "lg_1", "shaders.spotlight"):
+        assert unbaker.unbake_string(source) == source, source
+    assert unbaker.unbake_string("shaders.spot.exposure") == "<spot>.exposure"
+    assert unbaker.unbake_string("/root/world/lgt/key") == "<lgt>key"
+
+    print("[test12] Finished")
+    return
+
+
+def test13():
+    """
+    test an invalid log level from the environment falls back to INFO.
+    """
+    environ = dict(os.environ)
+    try:
+        os.environ.pop("TEST13_LOG_LEVEL", None)
+        assert tracing.get_env_level("TEST13_LOG_LEVEL") == logging.INFO
+        os.environ["TEST13_LOG_LEVEL"] = "debug"
+        assert tracing.get_env_level("TEST13_LOG_LEVEL") == logging.DEBUG
+        os.environ["TEST13_LOG_LEVEL"] = "15"
+        assert tracing.get_env_level("TEST13_LOG_LEVEL") == 15
+        os.environ["TEST13_LOG_LEVEL"] = "LOUD"
+        assert tracing.get_env_level("TEST13_LOG_LEVEL") == logging.INFO
+        assert tracing.get_env_level("TEST13_LOG_LEVEL", logging.ERROR) == logging.ERROR
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+    print("[test13] Finished")
+    return
+
+
+if __name__ == '__main__':
+
+    test01()
+    test02()
+    test03()
+    test04()
+    test05()
+    test06()
+    test07()
+    test08()
+    test09()
+    test10()
+    test11()
+    test12()
+    test13()
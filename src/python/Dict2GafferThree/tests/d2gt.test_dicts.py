@@ -2,9 +2,17 @@
 python>3
 """
 import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
 from pathlib import Path
 from typing import List, Type, Optional
 
+# for lxmcommon
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
 import d2gt
 
 
@@ -37,50 +45,627 @@ def test02():
     scene = str(Path("testGafferA.json").resolve())
 
     gd = d2gt.GafferDict(scene, tokendict=td)
-    # we iter a first time through all package to assign their parent
-    pkg2create_dict = gd.children
-    pkg2create_list = list(pkg2create_dict.values())  # type: List[d2gt.GafferChildrenDict]
+    pkg2create_list = d2gt.plan_packages(gd.children.values())
+
+    print("pkg2create_list2 final order:")
+    planned = {""}
     for pkg2create in pkg2create_list:
-        pkg = pkg2create_dict.get(pkg2create.direct_parent)
-        if pkg:
-            pkg2create.parent = pkg
+        print(f"- {pkg2create.name} with path = {pkg2create.path}")
+        assert pkg2create.location in planned, pkg2create.path
+        planned.add(pkg2create.path)
+
+    # intermediate locations have been added
+    assert "/rig/BOB/GAP" in planned
+    return
+
+
+def test03():
+    """
+    test tokens are baked in nested keys, values and lists.
+    """
+
+    token = Path("testTokenA.json").resolve()
+    td = d2gt.TokenDict(str(token))
+
+    baker = d2gt.TokenBaker(td)
+    source = {
+        "<lg_spot>": ["<FOO45>.5", {"material.<exposure>": "<lg_spot>"}],
+        "untouched": 1,
+    }
+    baked = baker.bake(source)
+
+    assert baked == {
+        "ArnoldSpotLightPackage": [
+            "45.5",
+            {"material.params.arnoldSurfaceShader.exposure": "ArnoldSpotLightPackage"}
+        ],
+        "untouched": 1,
+    }, baked
+    # source is not modified
+    assert "<lg_spot>" in source
 
-    # DEBUG
+    # but dict_bake_tokens still bake in place
+    result = d2gt.dict_bake_tokens(source, td)
+    assert result is source, result
+    assert source == baked, source
+
+    try:
+        baker.bake("<NOTATOKEN>")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("missing token should raise a ValueError")
+
+    print("[test03] Finished")
+    return
+
+
+def test04():
+    """
+    test planning a deep hierarchy where children are listed before parents.
+    """
+    depth = 20
+    children = dict()
+    for index in range(10000):
+        level = index % depth
+        parent = "".join(
+            "/pkg{}".format(index - level + i) for i in range(level)
+        )
+        children["pkg{}".format(index)] = {
+            "parent": parent,
+            "class": "RigPackage",
+        }
+
+    scene = {
+        "__type": "d2gt_gaffer",
+        "name": "GafferThree_deep",
+        # reversed so children are always listed before their parent
+        "children": dict(reversed(list(children.items()))),
+    }
+    gd = d2gt.GafferDict(scene, tokendict=d2gt.TokenDict({"__type": "d2gt_token"}))
+
+    start = time.perf_counter()
+    pkg2create_list = d2gt.plan_packages(gd.children.values())
+    print(f"[test04] planned in {time.perf_counter() - start:.4f}s")
+
+    assert len(pkg2create_list) == len(children)
+    planned = {""}
     for pkg2create in pkg2create_list:
-        parent = pkg2create.parent
-        parent = parent.name if parent else parent
-        children = pkg2create.children
-        children = list(map(lambda c: c.name, children)) if children else children
-        print(
-            f"{pkg2create.name}\n"
-            f"   parent = {parent},\n"
-            f"   children = {children}\n"
+        assert pkg2create.location in planned, pkg2create.path
+        planned.add(pkg2create.path)
+
+    # same order if planned again
+    assert pkg2create_list == d2gt.plan_packages(gd.children.values())
+
+    # duplicated path
+    gd.children["dup"] = d2gt.GafferChildrenDict(
+        {"parent": "", "class": "RigPackage"}, name="pkg0"
+    )
+    try:
+        d2gt.plan_packages(gd.children.values())
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicated path should raise a ValueError")
+
+    print("[test04] Finished")
+    return
+
+
+def test05():
+    """
+    test the GafferDict disk cache is faster and invalidated on file change.
+    """
+    tmpdir = Path(tempfile.mkdtemp())
+    cache_dir = str(tmpdir / "cache")
+
+    token = {
+        "__type": "d2gt_token",
+        "lg_spot": "ArnoldSpotLightPackage",
+        "exposure": "shaders.arnoldLightParams.exposure",
+        "color": "shaders.arnoldLightParams.color",
+    }
+    children = dict()
+    for index in range(5000):
+        children[f"lg_spot{index}"] = {
+            "parent": f"/rig{index % 50}",
+            "class": "<lg_spot>",
+            "params": {
+                "material.<exposure>.enable": 1,
+                "material.<exposure>.value": index,
+                "material.<color>.enable": 1,
+                "material.<color>.value.i0": 0.5,
+                "material.<color>.value.i1": 0.5,
+                "material.<color>.value.i2": 0.5,
+            }
+        }
+    scene = {"__type": "d2gt_gaffer", "name": "GafferThree_cache", "children": children}
+
+    token_path = tmpdir / "token.json"
+    token_path.write_text(json.dumps(token))
+    gaffer_path = tmpdir / "gaffer.json"
+    gaffer_path.write_text(json.dumps(scene))
+
+    start = time.perf_counter()
+    cold = d2gt.load_gafferdict(str(gaffer_path), str(token_path), cache_dir)
+    cold_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm = d2gt.load_gafferdict(str(gaffer_path), str(token_path), cache_dir)
+    warm_time = time.perf_counter() - start
+    # what a build needs: every child converted
+    warm.children.values()
+    built_time = time.perf_counter() - start
+
+    print(f"[test05] cold {cold_time:.4f}s, warm {warm_time:.4f}s "
+          f"({cold_time / warm_time:.1f}x), warm with every child accessed "
+          f"{built_time:.4f}s ({cold_time / built_time:.1f}x)")
+    assert warm == cold
+    assert isinstance(warm.children["lg_spot3"], d2gt.GafferChildrenDict)
+    assert warm.children["lg_spot3"].class_ == "ArnoldSpotLightPackage"
+    assert built_time < cold_time
+
+    # modifying the token file invalidates the entry
+    token["lg_spot"] = "ArnoldQuadLightPackage"
+    token_path.write_text(json.dumps(token))
+    modified = d2gt.load_gafferdict(str(gaffer_path), str(token_path), cache_dir)
+    assert modified.children["lg_spot3"].class_ == "ArnoldQuadLightPackage"
+    # previous entry removed
+    assert len(os.listdir(cache_dir)) == 1, os.listdir(cache_dir)
+
+    # another token file for the same gaffer has its own entry
+    other_path = tmpdir / "token_other.json"
+    other_path.write_text(json.dumps(token))
+    d2gt.load_gafferdict(str(gaffer_path), str(other_path), cache_dir)
+    d2gt.load_gafferdict(str(gaffer_path), str(token_path), cache_dir)
+    assert len(os.listdir(cache_dir)) == 2, os.listdir(cache_dir)
+
+    # the cache directory is private, and not used if others can write in it
+    assert os.stat(cache_dir).st_mode & 0o077 == 0, oct(os.stat(cache_dir).st_mode)
+    shared_dir = tmpdir / "shared"
+    shared_dir.mkdir()
+    shared_dir.chmod(0o777)
+    shared = d2gt.load_gafferdict(str(gaffer_path), str(token_path), str(shared_dir))
+    assert shared == modified
+    assert not os.listdir(shared_dir), os.listdir(shared_dir)
+
+    # default cache directory is per user
+    environ = dict(os.environ)
+    try:
+        os.environ.pop("D2GT_CACHE_DIR", None)
+        os.environ["KATANA_USER_RESOURCE_DIRECTORY"] = str(tmpdir)
+        assert d2gt.get_cache_dir() == str(tmpdir / "d2gt_cache")
+        del os.environ["KATANA_USER_RESOURCE_DIRECTORY"]
+        assert d2gt.get_cache_dir().startswith(os.path.expanduser("~"))
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+    print("[test05] Finished")
+    return
+
+
+def test06():
+    """
+    test templates and generated children.
+    """
+    token = {
+        "__type": "d2gt_token",
+        "lg_spot": "ArnoldSpotLightPackage",
+        "exposure": "shaders.arnoldLightParams.exposure",
+    }
+    scene = {
+        "__type": "d2gt_gaffer",
+        "name": "GafferThree_ring",
+        "templates": {
+            "spot": {
+                "class": "<lg_spot>",
+                "params": {
+                    "material.<exposure>.enable": 1,
+                    "material.<exposure>.value": 2,
+                }
+            }
+        },
+        "children": {
+            "lg_key": {
+                "parent": "/rig",
+                "template": "spot",
+                "params": {"material.<exposure>.value": 5}
+            },
+            "lg_ring_{i}": {
+                "parent": "/rig/ring",
+                "template": "spot",
+                "generate": {
+                    "mode": "zip",
+                    "vars": {
+                        "i": {"range": [0, 64]},
+                        "angle": {"range": [0, 360, 5.625]},
+                    }
+                },
+                "params": {
+                    "create.transform.rotate.y": "{angle}",
+                    "create.name": "ring_{i}_{unknown}",
+                }
+            },
+        }
+    }
+    gd = d2gt.GafferDict(scene, tokendict=d2gt.TokenDict(token))
+
+    assert len(gd.children) == 65, len(gd.children)
+    # generated children are only built when accessed
+    assert isinstance(dict.__getitem__(gd.children, "lg_ring_1"), tuple)
+
+    ring1 = gd.children["lg_ring_1"]
+    ring63 = gd.children["lg_ring_63"]
+    assert ring1.class_ == "ArnoldSpotLightPackage", ring1
+    assert ring1.path == "/rig/ring/lg_ring_1", ring1.path
+    assert ring63.params["create.transform.rotate.y"] == 63 * 5.625, ring63.params
+    assert ring63.params["create.name"] == "ring_63_{unknown}", ring63.params
+    assert ring63.params["material.shaders.arnoldLightParams.exposure.value"] == 2
+    # template params are shared, not copied
+    assert ring1.params.layers[-1] is ring63.params.layers[-1]
+    assert ring1.params.layers[-1] is gd.children["lg_key"].params.layers[-1]
+
+    # overrides
+    lg_key = gd.children["lg_key"]
+    assert lg_key.params["material.shaders.arnoldLightParams.exposure.value"] == 5
+    lg_key.params["material.shaders.arnoldLightParams.exposure.value"] = 8
+    assert ring1.params["material.shaders.arnoldLightParams.exposure.value"] == 2
+
+    plan = d2gt.BuildPlan.compile(gd)
+    assert len(plan.ops) > 65
+
+    # serialized with every child built
+    data = json.loads(json.dumps(gd.to_dict()))
+    assert len(data["children"]) == 65, len(data["children"])
+    assert data["children"]["lg_ring_63"]["params"]["create.transform.rotate.y"] == 63 * 5.625
+    assert data["children"]["lg_key"]["params"][
+        "material.shaders.arnoldLightParams.exposure.value"
+    ] == 8, data["children"]["lg_key"]
+
+    # range step of 0
+    scene["children"] = {
+        "lg_{i}": {"class": "<lg_spot>", "generate": {"vars": {"i": {"range": [0, 4, 0]}}}}
+    }
+    try:
+        d2gt.GafferDict(scene, tokendict=d2gt.TokenDict(token))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a range step of 0 should raise a ValueError")
+
+    # duplicated generated names
+    scene["children"] = {
+        "lg_{i}": {"class": "<lg_spot>", "generate": {"vars": {"i": [0, 0]}}}
+    }
+    try:
+        d2gt.GafferDict(scene, tokendict=d2gt.TokenDict(token))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicated names should raise a ValueError")
+
+    print("[test06] Finished")
+    return
+
+
+def test07():
+    """
+    test splitting packages in shards.
+    """
+    children = {"lg_root": {"parent": "", "class": "ArnoldQuadLightPackage"}}
+    for rig in ("rigA", "rigB"):
+        for index in range(25):
+            children[f"{rig}_lg{index}"] = {
+                "parent": f"/{rig}/sub{index % 2}",
+                "class": "ArnoldSpotLightPackage",
+            }
+    scene = {"__type": "d2gt_gaffer", "name": "GafferThree_big", "children": children}
+    gd = d2gt.GafferDict(scene, tokendict=d2gt.TokenDict({"__type": "d2gt_token"}))
+
+    shards = d2gt.plan_shards(gd.children.values())
+    assert list(shards) == ["root", "rigA", "rigB"], list(shards)
+    # rig + 2 sub + 25 lights
+    assert len(shards["rigA"]) == 28, len(shards["rigA"])
+
+    shards = d2gt.plan_shards(gd.children.values(), max_packages=10)
+    for shard_name, packages in shards.items():
+        assert len(packages) <= 10, (shard_name, len(packages))
+        paths = {""}
+        for package in packages:
+            # ancestors are always in the shard
+            assert package.location in paths, (shard_name, package.path)
+            paths.add(package.path)
+
+    lights = [
+        package.path for packages in shards.values() for package in packages
+        if package.class_ != "RigPackage"
+    ]
+    assert sorted(lights) == sorted(
+        package.path for package in gd.children.values()
+        if package.class_ != "RigPackage"
+    )
+
+    # same result every time
+    again = d2gt.plan_shards(gd.children.values(), max_packages=10)
+    assert [
+        [package.path for package in packages] for packages in shards.values()
+    ] == [
+        [package.path for package in packages] for packages in again.values()
+    ]
+
+    # adding a light doesn't move the other ones while the parts count holds
+    def get_assignment(shards):
+        return {
+            package.path: shard_name
+            for shard_name, packages in shards.items()
+            for package in packages if package.class_ != "RigPackage"
+        }
+
+    before = get_assignment(shards)
+    children["rigA_lgNew"] = {"parent": "/rigA/sub0", "class": "ArnoldSpotLightPackage"}
+    gd = d2gt.GafferDict(scene, tokendict=d2gt.TokenDict({"__type": "d2gt_token"}))
+    shards = d2gt.plan_shards(gd.children.values(), max_packages=10)
+    after = get_assignment(shards)
+    assert len(after) == len(before) + 1
+    moved = [path for path in before if after[path] != before[path]]
+    rig_a = [name for name in shards if name.startswith("rigA")]
+    print(f"[test07] {len(moved)}/{len(before)} lights moved, rigA parts {rig_a}")
+    # a light only moves to the new part of its shard
+    assert all(after[path] == rig_a[-1] for path in moved), moved
+    assert len(moved) <= len(before) // 4, moved
+
+    try:
+        d2gt.plan_shards(gd.children.values(), max_packages=2)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("max_packages lower than depth should raise")
+
+    print("[test07] Finished")
+    return
+
+
+def test08():
+    """
+    test preparing a directory of GafferDict in a process pool.
+    """
+    tmpdir = Path(tempfile.mkdtemp())
+    token_path = tmpdir / "token.json"
+    token_path.write_text(json.dumps({"__type": "d2gt_token", "lg_spot": "ArnoldSpotLightPackage"}))
+
+    for index in range(4):
+        scene = {
+            "__type": "d2gt_gaffer",
+            "name": f"GafferThree_{index}",
+            "children": {
+                f"lg{light}": {"parent": "/rig", "class": "<lg_spot>"}
+                for light in range(100)
+            },
+        }
+        (tmpdir / f"rig{index}.json").write_text(json.dumps(scene))
+
+    # unknown token
+    (tmpdir / "rig_broken.json").write_text(json.dumps({
+        "__type": "d2gt_gaffer",
+        "name": "GafferThree_broken",
+        "children": {"lg": {"class": "<missing>"}},
+    }))
+
+    prepared = d2gt.batch_prepare(
+        str(tmpdir), str(token_path), processes=2, use_cache=False
+    )
+    assert [Path(path).name for path in prepared] == [
+        "rig0.json", "rig1.json", "rig2.json", "rig3.json", "rig_broken.json"
+    ], list(prepared)
+
+    plan, error = prepared[str(tmpdir / "rig2.json")]
+    assert error is None, error
+    assert plan.name == "GafferThree_2", plan.name
+    # rig + 100 lights
+    assert len(plan.ops) == 101, len(plan.ops)
+
+    plan, error = prepared[str(tmpdir / "rig_broken.json")]
+    assert plan is None and "ValueError" in error, error
+
+    # same result in the current process
+    serial = d2gt.batch_prepare(
+        str(tmpdir), str(token_path), processes=1, use_cache=False
+    )
+    assert [value[0] for value in serial.values()] == [
+        value[0] for value in prepared.values()
+    ]
+
+    # forked where possible, no process pool at all in Katana
+    assert d2gt._get_pool_context().get_start_method() == "fork"
+    get_all_start_methods = multiprocessing.get_all_start_methods
+    sys.modules["Katana"] = type(sys)("Katana")
+    try:
+        assert d2gt._get_pool_context() is None
+        multiprocessing.get_all_start_methods = lambda: ["spawn"]
+        assert d2gt._get_pool_context() is None
+        sys.modules.pop("Katana")
+        assert d2gt._get_pool_context().get_start_method() == "spawn"
+        sys.modules["Katana"] = type(sys)("Katana")
+        spawnless = d2gt.batch_prepare(
+            str(tmpdir), str(token_path), processes=2, use_cache=False
         )
+        assert list(spawnless) == list(serial), list(spawnless)
+    finally:
+        multiprocessing.get_all_start_methods = get_all_start_methods
+        sys.modules.pop("Katana", None)
+
+    print("[test08] Finished")
+    return
 
-    # reorder the list where firstindex = first package to create
-    pkg2create_prio = list()
-    pkg2create_low = list()
-    for pkg in pkg2create_list:
-        if pkg.children:
-            if pkg2create_prio and pkg2create_prio[-1].name == pkg.direct_parent:
-                pkg2create_prio.append(pkg)
-            else:
-                pkg2create_prio.insert(0, pkg)
+
+def test09():
+    """
+    test layered TokenDict resolution.
+    """
+    engine = d2gt.TokenDict({
+        "__type": "d2gt_token",
+        "lg_spot": "ArnoldSpotLightPackage",
+        "params": "shaders.arnoldLightParams",
+        "exposure": "<params>.exposure",
+        "texdir": "/textures/default",
+    })
+    show = d2gt.TokenDict({
+        "__type": "d2gt_token",
+        "texdir": "/show/<seq>/textures",
+        "seq": "sq000",
+    })
+    sequence = d2gt.TokenDict({"__type": "d2gt_token", "seq": "sq010"})
+
+    tokendict = d2gt.TokenResolver(engine, show, sequence).resolve()
+    assert tokendict["exposure"] == "shaders.arnoldLightParams.exposure"
+    assert tokendict["texdir"] == "/show/sq010/textures", tokendict
+    assert d2gt.TokenBaker(tokendict).bake("material.<exposure>.value") == (
+        "material.shaders.arnoldLightParams.exposure.value"
+    )
+
+    for tokens in (
+            {"a": "<b>", "b": "<c>", "c": "x<a>"},
+            {"a": "<a>"},
+            {"a": "<missing>"},
+    ):
+        tokens["__type"] = "d2gt_token"
+        try:
+            d2gt.TokenResolver(d2gt.TokenDict(tokens)).resolve()
+        except ValueError as excp:
+            print(f"[test09] expected error: {excp}")
         else:
-            pkg2create_low.append(pkg)
+            raise AssertionError(f"should raise a ValueError: {tokens}")
 
-    pkg2create_list = pkg2create_prio
-    pkg2create_list.extend(pkg2create_low)
+    # 3 layers of 10k tokens, each one using another token
+    layers = list()
+    for layer in range(3):
+        tokens = {"__type": "d2gt_token", "token0": f"layer{layer}"}
+        for index in range(1, 10000):
+            tokens[f"token{index}"] = f"<token{index // 2}>/{index}"
+        layers.append(d2gt.TokenDict(tokens))
 
-    print("pkg2create_list2 final order:")
-    for pkg2create in pkg2create_list:
-        parent = pkg2create.parent
-        parent = parent.name if parent else parent
-        print(f"- {pkg2create.name} with parent = <{parent}> and path = {pkg2create.path}")
+    start = time.perf_counter()
+    tokendict = d2gt.TokenResolver(*layers).resolve()
+    print(f"[test09] resolved 3x10k tokens in {time.perf_counter() - start:.4f}s")
+    assert tokendict["token6"] == "layer2/1/3/6", tokendict["token6"]
+
+    print("[test09] Finished")
+    return
+
+
+def test10():
+    """
+    test compiling linking rules to CEL.
+    """
+    scene = {
+        "__type": "d2gt_gaffer",
+        "name": "GafferThree_linking",
+        "children": {
+            "lg_key": {"parent": "/rig/keys", "class": "<lg_spot>"},
+            "lg_key2": {"parent": "/rig/keys", "class": "<lg_spot>"},
+            "lg_rim": {"parent": "/rig", "class": "<lg_spot>"},
+        },
+        "linking": {
+            "lights": {"keys": ["/rig/keys"], "all": ["/rig/*"], "rim": "lg_rim"},
+            "collections": {
+                "chars": ["<geo>/chars/bob", "<geo>/chars"],
+                "props": ["<geo>/props/table", "<geo>/props//*"],
+            },
+            "rules": [
+                {"lights": "keys", "collections": "chars"},
+                {"lights": ["all"], "collections": ["props"]},
+                {"lights": "rim", "collections": "chars", "target": "shadowlinking"},
+            ],
+        },
+    }
+    token = {"__type": "d2gt_token", "lg_spot": "ArnoldSpotLightPackage", "geo": "/root/world/geo"}
+    gd = d2gt.GafferDict(scene, tokendict=d2gt.TokenDict(token))
+
+    lg_key = gd.children["lg_key"]
+    assert lg_key.params["linking.objects"] == (
+        "/root/world/geo/props//* /root/world/geo/chars /root/world/geo/props/table"
+    ), lg_key.params
+    # same rules, same CEL object
+    assert lg_key.params["linking.objects"] is gd.children["lg_key2"].params["linking.objects"]
+    lg_rim = gd.children["lg_rim"]
+    assert lg_rim.params["linking.objects"] == (
+        "/root/world/geo/props//* /root/world/geo/props/table"
+    ), lg_rim.params
+    assert lg_rim.params["shadowlinking.objects"] == "/root/world/geo/chars"
+
+    # a sibling sorted between a path and its children
+    rules = d2gt.LinkingRules(
+        {"collections": {"ab": ["/a/b", "/a/b-x", "/a/b/c", "/a/b-x/d", "/a/bc"]}}, []
+    )
+    assert rules.get_cel(frozenset(["ab"])) == "/a/b-x /a/b /a/bc", rules.get_cel(frozenset(["ab"]))
+    # and light groups
+    rules = d2gt.LinkingRules(
+        {"lights": {"ab": "/a/b"}},
+        [
+            d2gt.GafferChildHead(name, path, "ArnoldSpotLightPackage")
+            for name, path in [("b", "/a/b"), ("x", "/a/b-x"), ("c", "/a/b/c"), ("bc", "/a/bc")]
+        ]
+    )
+    assert rules.resolve_group("ab") == ["/a/b", "/a/b/c"], rules.resolve_group("ab")
+
+    # generated children are still only built when accessed
+    scene["children"]["lg_fill_{i}"] = {
+        "parent": "/rig/{side}",
+        "class": "<lg_spot>",
+        "generate": {"mode": "zip", "vars": {"i": [0, 1], "side": ["keys", "fills"]}},
+    }
+    gd = d2gt.GafferDict(scene, tokendict=d2gt.TokenDict(token))
+    assert isinstance(dict.__getitem__(gd.children, "lg_fill_0"), tuple)
+    assert isinstance(dict.__getitem__(gd.children, "lg_fill_1"), tuple)
+    lg_fill0 = gd.children["lg_fill_0"]
+    assert lg_fill0.path == "/rig/keys/lg_fill_0", lg_fill0.path
+    assert lg_fill0.params["linking.objects"] == gd.children["lg_key"].params["linking.objects"]
+    assert gd.children["lg_fill_1"].params["linking.objects"] == (
+        "/root/world/geo/props//* /root/world/geo/props/table"
+    ), gd.children["lg_fill_1"].params
+
+    # 5k lights x 500 collections
+    children = {
+        f"lg{index}": {"parent": f"/rig/grp{index % 50}", "class": "ArnoldSpotLightPackage"}
+        for index in range(5000)
+    }
+    collections = {
+        f"col{index}": [f"/root/world/geo/set{index % 20}/asset{index}", f"/root/world/geo/set{index % 20}"]
+        for index in range(500)
+    }
+    rules = [
+        {"lights": f"grp{index % 50}", "collections": [f"col{(index * 7 + i) % 500}" for i in range(50)]}
+        for index in range(100)
+    ]
+    linking = {
+        "lights": {f"grp{index}": f"/rig/grp{index}" for index in range(50)},
+        "collections": collections,
+        "rules": rules,
+    }
+    gd = d2gt.GafferDict(
+        {"__type": "d2gt_gaffer", "name": "GafferThree_big", "children": children},
+        tokendict=d2gt.TokenDict({"__type": "d2gt_token"})
+    )
+    start = time.perf_counter()
+    compiled = d2gt.LinkingRules(linking, gd.children.values()).compile()
+    print(f"[test10] compiled 5k lights x 500 collections in {time.perf_counter() - start:.4f}s")
+    assert len(compiled) == 5000, len(compiled)
+    assert len(set(map(id, compiled.values()))) <= 50
+
+    print("[test10] Finished")
     return
 
 
 if __name__ == '__main__':
 
     # test01()
-    test02()
\ No newline at end of file
+    test02()
+    test03()
+    test04()
+    test05()
+    test06()
+    test07()
+    test08()
+    test09()
+    test10()
@@ -0,0 +1,329 @@
+"""
+python>3
+
+Stand-in for the GafferThree node and PackageSuperToolAPI packages, only
+implementing what d2gt use. Allow to build a D2gtGaffer outside Katana.
+
+Every API call is counted in ``CALLS``. The calls that modify the graph
+(``createChildPackage``, ``getParameter``, ``setValue`` and
+``checkDynamicParameters``) can also be recorded in order in ``HISTORY`` with
+their arguments, see ``record()``.
+"""
+import collections
+
+CALLS = collections.Counter()
+# list of (call name, object, arguments) when recording
+HISTORY = list()
+_RECORDING = [False]
+
+
+def record(enable=True):
+    """
+    Start or stop recording the graph calls in ``HISTORY``.
+
+    Args:
+        enable(bool):
+    """
+    _RECORDING[0] = enable
+    return
+
+
+def _log(call_name, obj, *args):
+    CALLS[call_name] += 1
+    if _RECORDING[0]:
+        HISTORY.append((call_name, obj, args))
+    return
+
+
+class Parameter(object):
+
+    def __init__(self, name, value=None, needs_string=False, group=False):
+        self.name = name
+        self.value = value
+        self.needs_string = needs_string
+        self.group = group
+        self.children = collections.OrderedDict()
+
+    def __repr__(self):
+        return "Parameter({})".format(self.name)
+
+    def getName(self):
+        CALLS["Parameter.getName"] += 1
+        return self.name
+
+    def getType(self):
+        CALLS["Parameter.getType"] += 1
+        if self.group or self.children:
+            return "group"
+        return "string" if isinstance(self.value, str) else "number"
+
+    def getChildren(self):
+        CALLS["Parameter.getChildren"] += 1
+        return list(self.children.values())
+
+    def getChild(self, name):
+        CALLS["Parameter.getChild"] += 1
+        return self.children.get(name)
+
+    def getNumChildren(self):
+        CALLS["Parameter.getNumChildren"] += 1
+        return len(self.children)
+
+    def isExpression(self):
+        CALLS["Parameter.isExpression"] += 1
+        return False
+
+    def getValue(self, time):
+        CALLS["Parameter.getValue"] += 1
+        return self.value
+
+    def setValue(self, value, time):
+        _log("Parameter.setValue", self, value)
+        if self.needs_string and not isinstance(value, str):
+            raise TypeError("Parameter.setValue(): value needs a string")
+        self.value = value
+
+    def createChildString(self, name, value):
+        CALLS["Parameter.createChildString"] += 1
+        child = Parameter(name, value)
+        self.children[name] = child
+        return child
+
+
+class Node(object):
+    """
+    Any parameter path asked is created on the fly, except the ones
+    starting with <dynamic_prefix> that only exist once
+    ``checkDynamicParameters()`` has been called.
+    """
+
+    def __init__(self, name, dynamic_prefix=None, string_params=()):
+        self.name = name
+        self.dynamic_prefix = dynamic_prefix
+        self.string_params = string_params
+        self.dynamic_ready = False
+        self.root_parameter = Parameter(name, group=True)
+        # {path: Parameter} of the leaf parameters created
+        self.parameters = collections.OrderedDict()
+
+    def __repr__(self):
+        return "Node({})".format(self.name)
+
+    def getName(self):
+        CALLS["Node.getName"] += 1
+        return self.name
+
+    def getParameters(self):
+        CALLS["Node.getParameters"] += 1
+        return self.root_parameter
+
+    def getParameter(self, path):
+        _log("Node.getParameter", self, path)
+        param = self.parameters.get(path)
+        if param is not None:
+            return param
+
+        is_dynamic = self.dynamic_prefix and path.startswith(self.dynamic_prefix)
+        if is_dynamic and not self.dynamic_ready:
+            return None
+
+        param = self.root_parameter
+        for name in path.split("."):
+            child = param.children.get(name)
+            if child is None:
+                child = Parameter(name, needs_string=path in self.string_params)
+                param.children[name] = child
+            param = child
+
+        self.parameters[path] = param
+        return param
+
+    def checkDynamicParameters(self):
+        _log("Node.checkDynamicParameters", self)
+        self.dynamic_ready = True
+
+
+class Package(object):
+
+    def __init__(self, class_, name, parent=None):
+        self.class_ = class_
+        self.name = name
+        self.parent = parent
+        self.children = list()
+        self.nodes = {
+            "create": Node(name + "_create", string_params=("name",)),
+            "material": Node(name + "_material", dynamic_prefix="shaders."),
+            "shadowlinking": Node(name + "_shadowlinking"),
+            "linking": Node(name + "_linking"),
+            "orientconstraint": Node(name + "_orientconstraint"),
+            "pointconstraint": Node(name + "_pointconstraint"),
+        }
+
+    def __repr__(self):
+        return "{}({})".format(self.class_, self.getPath())
+
+    def getPath(self):
+        if self.parent is None:
+            return ""
+        return self.parent.getPath() + "/" + self.name
+
+    def getName(self):
+        CALLS["Package.getName"] += 1
+        return self.name
+
+    def getParentPackage(self):
+        CALLS["Package.getParentPackage"] += 1
+        return self.parent
+
+    def getChildPackages(self):
+        CALLS["Package.getChildPackages"] += 1
+        return list(self.children)
+
+    def createChildPackage(self, class_, name):
+        _log("Package.createChildPackage", self, class_, name)
+        package = get_package_class(class_)(class_, name, parent=self)
+        self.children.append(package)
+        return package
+
+    def adoptPackage(self, package):
+        CALLS["Package.adoptPackage"] += 1
+        package.parent.children.remove(package)
+        package.parent = self
+        self.children.append(package)
+
+    def delete(self):
+        CALLS["Package.delete"] += 1
+        self.parent.children.remove(self)
+        self.parent = None
+
+    def getCreateNode(self):
+        CALLS["Package.getCreateNode"] += 1
+        return self.nodes["create"]
+
+    def getMaterialNode(self):
+        CALLS["Package.getMaterialNode"] += 1
+        return self.nodes["material"]
+
+    def getShadowLinkingNode(self):
+        CALLS["Package.getShadowLinkingNode"] += 1
+        return self.nodes["shadowlinking"]
+
+    def getLinkingNodes(self):
+        CALLS["Package.getLinkingNodes"] += 1
+        return self.nodes["linking"]
+
+    def getOrientConstraintNode(self):
+        CALLS["Package.getOrientConstraintNode"] += 1
+        return self.nodes["orientconstraint"]
+
+    def getPointConstraintNode(self):
+        CALLS["Package.getPointConstraintNode"] += 1
+        return self.nodes["pointconstraint"]
+
+
+_PACKAGE_CLASSES = dict()
+
+
+def get_package_class(class_):
+    """
+    Packages class names are used as the package type, so we create a
+    Package subclass per name. Light packages can't have children.
+
+    Args:
+        class_(str): package class name
+
+    Returns:
+        type:
+    """
+    package_class = _PACKAGE_CLASSES.get(class_)
+    if package_class is None:
+        attributes = dict()
+        if "Light" in class_:
+            attributes["createChildPackage"] = None
+        package_class = type(str(class_), (Package,), attributes)
+        _PACKAGE_CLASSES[class_] = package_class
+    return package_class
+
+
+class GafferThreeNode(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.root_package = Package("RootPackage", "")
+        self.root_parameter = Parameter(name, group=True)
+        self.parameters = self.root_parameter.children
+        self.parameters["rootLocation"] = Parameter("rootLocation")
+        self.parameters["syncSelection"] = Parameter("syncSelection")
+
+    def getName(self):
+        CALLS["GafferThreeNode.getName"] += 1
+        return self.name
+
+    def getType(self):
+        CALLS["GafferThreeNode.getType"] += 1
+        return "GafferThree"
+
+    def getRootPackage(self):
+        CALLS["GafferThreeNode.getRootPackage"] += 1
+        return self.root_package
+
+    def getParameters(self):
+        CALLS["GafferThreeNode.getParameters"] += 1
+        return self.root_parameter
+
+    def getParameter(self, path):
+        CALLS["GafferThreeNode.getParameter"] += 1
+        return self.parameters.get(path)
+
+    def setRootLocation(self, location):
+        CALLS["GafferThreeNode.setRootLocation"] += 1
+        self.parameters["rootLocation"].value = location
+
+    def setSyncSelection(self, sync):
+        CALLS["GafferThreeNode.setSyncSelection"] += 1
+        self.parameters["syncSelection"].value = int(sync)
+
+
+class UndoStack(object):
+    """
+    Stand-in for Katana's ``Utils.UndoStack``, the module using it must be
+    given this module as ``Utils``.
+    """
+
+    @staticmethod
+    def OpenGroup(name):
+        CALLS["UndoStack.OpenGroup"] += 1
+
+    @staticmethod
+    def CloseGroup():
+        CALLS["UndoStack.CloseGroup"] += 1
+
+
+def get_tree(node):
+    """
+    Args:
+        node(GafferThreeNode):
+
+    Returns:
+        dict: {path: (class, {param path: value})} of all packages on the node
+    """
+    tree = dict()
+    queue = [("", node.root_package)]
+    for path, package in queue:
+        for child in package.children:
+            child_path = path + "/" + child.name
+            params = dict(
+                (root + "." + param_path, param.value)
+                for root, child_node in child.nodes.items()
+                for param_path, param in child_node.parameters.items()
+            )
+            tree[child_path] = (child.class_, params)
+            queue.append((child_path, child))
+    return tree
+
+
+def reset():
+    CALLS.clear()
+    del HISTORY[:]
+    record(False)
+    return
@@ -1,8 +1,8 @@
 """
-VERSION = 0.0.5
+VERSION = 0.0.8
 
 Author: Liam Collod
-Last modified: 21/01/2022
+Last modified: 19/10/2026
 
 Script for Foundry's Katana software. (Python 2+)
 Easily find all local GSV in your Katana scene and their setup.
@@ -27,6 +27,8 @@ limitations under the License.
 """
 import json
 from collections import OrderedDict
+import os
+import struct
 import sys
 import logging
 # Python 2 ...
@@ -40,6 +42,9 @@ except ImportError:
 
 import NodegraphAPI
 
+# lazy and structured logging. see lxmcommon/
+from lxmcommon.tracing import Tracer, get_env_level
+
 
 """____________________________________________________________________________
 
@@ -70,7 +75,9 @@ def setup_logging(level):
     return logger
 
 
-logger = setup_logging(logging.INFO)
+# ex: FINDGSV_LOG_LEVEL=DEBUG to log each node found
+logger = setup_logging(get_env_level("FINDGSV_LOG_LEVEL"))
+tracer = Tracer(logger)
 
 
 """ config_dict(dict)
@@ -144,10 +151,12 @@ class GSVNode(object):
             param_path=self.sources[self.type]["values"]
         )
 
-        logger.debug(
-            "[GSVNode][__init__] Finished for node <{}>."
-            "gsv_name={},gsv_values={}"
-            "".format(node, self.gsv_name, self.gsv_values)
+        tracer.debug(
+            "[GSVNode][__init__] Finished for node <{node}>."
+            "gsv_name={gsv_name},gsv_values={gsv_values}",
+            node=node,
+            gsv_name=self.gsv_name,
+            gsv_values=self.gsv_values
         )
 
         return
@@ -186,6 +195,33 @@ class GSVNode(object):
         return output
 
 
+class GSVBranch(object):
+    """
+    Part of the nodegraph upstream of a GSVNode that is only evaluated when
+    the variable has the given value. The branch stops at the next GSVNodes
+    found upstream (they are included) as those are gating their own branches.
+
+    Args:
+        value(str or None):
+            variable value that enable this branch. None if the branch is
+            always evaluated whatever the variable value is.
+
+    Attributes:
+        nodes(list of NodegraphAPI.Node): all the nodes in this branch.
+        gsvnodes(list of GSVNode): GSVNodes found at the end of this branch.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.nodes = list()  # type: List[NodegraphAPI.Node]
+        self.gsvnodes = list()  # type: List[GSVNode]
+
+    def __str__(self):
+        return "GSVBranch(value={}, nodes={}, gsvnodes={})".format(
+            self.value, len(self.nodes), len(self.gsvnodes)
+        )
+
+
 class GSVLocal(object):
     """
     Represent a GSV as a python object. Allow to know which node is using this
@@ -220,6 +256,9 @@ class GSVLocal(object):
         return new_instance
 
     def __init__(self, name, scene):
+        # __new__ can return an existing instance, that we don't want to reset
+        if getattr(self, "scene", None) is scene:
+            return
         self.name = name
         self.scene = scene
         self.nodes = list()  # type: List[GSVNode]
@@ -264,13 +303,23 @@ class GSVLocal(object):
 
         return
 
-    def build(self):
+    def build(self, nodes=None):
+        """
 
-        self._build_nodes()
+        Args:
+            nodes(list of GSVNode or None):
+                nodes using this gsv if already known, else they are found in
+                the scene nodes.
+        """
+
+        if nodes is None:
+            self._build_nodes()
+        else:
+            self.nodes = list(nodes)
         self._build_values()
 
-        logger.debug(
-            "[GSVLocal][build] Finished for name=<{}>".format(self.name)
+        tracer.debug(
+            "[GSVLocal][build] Finished for name=<{name}>", name=self.name
         )
         return
 
@@ -284,7 +333,7 @@ class GSVLocal(object):
         return {
             "name": self.name,
             "values": self.values,
-            "nodes": map(str, self.nodes)
+            "nodes": list(map(str, self.nodes))
         }
 
 
@@ -297,62 +346,98 @@ class GSVScene(object):
 
         self.nodes = list()  # type: List[GSVNode]
         self.gsvs = list()  # type: List[GSVLocal]
-
-    def _build_nodes(self):
+        # cache of {GSVNode.kobj.getName(): List[GSVBranch]}
+        self._branches = dict()
+        # cache of {(GSVNode.kobj.getName(), costs, values): OrderedDict}
+        self._impacts = dict()
+        # cache of {GSVNode.kobj.getName(): GSVNode}
+        self._lookup = None
+
+    @staticmethod
+    def _iter_nodes():
         """
-        Find all the nodes in the nodegraph that use the gsv feature.
+        Yields:
+            GSVNode: for each node in the nodegraph that use the gsv feature.
         """
 
-        # reset self.nodes first
-        self.nodes = list()
-
         for node_class, _ in GSVNode.sources.items():
 
             nodes = NodegraphAPI.GetAllNodesByType(node_class)  # type: list
             for node in nodes:
-                self.nodes.append(GSVNode(node))
+                yield GSVNode(node)
 
             continue
 
-        logger.debug(
-            "[GSVLocal][_build_nodes] Finished. {} nodes found."
-            "".format(len(self.nodes))
+        return
+
+    def _build_nodes(self):
+        """
+        Find all the nodes in the nodegraph that use the gsv feature.
+        """
+
+        # reset self.nodes first
+        self._branches = dict()
+        self._impacts = dict()
+        self._lookup = None
+        self.nodes = list(self._iter_nodes())
+
+        tracer.debug(
+            "[GSVLocal][_build_nodes] Finished. {nodes} nodes found.",
+            nodes=len(self.nodes)
         )
 
         return
 
-    def _build_gsvs(self):
+    def _iter_gsvs(self):
         """
-        From the node list find what gsv is used and build its object.
+        From the node list find what gsv is used, build its object and yield
+        it as soon as it is built. The next one is only built once the
+        previous one has been consumed.
+
+        Yields:
+            GSVLocal:
         """
 
         # reset self.gsvs first
         self.gsvs = list()
 
+        # {gsv name: list of GSVNode} in order of first use
+        grouped = OrderedDict()
         for gsvnode in self.nodes:
+            grouped.setdefault(gsvnode.gsv_name, list()).append(gsvnode)
+
+        for name, gsvnodes in grouped.items():
 
-            gsv = GSVLocal(gsvnode.gsv_name, self)
+            gsv = GSVLocal(name, self)
             # gsv might be excluded, so it returns None
             if not gsv:
                 continue
-            # avoid adding multiples times the same instance
-            if gsv in self.gsvs:
-                continue
 
+            # we don't forget to build the gsv object if we want to use its
+            # attributes
+            gsv.build(nodes=gsvnodes)
             self.gsvs.append(gsv)
-            continue
+            yield gsv
 
-        # we don't forget to build the gsv object if we want to use its attributes
-        for gsvlocal in self.gsvs:
-            gsvlocal.build()
+            continue
 
-        logger.debug(
-            "[GSVLocal][_build_gsvs] Finished. {} gsv found."
-            "".format(len(self.gsvs))
+        tracer.debug(
+            "[GSVLocal][_iter_gsvs] Finished. {gsvs} gsv found.",
+            gsvs=len(self.gsvs)
         )
 
         return
 
+    def _build_gsvs(self):
+        """
+        From the node list find what gsv is used and build its object.
+        """
+
+        for _ in self._iter_gsvs():
+            pass
+
+        return
+
     def build(self):
 
         self._build_nodes()
@@ -360,9 +445,633 @@ class GSVScene(object):
 
         return
 
+    def iterbuild(self):
+        """
+        Same as ``build()`` but yield each GSVLocal as soon as it is built.
+        Useful to stream a report while the scene is still being parsed.
+
+        Yields:
+            GSVLocal:
+        """
+
+        self._build_nodes()
+        for gsv in self._iter_gsvs():
+            yield gsv
+
+        return
+
     def todict(self):
         return {"gsvs": list(map(lambda obj: obj.todict(), self.gsvs))}
 
+    def get_summary(self):
+        """
+        Count the gsvs, nodes and values used in the nodegraph without
+        building the scene: nodes are parsed one at a time and not kept, so
+        memory only depends on the number of distinct gsv values.
+
+        Returns:
+            OrderedDict: gsvs, nodes and values count.
+        """
+
+        # {gsv name: set of values}
+        values = OrderedDict()
+        nodes = 0
+
+        for gsvnode in self._iter_nodes():
+
+            if gsvnode.gsv_name in GSVLocal.excluded:
+                continue
+
+            nodes += 1
+            values.setdefault(gsvnode.gsv_name, set()).update(
+                map(str, gsvnode.gsv_values)
+            )
+            continue
+
+        summary = OrderedDict()
+        summary["gsvs"] = len(values)
+        summary["nodes"] = nodes
+        summary["values"] = sum(map(len, values.values()))
+        return summary
+
+    def get_branches(self, gsvnode):
+        """
+        Parse the nodegraph upstream of the given node to find which part of
+        it is enabled by each value of its variable. Result is cached.
+
+        Args:
+            gsvnode(GSVNode): node from ``self.nodes``
+
+        Returns:
+            list of GSVBranch:
+        """
+
+        name = gsvnode.kobj.getName()
+        branches = self._branches.get(name)
+        if branches is not None:
+            return branches
+
+        if self._lookup is None:
+            self._lookup = dict(
+                (node.kobj.getName(), node) for node in self.nodes
+            )
+        lookup = self._lookup
+        kobj = gsvnode.kobj
+        branches = list()
+
+        if gsvnode.type == "VariableSwitch":
+            # each input port correspond to the pattern at the same index
+            ports = kobj.getInputPorts()
+            for port, value in zip(ports, gsvnode.gsv_values):
+                branches.append(self._walk_branch(str(value), [port], lookup))
+
+        elif gsvnode.type == "VariableEnabledGroup":
+            # group inputs always pass through, content is only enabled when
+            # the variable match the pattern.
+            branches.append(
+                self._walk_branch(None, kobj.getInputPorts(), lookup)
+            )
+            ports = [
+                kobj.getReturnPort(port.getName())
+                for port in kobj.getOutputPorts()
+            ]
+            for value in gsvnode.gsv_values:
+                branches.append(self._walk_branch(str(value), ports, lookup))
+
+        else:
+            # unknown node type, we assume all inputs are always evaluated
+            branches.append(
+                self._walk_branch(None, kobj.getInputPorts(), lookup)
+            )
+
+        self._branches[name] = branches
+        return branches
+
+    @staticmethod
+    def _walk_branch(value, ports, lookup):
+        """
+
+        Args:
+            value(str or None): see GSVBranch
+            ports(list of NodegraphAPI.Port): ports to start the parsing from.
+            lookup(dict): node name: GSVNode
+
+        Returns:
+            GSVBranch:
+        """
+
+        branch = GSVBranch(value)
+
+        def is_gsvnode(node):
+            return node.getName() in lookup
+
+        for node in iter_upstream_nodes(ports, stop=is_gsvnode):
+            branch.nodes.append(node)
+            gsvnode = lookup.get(node.getName())
+            if gsvnode:
+                branch.gsvnodes.append(gsvnode)
+
+        return branch
+
+    def _get_active_nodes(self, gsvnode, value, values):
+        """
+        Walk the branches of the given node enabled by <value>, and through
+        the GSVNodes found upstream, the branches enabled by their own value.
+
+        Args:
+            gsvnode(GSVNode): node from ``self.nodes``
+            value(str): value of the node's variable
+            values(dict): gsv name: value, for the other variables. Nodes
+                whose variable is not in it have all their branches followed.
+
+        Returns:
+            dict: node name: NodegraphAPI.Node
+        """
+
+        active = dict()
+        visited = set()
+        stack = [(gsvnode, value)]
+
+        while stack:
+
+            current, current_value = stack.pop()
+            if id(current) in visited:
+                continue
+            visited.add(id(current))
+
+            for branch in self.get_branches(current):
+
+                if branch.value is not None and current_value is not None:
+                    if branch.value != current_value:
+                        continue
+
+                for node in branch.nodes:
+                    active[node.getName()] = node
+
+                for upstream in branch.gsvnodes:
+                    # the same variable has the same value everywhere
+                    if upstream.gsv_name == gsvnode.gsv_name:
+                        stack.append((upstream, value))
+                    else:
+                        stack.append(
+                            (upstream, values.get(upstream.gsv_name))
+                        )
+
+        return active
+
+    def get_impact(self, gsvnode, costs=None, values=None):
+        """
+        Measure how much of the nodegraph each value of the node's variable
+        enable upstream of it. Result is cached per node.
+
+        The GSVNodes found upstream are followed through the branches enabled
+        by their own value: the one being measured if they use the same
+        variable, else the one in <values>. If their variable is not in
+        <values>, all their branches are considered active.
+
+        For each value return a dict with :
+
+        - ``nodes`` : number of nodes active upstream with this value.
+        - ``exclusive`` : number of nodes only active with this value (so
+          switched in/out when the value change).
+        - ``cost`` : only if <costs> is given, sum of the weight of the active
+          nodes, where the weight is ``costs.get(node type, 1)``.
+
+        Args:
+            gsvnode(GSVNode): node from ``self.nodes``
+            costs(dict or None): node type: weight
+            values(dict or None): gsv name: value for the other variables.
+
+        Returns:
+            OrderedDict: value: impact dict
+        """
+
+        costs_key = tuple(sorted(costs.items())) if costs else None
+        values_key = tuple(sorted(values.items())) if values else None
+        cache_key = (gsvnode.kobj.getName(), costs_key, values_key)
+        impact = self._impacts.get(cache_key)
+        if impact is not None:
+            return impact
+
+        always = set()
+        per_value = OrderedDict()
+        for branch in self.get_branches(gsvnode):
+            if branch.value is None:
+                always.update(node.getName() for node in branch.nodes)
+                continue
+            if branch.value in per_value:
+                continue
+            per_value[branch.value] = self._get_active_nodes(
+                gsvnode, branch.value, values or dict()
+            )
+
+        # count in how many values a node is active to find exclusive ones
+        usage = dict()
+        for nodes in per_value.values():
+            for name in nodes:
+                usage[name] = usage.get(name, 0) + 1
+
+        impact = OrderedDict()
+        for value, active in per_value.items():
+
+            value_impact = OrderedDict()
+            value_impact["nodes"] = len(active)
+            value_impact["exclusive"] = len([
+                name for name in active
+                if name not in always and usage[name] == 1
+            ])
+            if costs:
+                value_impact["cost"] = sum([
+                    costs.get(node.getType(), 1) for node in active.values()
+                ])
+
+            impact[value] = value_impact
+            continue
+
+        self._impacts[cache_key] = impact
+        return impact
+
+    def get_gsv_impact(self, gsv, costs=None, values=None):
+        """
+        Combine the impact of all the nodes using the given gsv.
+        See ``get_impact()``.
+
+        Args:
+            gsv(GSVLocal): gsv from ``self.gsvs``
+            costs(dict or None): node type: weight
+            values(dict or None): gsv name: value for the other variables.
+
+        Returns:
+            OrderedDict:
+                value: impact dict with an additional ``switches`` key holding
+                the impact per node.
+        """
+
+        impact = OrderedDict()
+        for value in gsv.values:
+            impact[value] = OrderedDict()
+            impact[value]["nodes"] = 0
+            impact[value]["exclusive"] = 0
+            if costs:
+                impact[value]["cost"] = 0
+            impact[value]["switches"] = OrderedDict()
+
+        for gsvnode in gsv.nodes:
+
+            node_impact = self.get_impact(gsvnode, costs=costs, values=values)
+
+            for value, value_impact in node_impact.items():
+                # values are built from the nodes so this should not happen
+                if value not in impact:
+                    continue
+                for key, count in value_impact.items():
+                    impact[value][key] += count
+                impact[value]["switches"][str(gsvnode)] = value_impact
+
+            continue
+
+        return impact
+
+    def iter_combinations(self):
+        """
+        Lazily yield the distinct combinations of GSV values that change the
+        scene.
+
+        A GSVNode is considered reachable if it is not upstream of any other
+        GSVNode, or if it's upstream of a reachable GSVNode's branch enabled
+        by the current combination. Variables with no reachable GSVNode are
+        pruned from the combination, so two combinations that only differ by
+        an unreachable variable are yielded only once.
+
+        The full cartesian product of the values is never built, and each
+        step only walks the part of the graph enabled by its new value.
+        Scene must be built first.
+
+        Yields:
+            OrderedDict: gsv name: gsv value
+        """
+
+        gsvs = OrderedDict((gsv.name, gsv) for gsv in self.gsvs)
+        order = dict((name, index) for index, name in enumerate(gsvs))
+
+        gated = set()
+        for gsvnode in self.nodes:
+            for branch in self.get_branches(gsvnode):
+                gated.update(map(id, branch.gsvnodes))
+        roots = [node for node in self.nodes if id(node) not in gated]
+
+        combination = OrderedDict()
+        visited = set()
+        # {gsv name: list of GSVNode} reachable nodes whose variable has no
+        # value yet.
+        frontier = dict()
+
+        def expand(gsvnodes, added):
+            """
+            Walk from the given nodes through the branches enabled by the
+            current combination, stopping at nodes without value.
+
+            Args:
+                gsvnodes(list of GSVNode):
+                added(list): receive (GSVNode, bool) for each node visited,
+                    the bool is True if the node was added to the frontier.
+            """
+
+            stack = list(gsvnodes)
+
+            while stack:
+
+                gsvnode = stack.pop()
+                if id(gsvnode) in visited:
+                    continue
+                visited.add(id(gsvnode))
+
+                name = gsvnode.gsv_name
+                value = combination.get(name)
+
+                if name in gsvs and value is None:
+                    frontier.setdefault(name, list()).append(gsvnode)
+                    added.append((gsvnode, True))
+                    continue
+
+                added.append((gsvnode, False))
+                for branch in self.get_branches(gsvnode):
+                    # excluded variables are not enumerated, so we consider
+                    # all their branches enabled.
+                    if name not in gsvs or branch.value in (None, value):
+                        stack.extend(branch.gsvnodes)
+
+            return
+
+        def undo(added):
+
+            for gsvnode, in_frontier in reversed(added):
+                visited.discard(id(gsvnode))
+                if in_frontier:
+                    pending = frontier[gsvnode.gsv_name]
+                    pending.pop()
+                    if not pending:
+                        del frontier[gsvnode.gsv_name]
+            return
+
+        def iter_from():
+
+            if not frontier:
+                yield OrderedDict(combination)
+                return
+
+            # first reachable variable without a value yet
+            name = min(frontier, key=order.get)
+            gsvnodes = frontier.pop(name)
+
+            for value in gsvs[name].values:
+
+                combination[name] = value
+                added = list()
+                expand(
+                    [
+                        upstream
+                        for gsvnode in gsvnodes
+                        for branch in self.get_branches(gsvnode)
+                        if branch.value in (None, value)
+                        for upstream in branch.gsvnodes
+                    ],
+                    added
+                )
+
+                for result in iter_from():
+                    yield result
+
+                undo(added)
+                del combination[name]
+
+            frontier[name] = gsvnodes
+            return
+
+        expand(roots, list())
+        for result in iter_from():
+            yield result
+
+        return
+
+
+def iter_upstream_nodes(ports, stop=None):
+    """
+    Walk the nodegraph upstream of the given ports and yield each node found
+    once. Group nodes are entered through their return ports and exited
+    through their send ports.
+
+    Args:
+        ports(list of NodegraphAPI.Port):
+            input ports (or group return ports) to start the parsing from.
+        stop(callable or None):
+            ``stop(node) -> bool``. Nodes for which it returns True are still
+            yielded but their own inputs are not parsed.
+
+    Yields:
+        NodegraphAPI.Node:
+    """
+
+    visited = set()
+    # groups are entered once per output port, as each return port has its
+    # own upstream nodes
+    visited_ports = set()
+    stack = [port for port in ports if port]
+
+    while stack:
+
+        port = stack.pop()
+        port_node = port.getNode()
+
+        for connected in port.getConnectedPorts():
+
+            node = connected.getNode()
+
+            # we reached the send port of a group, continue outside of it
+            if node == port_node or node == port_node.getParent():
+                outer_port = node.getInputPort(connected.getName())
+                if outer_port:
+                    stack.append(outer_port)
+                continue
+
+            name = node.getName()
+            is_group = isinstance(node, NodegraphAPI.GroupNode)
+            if is_group:
+                port_key = (name, connected.getName())
+                if port_key in visited_ports:
+                    continue
+                visited_ports.add(port_key)
+            elif name in visited:
+                continue
+
+            if name not in visited:
+                visited.add(name)
+                yield node
+
+            if stop and stop(node):
+                continue
+
+            if is_group:
+                return_port = node.getReturnPort(connected.getName())
+                if return_port:
+                    stack.append(return_port)
+            else:
+                stack.extend(node.getInputPorts())
+
+            continue
+
+    return
+
+
+class GSVReportWriter(object):
+    """
+    Write GSVLocal records to a file-like object one at a time, so the full
+    report never has to exist in memory as a single string.
+
+    Formats available are:
+
+    - ``ndjson``: one compact json object per line (text stream).
+    - ``binary``: each compact json object is utf-8 encoded and prefixed by
+      its size as a 4 bytes big-endian unsigned int (binary stream).
+
+    A summary record ``{"summary": {...}}`` is always written last when the
+    writer is closed. With ``summary=True`` it is the only record written.
+
+    With ``impact=True`` each record also has an ``impact`` key, see
+    ``GSVScene.get_gsv_impact()``.
+
+    Args:
+        stream(file): file-like object opened for writing.
+        format(str): one of ``formats``.
+        summary(bool): True to only write the final summary record.
+        impact(bool): True to add the impact of each value to the records.
+        costs(dict or None): node type: weight, used for the impact cost.
+    """
+
+    formats = ("ndjson", "binary")
+
+    def __init__(
+            self,
+            stream,
+            format="ndjson",
+            summary=False,
+            impact=False,
+            costs=None
+    ):
+
+        if format not in self.formats:
+            raise ValueError(
+                "Unsupported report format <{}>, must be one of {}."
+                "".format(format, self.formats)
+            )
+
+        self.stream = stream
+        self.format = format
+        self.summary = summary
+        self.impact = impact
+        self.costs = costs
+
+        self.stats = OrderedDict()
+        self.stats["gsvs"] = 0
+        self.stats["nodes"] = 0
+        self.stats["values"] = 0
+
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _write_record(self, record):
+
+        record = json.dumps(record, separators=(",", ":"), sort_keys=True)
+
+        if self.format == "ndjson":
+            self.stream.write(record + "\n")
+        else:
+            record = record.encode("utf-8")
+            self.stream.write(struct.pack(">I", len(record)))
+            self.stream.write(record)
+
+        return
+
+    def write(self, gsv):
+        """
+        Args:
+            gsv(GSVLocal): built GSVLocal to write.
+        """
+
+        self.stats["gsvs"] += 1
+        self.stats["nodes"] += len(gsv.nodes)
+        self.stats["values"] += len(gsv.values)
+
+        if self.summary:
+            return
+
+        record = gsv.todict()
+        if self.impact:
+            record["impact"] = gsv.scene.get_gsv_impact(gsv, costs=self.costs)
+
+        self._write_record(record)
+
+        return
+
+    def close(self):
+        """
+        Write the summary record and flush the stream. The stream itself is not
+        closed.
+        """
+
+        self._write_record({"summary": self.stats})
+        self.stream.flush()
+        return
+
+
+def write_report(
+        scene,
+        stream,
+        format="ndjson",
+        summary=False,
+        impact=False,
+        costs=None
+):
+    """
+    Build the given scene and stream its GSVs to the given stream while they
+    are produced.
+
+    With <summary>, the scene is not built (see ``GSVScene.get_summary()``)
+    so its ``gsvs`` attribute stays empty.
+
+    Args:
+        scene(GSVScene): scene to build, doesn't need to be built already.
+        stream(file): file-like object opened for writing.
+        format(str): see ``GSVReportWriter.formats``.
+        summary(bool): True to only write the summary record.
+        impact(bool): True to add the impact of each value to the records.
+        costs(dict or None): node type: weight, used for the impact cost.
+
+    Returns:
+        OrderedDict: summary stats of the report.
+    """
+
+    writer = GSVReportWriter(
+        stream,
+        format=format,
+        summary=summary,
+        impact=impact,
+        costs=costs
+    )
+    with writer:
+        if summary:
+            writer.stats.update(scene.get_summary())
+        else:
+            for gsv in scene.iterbuild():
+                writer.write(gsv)
+
+    return writer.stats
+
 
 """____________________________________________________________________________
 
@@ -371,14 +1080,55 @@ class GSVScene(object):
 """
 
 
-def run():
+def run(
+        report_path=None,
+        report_format="ndjson",
+        summary=False,
+        impact=False,
+        costs=None
+):
+    """
+
+    Args:
+        report_path(str or None):
+            path of the file to write the report to.
+            If None the report is written to the console (stdout).
+        report_format(str): see ``GSVReportWriter.formats``.
+            The ``binary`` format requires a <report_path>.
+        summary(bool): True to only report the scene summary.
+        impact(bool): True to report the impact of each gsv value.
+        costs(dict or None): node type: weight, used for the impact cost.
+    """
 
     gsv_scene = GSVScene()
-    gsv_scene.build()
 
-    logger.info(
-        "GSVScene :\n{}"
-        "".format(json.dumps(gsv_scene.todict(), indent=4, sort_keys=True))
+    if report_path:
+        mode = "wb" if report_format == "binary" else "w"
+        with open(report_path, mode) as report_file:
+            stats = write_report(
+                gsv_scene,
+                report_file,
+                format=report_format,
+                summary=summary,
+                impact=impact,
+                costs=costs
+            )
+    elif report_format == "binary":
+        raise ValueError("[run] The binary format requires a report_path.")
+    else:
+        stats = write_report(
+            gsv_scene,
+            sys.stdout,
+            format=report_format,
+            summary=summary,
+            impact=impact,
+            costs=costs
+        )
+
+    tracer.info(
+        "[run] Finished. {gsvs} gsvs, {nodes} nodes and {values} values "
+        "reported.",
+        **stats
     )
 
     for gsv in gsv_scene.gsvs:
@@ -398,4 +1148,5 @@ def run():
 
 # execute
 
-run()
+if __name__ == "__main__" or __name__ == "__builtin__":
+    run()
@@ -0,0 +1,156 @@
+"""
+python>3
+
+Measure how FindGSV scale with the number of GSV nodes in the scene, using
+the stand-in NodegraphAPI from ``standin_nodegraphapi.py``.
+
+For each size, ``GSVScene.build()`` and ``GSVScene.todict()`` are timed and
+their peak memory and NodegraphAPI call counts are recorded.
+
+Results can be stored as a named baseline in ``FindGSV.benchmark.json`` to
+compare revisions::
+
+    python FindGSV.benchmark.py --save baseline
+    # ... modify FindGSV.py ...
+    python FindGSV.benchmark.py --compare baseline
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+THIS_DIR = Path(__file__).parent
+BASELINES_PATH = THIS_DIR / "FindGSV.benchmark.json"
+
+sys.path.insert(0, str(THIS_DIR))
+sys.path.insert(0, str(THIS_DIR.parent))
+# for lxmcommon
+sys.path.append(str(THIS_DIR.parent.parent))
+
+import standin_nodegraphapi
+
+standin_nodegraphapi.install()
+
+import FindGSV
+
+SIZES = [100, 1000, 10000, 100000]
+
+
+def measure(func):
+    """
+    Args:
+        func(callable): function to call without arguments
+
+    Returns:
+        dict: time (seconds), peak memory (bytes) and NodegraphAPI calls.
+    """
+    standin_nodegraphapi.CALLS.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    func()
+
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "time": round(elapsed, 6),
+        "peak_memory": peak,
+        "calls": sum(standin_nodegraphapi.CALLS.values()),
+    }
+
+
+def bench_size(size, variables, values):
+    """
+    Args:
+        size(int): number of GSV nodes in the scene.
+        variables(int): number of variable names.
+        values(int): number of values per variable.
+
+    Returns:
+        dict: measures for each benchmarked step.
+    """
+    standin_nodegraphapi.generate_scene(
+        nodes=size,
+        variables=variables,
+        values=values,
+    )
+    # GSVLocal instances are stored on the class and never released, we don't
+    # want previous sizes to affect the next ones.
+    del FindGSV.GSVLocal.instances[:]
+
+    scene = FindGSV.GSVScene()
+    result = {
+        "build": measure(scene.build),
+        "todict": measure(scene.todict),
+    }
+    result["gsvs"] = len(scene.gsvs)
+    return result
+
+
+def compare(results, baseline):
+    """
+    Print the ratio current/baseline for each measure.
+    """
+    for size, steps in results.items():
+        base_steps = baseline.get(size)
+        if not base_steps:
+            print("[compare] size={} missing from baseline".format(size))
+            continue
+
+        for step in ("build", "todict"):
+            line = ["size={:>7} {:<7}".format(size, step)]
+            for measure_name in ("time", "peak_memory", "calls"):
+                current = steps[step][measure_name]
+                base = base_steps[step][measure_name]
+                ratio = current / base if base else float("nan")
+                line.append("{}={:.2f}x".format(measure_name, ratio))
+            print(" ".join(line))
+
+    return
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--variables", type=int, default=100)
+    parser.add_argument("--values", type=int, default=3)
+    parser.add_argument("--save", metavar="LABEL", help="store as baseline")
+    parser.add_argument("--compare", metavar="LABEL", help="baseline to compare to")
+    args = parser.parse_args()
+
+    results = dict()
+    for size in args.sizes:
+        results[str(size)] = bench_size(
+            size=size,
+            variables=min(args.variables, size),
+            values=args.values,
+        )
+        print(
+            "size={:>7} gsvs={:>5} build={time:.4f}s peak={peak_memory}B "
+            "calls={calls}".format(
+                size, results[str(size)]["gsvs"], **results[str(size)]["build"]
+            )
+        )
+
+    baselines = dict()
+    if BASELINES_PATH.exists():
+        baselines = json.loads(BASELINES_PATH.read_text())
+
+    if args.compare:
+        compare(results, baselines.get(args.compare, dict()))
+
+    if args.save:
+        baselines[args.save] = results
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=4, sort_keys=True))
+        print("[main] Baseline <{}> saved to {}".format(args.save, BASELINES_PATH))
+
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+python>3
+
+Parse the graph of scenes made with the stand-in NodegraphAPI from
+standin_nodegraphapi.py
+"""
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# for lxmcommon
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+import standin_nodegraphapi as standin
+
+standin.install()
+
+import FindGSV
+
+
+def _build_scene():
+    """
+    Returns:
+        FindGSV.GSVScene: built
+    """
+    del FindGSV.GSVLocal.instances[:]
+    scene = FindGSV.GSVScene()
+    scene.build()
+    return scene
+
+
+def _brute_combinations(scene):
+    """
+    Reference: prune every combination of the full cartesian product.
+
+    Returns:
+        set of tuple: ((gsv name, value), ...) sorted
+    """
+    gsvs = dict((gsv.name, gsv.values) for gsv in scene.gsvs)
+    names = sorted(gsvs)
+    gated = set()
+    for gsvnode in scene.nodes:
+        for branch in scene.get_branches(gsvnode):
+            gated.update(map(id, branch.gsvnodes))
+    roots = [node for node in scene.nodes if id(node) not in gated]
+
+    output = set()
+    for values in itertools.product(*[gsvs[name] for name in names]):
+        combination = dict(zip(names, values))
+        reached = set()
+        visited = set()
+        stack = list(roots)
+        while stack:
+            gsvnode = stack.pop()
+            if id(gsvnode) in visited:
+                continue
+            visited.add(id(gsvnode))
+            name = gsvnode.gsv_name
+            if name in gsvs:
+                reached.add(name)
+            for branch in scene.get_branches(gsvnode):
+                if name not in gsvs or branch.value in (None, combination[name]):
+                    stack.extend(branch.gsvnodes)
+        output.add(tuple(sorted(
+            (name, value) for name, value in combination.items()
+            if name in reached
+        )))
+    return output
+
+
+def test01():
+    """
+    test combinations of mutually exclusive switches are pruned.
+    """
+    standin.reset()
+    render = standin.create_node("Render", "Render")
+    shot = standin.create_switch("sw_shot", "shot", ["a", "b"])
+    lod = standin.create_switch("sw_lod", "lod", ["hi", "lo"])
+    cam = standin.create_switch("sw_cam", "cam", ["c1", "c2", "c3"])
+    standin.connect(shot, render)
+    standin.connect(lod, shot, 0)
+    standin.connect(cam, shot, 1)
+
+    scene = _build_scene()
+    combinations = [dict(item) for item in scene.iter_combinations()]
+
+    assert combinations == [
+        {"shot": "a", "lod": "hi"},
+        {"shot": "a", "lod": "lo"},
+        {"shot": "b", "cam": "c1"},
+        {"shot": "b", "cam": "c2"},
+        {"shot": "b", "cam": "c3"},
+    ], combinations
+    assert set(
+        tuple(sorted(item.items())) for item in combinations
+    ) == _brute_combinations(scene)
+
+    print("[test01] Finished")
+    return
+
+
+def test02():
+    """
+    test nested switches, groups, excluded variables and a variable used by
+    multiple switches against the pruned cartesian product.
+    """
+    standin.reset()
+    render = standin.create_node("Render", "Render")
+    shot = standin.create_switch("sw_shot", "shot", ["a", "b", "c"])
+    lod_a = standin.create_switch("sw_lod_a", "lod", ["hi", "lo"])
+    lod_b = standin.create_switch("sw_lod_b", "lod", ["hi", "lo", "proxy"])
+    fx = standin.create_switch("sw_fx", "fx", ["on", "off"])
+    gaffer = standin.create_switch("sw_gaffer", "gafferState", ["x", "y"])
+    cam = standin.create_switch("sw_cam", "cam", ["c1", "c2"])
+    veg = standin.create_group("veg_fx", "fx", "on")
+    standin.connect(shot, render)
+    standin.connect(lod_a, shot, 0)
+    standin.connect(gaffer, shot, 1)
+    standin.connect(lod_b, gaffer, 0)
+    standin.connect(veg, gaffer, 1)
+    standin.connect(fx, lod_a, 0)
+    standin.connect(fx, lod_b, 2)
+    standin.connect(cam, veg)
+
+    scene = _build_scene()
+    combinations = list(scene.iter_combinations())
+    keys = [tuple(sorted(item.items())) for item in combinations]
+
+    assert len(keys) == len(set(keys)), keys
+    assert set(keys) == _brute_combinations(scene), keys
+    # shot=c doesn't reach anything else
+    assert {"shot": "c"} in [dict(item) for item in combinations]
+    assert all("gafferState" not in item for item in combinations)
+
+    print("[test02] Finished")
+    return
+
+
+def test03():
+    """
+    test the impact of a value includes the active subtree of the nested
+    switches, with weighted costs.
+    """
+    standin.reset()
+    render = standin.create_node("Render", "Render")
+    shot = standin.create_switch("sw_shot", "shot", ["a", "b"])
+    merge = standin.create_node("m_a", "Merge")
+    lod = standin.create_switch("sw_lod", "lod", ["hi", "lo"])
+    geo_hi = standin.create_node("geo_hi", "Alembic_In")
+    geo_lo = standin.create_node("geo_lo", "Alembic_In")
+    shot_in = standin.create_switch("sw_shot_in", "shot", ["a", "b"])
+    geo_a = standin.create_node("geo_shotA", "Alembic_In")
+    geo_b = standin.create_node("geo_shotB", "Alembic_In")
+    cam = standin.create_node("cam", "Camera")
+    fx = standin.create_group(
+        "veg_fx",
+        "fx",
+        "on",
+        content=[
+            standin.create_node("fx1", "Particle"),
+            standin.create_node("fx2", "Particle"),
+        ]
+    )
+    standin.connect(shot, render)
+    standin.connect(merge, shot, 0)
+    standin.connect(fx, shot, 1)
+    standin.connect(lod, merge)
+    standin.connect(geo_hi, lod, 0)
+    standin.connect(geo_lo, lod, 1)
+    standin.connect(shot_in, geo_lo)
+    standin.connect(geo_a, shot_in, 0)
+    standin.connect(geo_b, shot_in, 1)
+    standin.connect(cam, fx)
+
+    scene = _build_scene()
+    gsvnodes = dict((str(node.kobj.getName()), node) for node in scene.nodes)
+    costs = {"Alembic_In": 10, "Particle": 5}
+
+    impact = scene.get_impact(gsvnodes["sw_shot"], costs=costs)
+    # lod and fx have no value: all their branches are active, sw_shot_in
+    # follow the same shot value.
+    assert impact == {
+        "a": {"nodes": 6, "exclusive": 6, "cost": 33},
+        "b": {"nodes": 4, "exclusive": 4, "cost": 12},
+    }, impact
+    assert scene.get_impact(gsvnodes["sw_shot"], costs=costs) is impact
+
+    impact = scene.get_impact(
+        gsvnodes["sw_shot"], costs=costs, values={"lod": "hi", "fx": "off"}
+    )
+    assert impact == {
+        "a": {"nodes": 3, "exclusive": 3, "cost": 12},
+        "b": {"nodes": 2, "exclusive": 2, "cost": 2},
+    }, impact
+
+    shot_gsv = [gsv for gsv in scene.gsvs if gsv.name == "shot"][0]
+    impact = scene.get_gsv_impact(shot_gsv)
+    assert impact["a"]["nodes"] == 7, impact
+    assert impact["b"]["nodes"] == 5, impact
+    assert list(impact["a"]["switches"]) == [
+        "sw_shot(VariableSwitch)", "sw_shot_in(VariableSwitch)"
+    ], impact
+
+    print("[test03] Finished")
+    return
+
+
+def test04():
+    """
+    test a group reached through two of its outputs is walked behind both.
+    """
+    standin.reset()
+    render = standin.create_node("Render", "Render")
+    merge = standin.create_node("merge", "Merge", inputs=2)
+    group = standin.create_node("grp", "Group", outputs=("a", "b"))
+    geo_a = standin.create_node("geo_a", "Alembic_In")
+    geo_b = standin.create_node("geo_b", "Alembic_In")
+    lod = standin.create_switch("sw_lod", "lod", ["hi", "lo"])
+    geo_hi = standin.create_node("geo_hi", "Alembic_In")
+    standin.connect(merge, render)
+    standin.connect(group, merge, 0, output=0)
+    standin.connect(group, merge, 1, output=1)
+    standin.connect_return(geo_a, group, "a")
+    standin.connect_return(lod, group, "b")
+    standin.connect(geo_b, lod, 0)
+    standin.connect(geo_hi, lod, 1)
+
+    names = [
+        node.getName()
+        for node in FindGSV.iter_upstream_nodes(render.getInputPorts())
+    ]
+    assert sorted(names) == [
+        "geo_a", "geo_b", "geo_hi", "grp", "merge", "sw_lod"
+    ], names
+
+    # the switch behind the second output is found, and stops the walk
+    names = [
+        node.getName()
+        for node in FindGSV.iter_upstream_nodes(
+            render.getInputPorts(),
+            stop=lambda node: node.getType() == "VariableSwitch"
+        )
+    ]
+    assert sorted(names) == ["geo_a", "grp", "merge", "sw_lod"], names
+
+    print("[test04] Finished")
+    return
+
+
+if __name__ == '__main__':
+
+    test01()
+    test02()
+    test03()
+    test04()
@@ -0,0 +1,130 @@
+"""
+python>3
+
+Write reports of scenes made with the stand-in NodegraphAPI from
+standin_nodegraphapi.py
+"""
+import io
+import json
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# for lxmcommon
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+import standin_nodegraphapi as standin
+
+standin.install()
+
+import FindGSV
+
+
+def _create_scene():
+    """
+    Returns:
+        FindGSV.GSVScene: not built
+    """
+    standin.reset()
+    del FindGSV.GSVLocal.instances[:]
+
+    render = standin.create_node("Render", "Render")
+    lod = standin.create_switch("sw_lod", "lod", ["hi", "lo"])
+    shot = standin.create_switch("sw_shot", "shot", ["sh010", "sh020"])
+    lod_fx = standin.create_switch("sw_lod_fx", "lod", ["lo", "proxy"])
+    standin.create_switch("sw_gaffer", "gafferState", ["a", "b"])
+    standin.create_group("veg_shot", "shot", "sh030")
+
+    standin.connect(lod, render)
+    standin.connect(shot, lod, 0)
+    standin.connect(lod_fx, lod, 1)
+
+    return FindGSV.GSVScene()
+
+
+Expected = [
+    {
+        "name": "lod",
+        "values": ["hi", "lo", "proxy"],
+        "nodes": ["sw_lod(VariableSwitch)", "sw_lod_fx(VariableSwitch)"],
+    },
+    {
+        "name": "shot",
+        "values": ["sh010", "sh020", "sh030"],
+        "nodes": ["sw_shot(VariableSwitch)", "veg_shot(VariableEnabledGroup)"],
+    },
+]
+ExpectedSummary = {"gsvs": 2, "nodes": 4, "values": 6}
+
+
+def test01():
+    """
+    test the ndjson report, and that building a gsv doesn't reset the others.
+    """
+    scene = _create_scene()
+    stream = io.StringIO()
+    stats = FindGSV.write_report(scene, stream, format="ndjson")
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[:-1] == Expected, records
+    assert records[-1] == {"summary": ExpectedSummary}, records[-1]
+    assert dict(stats) == ExpectedSummary, stats
+
+    # built gsvs are kept for the rest of the scene use
+    assert [len(gsv.nodes) for gsv in scene.gsvs] == [2, 2], scene.gsvs
+    assert [len(gsv.values) for gsv in scene.gsvs] == [3, 3], scene.gsvs
+
+    print("[test01] Finished")
+    return
+
+
+def test02():
+    """
+    test the binary report records are size-prefixed json.
+    """
+    scene = _create_scene()
+    stream = io.BytesIO()
+    FindGSV.write_report(scene, stream, format="binary")
+
+    data = stream.getvalue()
+    records = list()
+    offset = 0
+    while offset < len(data):
+        size = struct.unpack(">I", data[offset:offset + 4])[0]
+        offset += 4
+        records.append(json.loads(data[offset:offset + size].decode("utf-8")))
+        offset += size
+
+    assert offset == len(data), (offset, len(data))
+    assert records[:-1] == Expected, records
+    assert records[-1] == {"summary": ExpectedSummary}, records[-1]
+
+    print("[test02] Finished")
+    return
+
+
+def test03():
+    """
+    test the summary report only has the summary and doesn't build the scene.
+    """
+    scene = _create_scene()
+    stream = io.StringIO()
+    stats = FindGSV.write_report(scene, stream, summary=True)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1, lines
+    assert json.loads(lines[0]) == {"summary": ExpectedSummary}, lines
+    assert dict(stats) == ExpectedSummary, stats
+    assert not scene.gsvs and not scene.nodes, scene.gsvs
+    assert not FindGSV.GSVLocal.instances, FindGSV.GSVLocal.instances
+
+    print("[test03] Finished")
+    return
+
+
+if __name__ == '__main__':
+
+    test01()
+    test02()
+    test03()
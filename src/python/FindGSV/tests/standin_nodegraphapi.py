@@ -0,0 +1,334 @@
+"""
+python>3
+
+Stand-in for Katana's ``NodegraphAPI`` module, only implementing what FindGSV
+use. Allow to run FindGSV outside Katana on generated scenes.
+
+Every API call is counted in ``CALLS``.
+
+Use ``install()`` before importing FindGSV so ``import NodegraphAPI`` resolve
+to this module.
+"""
+import collections
+import random
+import sys
+
+CALLS = collections.Counter()
+
+_NODES = list()  # type: list[Node]
+
+
+class Parameter(object):
+
+    __slots__ = ("value", "children")
+
+    def __init__(self, value=None, children=None):
+        self.value = value
+        self.children = children or list()
+
+    def getNumChildren(self):
+        CALLS["Parameter.getNumChildren"] += 1
+        return len(self.children)
+
+    def getChildByIndex(self, index):
+        CALLS["Parameter.getChildByIndex"] += 1
+        return self.children[index]
+
+    def getValue(self, time):
+        CALLS["Parameter.getValue"] += 1
+        return self.value
+
+
+class Port(object):
+
+    __slots__ = ("node", "name", "connections")
+
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+        self.connections = list()
+
+    def getNode(self):
+        CALLS["Port.getNode"] += 1
+        return self.node
+
+    def getName(self):
+        CALLS["Port.getName"] += 1
+        return self.name
+
+    def getConnectedPorts(self):
+        CALLS["Port.getConnectedPorts"] += 1
+        return list(self.connections)
+
+    def connect(self, port):
+        self.connections.append(port)
+        port.connections.append(self)
+
+
+class Node(object):
+
+    def __init__(
+            self,
+            name,
+            type_,
+            parameters=None,
+            inputs=1,
+            parent=None,
+            outputs=("out",)
+    ):
+        self.name = name
+        self.type = type_
+        self.parent = parent
+        self.parameters = parameters or dict()
+        self.input_ports = [
+            Port(self, "i{}".format(index)) for index in range(inputs)
+        ]
+        self.output_ports = [Port(self, name) for name in outputs]
+
+    def __repr__(self):
+        return "Node({})".format(self.name)
+
+    def getName(self):
+        CALLS["Node.getName"] += 1
+        return self.name
+
+    def getType(self):
+        CALLS["Node.getType"] += 1
+        return self.type
+
+    def getParent(self):
+        CALLS["Node.getParent"] += 1
+        return self.parent
+
+    def getParameter(self, path):
+        CALLS["Node.getParameter"] += 1
+        return self.parameters.get(path)
+
+    def getInputPorts(self):
+        CALLS["Node.getInputPorts"] += 1
+        return list(self.input_ports)
+
+    def getInputPort(self, name):
+        CALLS["Node.getInputPort"] += 1
+        for port in self.input_ports:
+            if port.name == name:
+                return port
+        return None
+
+    def getOutputPorts(self):
+        CALLS["Node.getOutputPorts"] += 1
+        return list(self.output_ports)
+
+
+class GroupNode(Node):
+
+    def __init__(self, *args, **kwargs):
+        super(GroupNode, self).__init__(*args, **kwargs)
+        # ports seen from inside the group
+        self.return_ports = dict(
+            (port.name, Port(self, port.name)) for port in self.output_ports
+        )
+        self.send_ports = dict(
+            (port.name, Port(self, port.name)) for port in self.input_ports
+        )
+
+    def getReturnPort(self, name):
+        CALLS["GroupNode.getReturnPort"] += 1
+        return self.return_ports.get(name)
+
+    def getSendPort(self, name):
+        CALLS["GroupNode.getSendPort"] += 1
+        return self.send_ports.get(name)
+
+
+def GetCurrentTime():
+    CALLS["GetCurrentTime"] += 1
+    return 1.0
+
+
+def GetAllNodesByType(node_type):
+    CALLS["GetAllNodesByType"] += 1
+    return [node for node in _NODES if node.type == node_type]
+
+
+def SetNodeEdited(node, edited=True, exclusive=False):
+    CALLS["SetNodeEdited"] += 1
+    return
+
+
+def install():
+    """
+    Register this module as ``NodegraphAPI`` in ``sys.modules``.
+    """
+    sys.modules["NodegraphAPI"] = sys.modules[__name__]
+    return
+
+
+def reset():
+    """
+    Remove all the nodes from the scene and reset the call counter.
+    """
+    del _NODES[:]
+    CALLS.clear()
+    return
+
+
+def create_node(name, type_, inputs=1, parent=None, outputs=("out",)):
+    """
+    Add a node to the scene. If <type_> is "Group", a GroupNode with a return
+    port per output is created, to be connected with ``connect_return()``.
+
+    Returns:
+        Node:
+    """
+    node_class = GroupNode if type_ == "Group" else Node
+    node = node_class(name, type_, inputs=inputs, parent=parent, outputs=outputs)
+    _NODES.append(node)
+    return node
+
+
+def create_switch(name, variable, patterns, parent=None):
+    """
+    Add a VariableSwitch to the scene with one input per pattern.
+
+    Returns:
+        Node:
+    """
+    node = Node(
+        name,
+        "VariableSwitch",
+        parameters={
+            "variableName": Parameter(variable),
+            "patterns": Parameter(
+                children=[Parameter(value) for value in patterns]
+            ),
+        },
+        inputs=len(patterns),
+        parent=parent
+    )
+    _NODES.append(node)
+    return node
+
+
+def create_group(name, variable, pattern, parent=None, content=()):
+    """
+    Add a VariableEnabledGroup to the scene.
+
+    Args:
+        content(list of Node): nodes to move in the group, chained from its
+            send port to its return port.
+
+    Returns:
+        GroupNode:
+    """
+    node = GroupNode(
+        name,
+        "VariableEnabledGroup",
+        parameters={
+            "variableName": Parameter(variable),
+            "pattern": Parameter(pattern),
+        },
+        parent=parent
+    )
+    upstream_port = node.send_ports["i0"]
+    for child in content:
+        child.parent = node
+        upstream_port.connect(child.input_ports[0])
+        upstream_port = child.output_ports[0]
+    node.return_ports["out"].connect(upstream_port)
+    _NODES.append(node)
+    return node
+
+
+def connect(upstream, downstream, index=0, output=0):
+    """
+    Connect the output <output> of <upstream> to the input <index> of
+    <downstream>.
+    """
+    upstream.output_ports[output].connect(downstream.input_ports[index])
+    return
+
+
+def connect_return(node, group, output):
+    """
+    Connect the output of <node> to the return port named <output> of <group>.
+    """
+    node.parent = group
+    group.return_ports[output].connect(node.output_ports[0])
+    return
+
+
+def generate_scene(
+        nodes,
+        variables,
+        values=3,
+        excluded=("gafferState",),
+        excluded_ratio=0.05,
+        group_ratio=0.2,
+        seed=0
+):
+    """
+    Replace the current scene by a generated one made of VariableSwitch and
+    VariableEnabledGroup nodes chained together.
+
+    Args:
+        nodes(int): number of GSV nodes to create.
+        variables(int): number of different variable names to use.
+        values(int): number of values each variable can take.
+        excluded(tuple of str): excluded variable names that will also be used.
+        excluded_ratio(float): ratio of nodes using an excluded variable name.
+        group_ratio(float): ratio of VariableEnabledGroup nodes.
+        seed(int): seed for the random generator.
+
+    Returns:
+        list of Node: nodes created
+    """
+    reset()
+    rng = random.Random(seed)
+
+    root = GroupNode("rootNode", "Group")
+    previous = None
+
+    for index in range(nodes):
+
+        if excluded and rng.random() < excluded_ratio:
+            variable = rng.choice(excluded)
+        else:
+            variable = "var{}".format(index % variables)
+
+        patterns = ["value{}".format(i) for i in range(values)]
+
+        if rng.random() < group_ratio:
+            node = GroupNode(
+                "VariableEnabledGroup{}".format(index),
+                "VariableEnabledGroup",
+                parameters={
+                    "variableName": Parameter(variable),
+                    "pattern": Parameter(rng.choice(patterns)),
+                },
+                parent=root
+            )
+            node.return_ports["out"].connect(node.send_ports["i0"])
+        else:
+            node = Node(
+                "VariableSwitch{}".format(index),
+                "VariableSwitch",
+                parameters={
+                    "variableName": Parameter(variable),
+                    "patterns": Parameter(
+                        children=[Parameter(value) for value in patterns]
+                    ),
+                },
+                inputs=values,
+                parent=root
+            )
+
+        if previous is not None:
+            port = node.input_ports[rng.randrange(len(node.input_ports))]
+            previous.output_ports[0].connect(port)
+
+        _NODES.append(node)
+        previous = node
+        continue
+
+    return list(_NODES)
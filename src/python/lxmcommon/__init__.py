@@ -0,0 +1,6 @@
+"""
+Modules shared by the python tools of this repository.
+
+The tools using them need this package importable (``src/python`` on the
+PYTHONPATH).
+"""
@@ -0,0 +1,274 @@
+"""
+version=2
+author=Liam Collod
+last_modified=19/10/2026
+python=>2.7.1
+
+Lazy and structured tracing on top of a tool's logger.
+
+Messages are ``str.format()`` templates only formatted if the event is
+emitted, so a disabled event only costs a level check. Keyword arguments are
+both the template fields and the structured data of the event. Field values
+that are callables are only called when the event is emitted.
+
+[howto]
+    from lxmcommon.tracing import Tracer, get_env_level
+
+    logger = logging.getLogger("mytool")
+    logger.setLevel(get_env_level("MYTOOL_LOG_LEVEL"))
+    tracer = Tracer(logger)
+
+    tracer.debug("[build] Created <{name}>", name=name)
+
+    with tracer.span("[build]", node=name) as span:
+        ...
+        span["packages"] = 1200
+
+Set the ``LXMCOMMON_TRACE_FILE`` environment variable to a file path (or use
+``set_sink()``) to also write every event as a json line, whatever the
+logger level, for profiling runs. Spans add their ``duration`` in seconds.
+
+[LICENSE]
+
+Copyright 2022 Liam Collod
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+__all__ = [
+    "Tracer",
+    "get_env_level",
+    "set_sink",
+]
+
+logger = logging.getLogger("lxmcommon.tracing")
+
+
+class JsonSink(object):
+    """
+    Write events as json lines to a stream. Thread-safe.
+
+    Args:
+        stream(file): opened in text mode
+        close(bool): True to close the stream when the sink is replaced
+    """
+
+    def __init__(self, stream, close=False):
+        self.stream = stream
+        self.close = close
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        """
+        Args:
+            record(dict): values not json serializable are converted to str.
+        """
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+        return
+
+
+# list of one JsonSink or None, shared by all the Tracer
+CurrentSink = [None]
+
+
+def set_sink(target):
+    """
+    Set where events are written as json lines, replacing the previous sink.
+
+    Args:
+        target(str or file or None):
+            path of a file to append to, an opened text stream, or None to
+            disable the sink.
+    """
+    previous = CurrentSink[0]
+    if previous is not None and previous.close:
+        previous.stream.close()
+
+    if target is None:
+        CurrentSink[0] = None
+    elif hasattr(target, "write"):
+        CurrentSink[0] = JsonSink(target)
+    else:
+        CurrentSink[0] = JsonSink(open(target, "a"), close=True)
+    return
+
+
+def get_env_level(variable, default=logging.INFO):
+    """
+    Read a logging level from an environment variable. An invalid value is
+    ignored with a warning instead of failing the tool import.
+
+    Args:
+        variable(str): name of the environment variable, ex: "D2GT_LOG_LEVEL"
+        default(int): level used if the variable is not set or invalid.
+
+    Returns:
+        int: logging level
+    """
+    value = os.environ.get(variable, "").strip()
+    if not value:
+        return default
+    if value.isdigit():
+        return int(value)
+
+    level = logging.getLevelName(value.upper())
+    if isinstance(level, int):
+        return level
+
+    logger.warning(
+        "[get_env_level] Invalid level <{}> in ${}, using {}."
+        "".format(value, variable, logging.getLevelName(default))
+    )
+    return default
+
+
+class Tracer(object):
+    """
+    Emit events to the given logger and to the json sink if any.
+
+    Args:
+        logger(logging.Logger): its level decide which events are logged.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.name = logger.name
+
+    def __repr__(self):
+        return "Tracer({})".format(self.name)
+
+    def enabled(self, level=logging.DEBUG):
+        """
+        Returns:
+            bool: True if an event of this level would be emitted anywhere.
+        """
+        return CurrentSink[0] is not None or self.logger.isEnabledFor(level)
+
+    def event(self, level, message, **fields):
+        """
+        Args:
+            level(int): logging level
+            message(str): template formatted with the fields.
+            **fields:
+                structured data of the event, callables are called. Can't be
+                named "level" or "message".
+        """
+        sink = CurrentSink[0]
+        logged = self.logger.isEnabledFor(level)
+        if sink is None and not logged:
+            return
+
+        for key, value in fields.items():
+            if callable(value):
+                fields[key] = value()
+
+        if logged:
+            self.logger.log(level, message.format(**fields))
+
+        if sink is not None:
+            record = {
+                "time": time.time(),
+                "tool": self.name,
+                "level": logging.getLevelName(level),
+                "event": message,
+            }
+            record.update(fields)
+            sink.write(record)
+
+        return
+
+    def debug(self, message, **fields):
+        self.event(logging.DEBUG, message, **fields)
+
+    def info(self, message, **fields):
+        self.event(logging.INFO, message, **fields)
+
+    def span(self, name, level=logging.DEBUG, **fields):
+        """
+        Time the code inside the returned context manager, emitted as a single
+        event on exit. Fields can be added on the span like on a dict.
+
+        Args:
+            name(str): name of the span, ex: "[D2gtGaffer][build]"
+            level(int): logging level
+            **fields: structured data of the event
+
+        Returns:
+            Span:
+        """
+        if not self.enabled(level):
+            return DisabledSpan
+        return Span(self, name, level, fields)
+
+
+class Span(dict):
+    """
+    Returned by ``Tracer.span()``, holds the fields of the event.
+    """
+
+    def __init__(self, tracer, name, level, fields):
+        super(Span, self).__init__(fields)
+        self.tracer = tracer
+        self.name = name
+        self.level = level
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        fields = dict(self)
+        fields["duration"] = time.time() - self._start
+        if exc_type is not None:
+            fields["error"] = exc_type.__name__
+
+        message = "{} Finished in {{duration:.4f}}s".format(self.name)
+        if self:
+            message += ": " + ", ".join(
+                "{0}={{{0}}}".format(key) for key in self
+            )
+        fields["span"] = self.name
+        self.tracer.event(self.level, message, **fields)
+        return False
+
+
+class _DisabledSpan(dict):
+    """
+    Span returned when the tracer is disabled, does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __setitem__(self, key, value):
+        return
+
+
+DisabledSpan = _DisabledSpan()
+
+if os.environ.get("LXMCOMMON_TRACE_FILE"):
+    set_sink(os.environ["LXMCOMMON_TRACE_FILE"])
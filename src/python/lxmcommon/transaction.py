@@ -0,0 +1,179 @@
+"""
+version=2
+author=Liam Collod
+last_modified=19/10/2026
+python=>2.7.1
+
+Group the many node graph edits of a script in a single undo entry and count
+them.
+
+[howto]
+    from lxmcommon.transaction import BulkEdit, edit
+
+    with BulkEdit("Create lights") as bulk:
+        for name in names:
+            node = NodegraphAPI.CreateNode("Light", root)
+            edit("node", name)
+    print(bulk.count)
+
+``edit()`` must be called by the tool after each of its edits to count them.
+Katana's own node graph events are not held back : they are still sent for
+each edit, Katana has no public API to hold them.
+
+[LICENSE]
+
+Copyright 2022 Liam Collod
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import logging
+import time
+from collections import OrderedDict
+
+# try for standalone testing purposes
+try:
+    from Katana import Utils
+except ImportError:
+    Utils = None
+
+__all__ = [
+    "BulkEdit",
+    "edit",
+    "get_current",
+]
+
+logger = logging.getLogger("lxmcommon.transaction")
+
+# BulkEdit currently opened, the outermost first
+OpenedEdits = list()
+
+
+class BulkEdit(object):
+    """
+    Context manager for a batch of node graph edits.
+
+    On enter, an undo group is opened if Katana's ``Utils.UndoStack`` is
+    available so all the edits can be undone at once. The edits recorded with
+    ``edit()`` are counted per kind.
+
+    A BulkEdit opened inside another one is merged in it: the undo group is
+    only handled by the outermost one.
+
+    Args:
+        name(str): name of the undo entry, also used in logs.
+        undo(bool): False to not open an undo group.
+
+    Attributes:
+        count(int): number of edits recorded, including nested BulkEdit.
+        counts(OrderedDict): {kind: number of edits} making <count>.
+        elapsed(float): seconds spent inside the context.
+    """
+
+    def __init__(self, name, undo=True):
+        self.name = name
+        self.undo = undo
+        self.count = 0
+        self.counts = OrderedDict()
+        self.elapsed = 0.0
+        self._undo_opened = False
+        self._start = None
+
+    def __repr__(self):
+        return "BulkEdit({}, count={})".format(self.name, self.count)
+
+    def __enter__(self):
+
+        OpenedEdits.append(self)
+        self._start = time.time()
+
+        undo_stack = getattr(Utils, "UndoStack", None)
+        if self.undo and len(OpenedEdits) == 1 and undo_stack is not None:
+            undo_stack.OpenGroup(self.name)
+            self._undo_opened = True
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        OpenedEdits.remove(self)
+        self.elapsed = time.time() - self._start
+
+        if self._undo_opened:
+            Utils.UndoStack.CloseGroup()
+            self._undo_opened = False
+
+        if OpenedEdits:
+            OpenedEdits[-1].merge(self)
+            return False
+
+        logger.debug(
+            "[BulkEdit][__exit__] <{}> finished: {} edits {} in {:.3f}s."
+            "".format(self.name, self.count, dict(self.counts), self.elapsed)
+        )
+        return False
+
+    def edit(self, kind, key=None, count=1):
+        """
+        Record edits.
+
+        Args:
+            kind(str): what was edited, ex: "node", "parameter", "package"
+            key(str or None):
+                which object was edited, ex: its name or path. Only logged.
+            count(int): number of edits this represents.
+        """
+        self.count += count
+        self.counts[kind] = self.counts.get(kind, 0) + count
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[BulkEdit][edit] <{}> {} {} <{}>.".format(
+                    self.name, count, kind, key
+                )
+            )
+        return
+
+    def merge(self, other):
+        """
+        Add the edits of another BulkEdit.
+
+        Args:
+            other(BulkEdit):
+        """
+        self.count += other.count
+        for kind, count in other.counts.items():
+            self.counts[kind] = self.counts.get(kind, 0) + count
+        return
+
+
+def get_current():
+    """
+    Returns:
+        BulkEdit or None: the innermost BulkEdit opened if any.
+    """
+    return OpenedEdits[-1] if OpenedEdits else None
+
+
+def edit(kind, key=None, count=1):
+    """
+    Record edits on the BulkEdit currently opened, nothing is done if there
+    is none.
+
+    Args:
+        kind(str): what was edited, ex: "node", "parameter", "package"
+        key(str or None): which object was edited, ex: its name or path.
+        count(int): number of edits this represents.
+    """
+    if OpenedEdits:
+        OpenedEdits[-1].edit(kind, key, count)
+    return
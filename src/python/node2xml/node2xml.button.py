@@ -1,11 +1,12 @@
 """
-version=3
+version=7
 python>=2.7.1
 author=Liam Collod
-last_modified=12/03/2022
+last_modified=19/10/2026
 
 
-Convert the selected nodes to an XML representation, and write or print it.
+Convert the node named in <user.node_name> to an XML representation, and write
+or print it. The node graph selection is not modified.
 
 To be used in a scrip button.
 The button parameter must be named <export> or <print> to execute the
@@ -13,12 +14,80 @@ The button parameter must be named <export> or <print> to execute the
 
 The following parameters should also exists on the same node :
 - user.node_name (str) : name of the node to export/print
-- user.export_path (str) : export path of the xml
+- user.export_path (str) : export path of the xml, can end with .xml.gz,
+    .xml.bz2, .xml.xz or .xml.zst to compress it.
+
+Exports are written by a background thread so Katana is not blocked: the XML
+is captured when clicking, then the file is written (and compressed) next to
+its final path and renamed once complete. Multiple exports can be queued, the
+result of each one is logged by Katana's main thread when it's done.
 
 """
+import bz2
+import collections
+import gzip
 import os
+import sys
+import threading
+import time
+import traceback
+import types
+from xml.sax.saxutils import quoteattr
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+try:
+    import lzma
+except ImportError:  # python 2
+    lzma = None
+
+try:
+    from compression import zstd
+except ImportError:  # python<3.14
+    zstd = None
+
+from Katana import NodegraphAPI, QtCore, UI4
+
+# copied from node2xml.py, kept identical by tests/node2xml.test_button.py
+try:
+    replace = os.replace
+except AttributeError:  # python 2
+
+    def replace(src, dst):
+        # os.rename() can't overwrite on Windows
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+# {compression name: (file extension, function(path, mode) -> binary file object)}
+Compressions = {
+    None: (".xml", lambda path, mode="wb": open(path, mode)),
+    "gzip": (
+        ".xml.gz",
+        lambda path, mode="wb": gzip.open(path, mode, compresslevel=6)
+    ),
+    "bz2": (".xml.bz2", lambda path, mode="wb": bz2.BZ2File(path, mode)),
+}
+if lzma:
+    Compressions["lzma"] = (
+        ".xml.xz", lambda path, mode="wb": lzma.open(path, mode)
+    )
+if zstd:
+    Compressions["zstd"] = (
+        ".xml.zst", lambda path, mode="wb": zstd.open(path, mode)
+    )
 
-from Katana import NodegraphAPI, UI4
+# number of bytes buffered before writing them to the file
+ChunkSize = 1024 * 1024
+# module kept in ``sys.modules`` to store the ExportQueue across button clicks,
+# as the script runs with new globals on each click.
+StateModuleName = "node2xml_button_state"
+# milliseconds between two checks of the finished exports
+ReportInterval = 200
 
 
 def err(message):
@@ -39,37 +108,291 @@ def log(message):
     return
 
 
-def get_selection_xml():
-    nodes = NodegraphAPI.GetAllSelectedNodes()
+def get_nodes_xml(nodes):
+    """
+    Args:
+        nodes(list of NodegraphAPI.Node):
+
+    Returns:
+        XmlIO.Element:
+    """
     return NodegraphAPI.BuildNodesXmlIO(nodes)
 
 
-def print_xml(xml=None):
-    xml = xml or get_selection_xml()
+def print_xml(xml):
     return log("\n" + xml.writeString())
 
 
-def write_xml(target_dir, target_name, display=False):
+# copied from node2xml.py up to stream_xml(), kept identical by
+# tests/node2xml.test_button.py
+def iter_xml_chunks(element, split_depth=2, depth=0):
+    """
+    Serialize the given XmlIO element as successive strings. Elements above
+    <split_depth> are opened and closed here so only their children are
+    serialized at once.
+
+    With the default <split_depth>, each top-level node of a
+    ``BuildNodesXmlIO()`` result is serialized separately
+    (katana > __SAVE_exportedNodes > nodes).
+
+    Args:
+        element(XmlIO.Element):
+        split_depth(int): number of levels to open.
+        depth(int): current level, for indentation.
+
+    Yields:
+        str: xml of the element
+    """
+    children = element.getChildren()
+
+    if depth >= split_depth or not children:
+        chunk = element.writeString()
+        if not chunk.endswith("\n"):
+            chunk += "\n"
+        yield chunk
+        return
+
+    yield _get_open_tag(element, depth)
+
+    for child in children:
+        for chunk in iter_xml_chunks(child, split_depth, depth + 1):
+            yield chunk
+
+    yield _get_close_tag(element, depth)
+    return
+
+
+def _get_open_tag(element, depth):
+    attrs = "".join(
+        " {}={}".format(name, quoteattr(element.getAttr(name)))
+        for name in element.getAttrNames()
+    )
+    return "{}<{}{}>\n".format("  " * depth, element.getTag(), attrs)
+
+
+def _get_close_tag(element, depth):
+    return "{}</{}>\n".format("  " * depth, element.getTag())
+
+
+def stream_xml(chunks, target_path, compression=None, chunk_size=None):
     """
+    Write the given xml strings to a file, buffered by <chunk_size> bytes.
 
     Args:
-        target_dir(str): path to an existing directory
-        target_name(str): name of the file to write without the extension
-        display(bool): True to also print the xml file
+        chunks(iterable of str): ex: from ``iter_xml_chunks()``
+        target_path(str): path of the file to write
+        compression(str or None): key of ``Compressions``
+        chunk_size(int or None): default to ``ChunkSize``
+
+    Returns:
+        dict: path, bytes (file size), xml_bytes (uncompressed) and elapsed
+            (seconds).
     """
+    start = time.time()
+    chunk_size = chunk_size or ChunkSize
+    opener = Compressions[compression][1]
+
+    xml_bytes = 0
+    buffer = list()
+    buffered = 0
+
+    with opener(target_path) as xmlfile:
+
+        for chunk in chunks:
+
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode("utf-8")
+            buffer.append(chunk)
+            buffered += len(chunk)
+
+            if buffered >= chunk_size:
+                xmlfile.write(b"".join(buffer))
+                xml_bytes += buffered
+                buffer = list()
+                buffered = 0
 
-    target_path = os.path.join(target_dir, "{}.xml".format(target_name))
+            continue
 
-    xml = get_selection_xml()
+        xmlfile.write(b"".join(buffer))
+        xml_bytes += buffered
 
-    if display:
-        print_xml(xml)
+    return {
+        "path": target_path,
+        "bytes": os.path.getsize(target_path),
+        "xml_bytes": xml_bytes,
+        "elapsed": time.time() - start,
+    }
 
-    xml.write(
-        file=target_path,
+
+def get_compression(target_path):
+    """
+    Args:
+        target_path(str):
+
+    Returns:
+        str or None: key of ``Compressions`` matching the path extension
+
+    Raises:
+        ValueError: if the extension is not supported.
+    """
+    # longest first so .xml doesn't match .xml.gz
+    extensions = sorted(
+        Compressions.items(), key=lambda item: -len(item[1][0])
     )
+    for compression, (extension, _) in extensions:
+        if target_path.endswith(extension):
+            return compression
+
+    raise ValueError(
+        "Export path doesn't ends with one of {}: <{}>".format(
+            [extension for extension, _ in Compressions.values()], target_path
+        )
+    )
+
+
+class ExportQueue(object):
+    """
+    Write exports in a background thread, one after the other.
+
+    Files are written next to the target path then renamed, so a target file
+    is never left half-written.
+
+    The thread doesn't log anything as Katana's console must only be used
+    from the main thread: finished exports are passed back in a queue that a
+    QTimer of the main thread checks while exports are pending. Each result
+    is then logged and stored in ``results``: dict from ``stream_xml()``
+    with an additional ``error`` key (None or the traceback).
+
+    Must be created from the main thread.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.finished = queue.Queue()
+        self.results = collections.deque(maxlen=100)
+        # exports queued but not reported yet, only used by the main thread
+        self.pending = 0
+
+        self.timer = QtCore.QTimer()
+        self.timer.setInterval(ReportInterval)
+        self.timer.timeout.connect(self.report)
+
+        self.thread = threading.Thread(
+            target=self._work,
+            name="node2xml_export"
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, chunks, target_path, compression=None):
+        """
+        Args:
+            chunks(list of str):
+                xml already captured, as Katana's API must be used on the main
+                thread.
+            target_path(str): path of the file to write
+            compression(str or None): key of ``Compressions``
+        """
+        self.queue.put((chunks, target_path, compression))
+        self.pending += 1
+        if not self.timer.isActive():
+            self.timer.start()
+        log("[ExportQueue][put] Queued <{}> ({} pending)".format(
+            target_path, self.pending
+        ))
+        return
+
+    def join(self):
+        """
+        Wait for all the queued exports to be written, then report them.
+        """
+        self.queue.join()
+        self.report()
+
+    def report(self):
+        """
+        Log the exports finished since the last call, on the main thread.
+        """
+        while True:
+
+            try:
+                result = self.finished.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending -= 1
+            self.results.append(result)
+
+            if result["error"]:
+                log("[ExportQueue] Failed for <{}>:\n{}".format(
+                    result["path"], result["error"]
+                ))
+            else:
+                log(
+                    "[ExportQueue] Finished. {} bytes written to <{}> in "
+                    "{:.3f}s".format(
+                        result["bytes"], result["path"], result["elapsed"]
+                    )
+                )
+            continue
+
+        if not self.pending:
+            self.timer.stop()
+        return
+
+    def _work(self):
+
+        while True:
+
+            chunks, target_path, compression = self.queue.get()
+            temp_path = "{}.{}.tmp".format(target_path, os.getpid())
+
+            try:
+                result = stream_xml(chunks, temp_path, compression)
+                replace(temp_path, target_path)
+                result["path"] = target_path
+                result["error"] = None
+
+            except Exception:
+                result = {"path": target_path, "error": traceback.format_exc()}
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            self.finished.put(result)
+            self.queue.task_done()
+            continue
+
+
+def get_export_queue():
+    """
+    Returns:
+        ExportQueue:
+            the one shared by all the button clicks, kept in the
+            ``StateModuleName`` module.
+    """
+    state = sys.modules.get(StateModuleName)
+    if state is None:
+        state = types.ModuleType(StateModuleName)
+        state.export_queue = None
+        sys.modules[StateModuleName] = state
 
-    return log("[write_xml] Finished. XML written to <{}>".format(target_path))
+    if state.export_queue is None or not state.export_queue.thread.is_alive():
+        state.export_queue = ExportQueue()
+    return state.export_queue
+
+
+def write_xml(xml, target_path, compression=None):
+    """
+    Capture the given xml and queue it to be written in the background.
+
+    Args:
+        xml(XmlIO.Element): ex: from ``get_nodes_xml()``
+        target_path(str): path of the file to write
+        compression(str or None): key of ``Compressions``
+    """
+    chunks = list(iter_xml_chunks(xml))
+    get_export_queue().put(chunks, target_path, compression)
+    return
 
 
 def run():
@@ -81,30 +404,26 @@ def run():
     if not export_node:
         err("[run] Can't find node_name={}".format(export_node_name))
 
-    # the xml function act on the selected node
-    # we save the curent selection to override it and re-apply it at the end
-    current_selection = NodegraphAPI.GetAllSelectedNodes()
-    NodegraphAPI.SetAllSelectedNodes([export_node])
-
     if process == "export":
 
         export_path = node.getParameter("user.export_path").getValue(0)
-        if not export_path.endswith(".xml"):
-            err("[run] Export path doesn't ends with .xml: <{}>".format(
-                export_path))
+        try:
+            compression = get_compression(export_path)
+        except ValueError as excp:
+            err("[run] {}".format(excp))
 
-        export_dir, export_name = os.path.split(export_path)
-        export_name = os.path.splitext(export_name)[0]  # strip the .xml
+        export_dir = os.path.dirname(export_path)
         if not os.path.exists(export_dir):
             err("[run] Export directory must exists ! <{}>".format(export_path))
 
         write_xml(
-            target_dir=export_dir,
-            target_name=export_name
+            get_nodes_xml([export_node]),
+            target_path=export_path,
+            compression=compression
         )
 
     elif process == "print":
-        print_xml()
+        print_xml(get_nodes_xml([export_node]))
 
     else:
         err(
@@ -112,7 +431,6 @@ def run():
             "".format(process)
         )
 
-    NodegraphAPI.SetAllSelectedNodes(current_selection)
     return
 
 
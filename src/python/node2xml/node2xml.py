@@ -1,58 +1,615 @@
 """
-version=2
+version=5
 python>=2.7.1
 author=Liam Collod
-last_modified=03/03/2022
+last_modified=19/10/2026
 
 Convert the selected nodes to an XML representation. You can then write it to a
 file or just print it in the console.
 
+``export_nodes()`` export the given nodes without using the selection, to one
+file per node or a single combined file.
+
+The XML is written to the file in chunks, one top-level node at a time, so the
+whole document is never held in a single string. It can be compressed using
+the standard library (gzip, bz2, lzma and zstd on python>=3.14).
+
+``store_nodes()`` export the given nodes to a content-addressed store: only
+the nodes that changed since a previous export are written, and a manifest
+records which version of each node the export contains.
+
 """
+import bz2
+import gzip
+import hashlib
+import json
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from xml.sax.saxutils import quoteattr
+
+try:
+    import lzma
+except ImportError:  # python 2
+    lzma = None
+
+try:
+    from compression import zstd
+except ImportError:  # python<3.14
+    zstd = None
 
 from Katana import NodegraphAPI
 
 
+try:
+    replace = os.replace
+except AttributeError:  # python 2
+
+    def replace(src, dst):
+        # os.rename() can't overwrite on Windows
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+# {compression name: (file extension, function(path, mode) -> binary file object)}
+Compressions = {
+    None: (".xml", lambda path, mode="wb": open(path, mode)),
+    "gzip": (
+        ".xml.gz",
+        lambda path, mode="wb": gzip.open(path, mode, compresslevel=6)
+    ),
+    "bz2": (".xml.bz2", lambda path, mode="wb": bz2.BZ2File(path, mode)),
+}
+if lzma:
+    Compressions["lzma"] = (
+        ".xml.xz", lambda path, mode="wb": lzma.open(path, mode)
+    )
+if zstd:
+    Compressions["zstd"] = (
+        ".xml.zst", lambda path, mode="wb": zstd.open(path, mode)
+    )
+
+# number of bytes buffered before writing them to the file
+ChunkSize = 1024 * 1024
+# number of threads writing files in export_nodes()
+ExportWorkers = 4
+# xml attributes not part of a node content, ignored by store_nodes()
+VolatileAttrs = ("selected", "ns_errorGlow")
+
+
 def get_selection_xml():
     nodes = NodegraphAPI.GetAllSelectedNodes()
     return NodegraphAPI.BuildNodesXmlIO(nodes)
 
 
+def get_nodes(nodes):
+    """
+    Args:
+        nodes(list of (NodegraphAPI.Node or str)): nodes or node names
+
+    Returns:
+        list of NodegraphAPI.Node:
+
+    Raises:
+        ValueError: if some node names can't be found.
+    """
+    output = list()
+    missing = list()
+
+    for knode in nodes:
+        if not hasattr(knode, "getName"):
+            name = knode
+            knode = NodegraphAPI.GetNode(name)
+            if knode is None:
+                missing.append(name)
+                continue
+        output.append(knode)
+
+    if missing:
+        raise ValueError("[get_nodes] Can't find nodes {}".format(missing))
+    return output
+
+
 def print_xml(xml=None):
     xml = xml or get_selection_xml()
     print(xml.writeString())
     return
 
 
-def write_xml(target_dir, target_name, display=False):
+def iter_xml_chunks(element, split_depth=2, depth=0):
+    """
+    Serialize the given XmlIO element as successive strings. Elements above
+    <split_depth> are opened and closed here so only their children are
+    serialized at once.
+
+    With the default <split_depth>, each top-level node of a
+    ``BuildNodesXmlIO()`` result is serialized separately
+    (katana > __SAVE_exportedNodes > nodes).
+
+    Args:
+        element(XmlIO.Element):
+        split_depth(int): number of levels to open.
+        depth(int): current level, for indentation.
+
+    Yields:
+        str: xml of the element
+    """
+    children = element.getChildren()
+
+    if depth >= split_depth or not children:
+        chunk = element.writeString()
+        if not chunk.endswith("\n"):
+            chunk += "\n"
+        yield chunk
+        return
+
+    yield _get_open_tag(element, depth)
+
+    for child in children:
+        for chunk in iter_xml_chunks(child, split_depth, depth + 1):
+            yield chunk
+
+    yield _get_close_tag(element, depth)
+    return
+
+
+def _get_open_tag(element, depth):
+    attrs = "".join(
+        " {}={}".format(name, quoteattr(element.getAttr(name)))
+        for name in element.getAttrNames()
+    )
+    return "{}<{}{}>\n".format("  " * depth, element.getTag(), attrs)
+
+
+def _get_close_tag(element, depth):
+    return "{}</{}>\n".format("  " * depth, element.getTag())
+
+
+def iter_nodes_xml(xml):
+    """
+    Split a ``BuildNodesXmlIO()`` result per top-level node. Each node is
+    only serialized when reached.
+
+    Args:
+        xml(XmlIO.Element): ``<katana><node name="__SAVE_exportedNodes">``
+
+    Yields:
+        tuple(str, list of str): node name, standalone xml of the node.
+    """
+    for group in xml.getChildren():
+        for element in group.getChildren():
+            chunks = [_get_open_tag(xml, 0), _get_open_tag(group, 1)]
+            chunks.extend(iter_xml_chunks(element, split_depth=0))
+            chunks.append(_get_close_tag(group, 1))
+            chunks.append(_get_close_tag(xml, 0))
+            yield element.getAttr("name"), chunks
+    return
+
+
+def get_xml_path(target_dir, target_name, compression=None):
+    """
+    Args:
+        target_dir(str): path to an existing directory
+        target_name(str): name of the file to write without the extension
+        compression(str or None): key of ``Compressions``
+
+    Returns:
+        str: path of the file with the extension for the compression.
+    """
+    if compression not in Compressions:
+        raise ValueError(
+            "[get_xml_path] Unsupported compression <{}>, available: {}"
+            "".format(compression, list(Compressions))
+        )
+    extension = Compressions[compression][0]
+    return os.path.join(target_dir, target_name + extension)
+
+
+def stream_xml(chunks, target_path, compression=None, chunk_size=None):
+    """
+    Write the given xml strings to a file, buffered by <chunk_size> bytes.
+
+    Args:
+        chunks(iterable of str): ex: from ``iter_xml_chunks()``
+        target_path(str): path of the file to write
+        compression(str or None): key of ``Compressions``
+        chunk_size(int or None): default to ``ChunkSize``
+
+    Returns:
+        dict: path, bytes (file size), xml_bytes (uncompressed) and elapsed
+            (seconds).
+    """
+    start = time.time()
+    chunk_size = chunk_size or ChunkSize
+    opener = Compressions[compression][1]
+
+    xml_bytes = 0
+    buffer = list()
+    buffered = 0
+
+    with opener(target_path) as xmlfile:
+
+        for chunk in chunks:
+
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode("utf-8")
+            buffer.append(chunk)
+            buffered += len(chunk)
+
+            if buffered >= chunk_size:
+                xmlfile.write(b"".join(buffer))
+                xml_bytes += buffered
+                buffer = list()
+                buffered = 0
+
+            continue
+
+        xmlfile.write(b"".join(buffer))
+        xml_bytes += buffered
+
+    return {
+        "path": target_path,
+        "bytes": os.path.getsize(target_path),
+        "xml_bytes": xml_bytes,
+        "elapsed": time.time() - start,
+    }
+
+
+def export_nodes(
+        nodes,
+        target_dir,
+        combined_name=None,
+        compression=None,
+        workers=None
+):
+    """
+    Export the given nodes without using the selection.
+
+    The xml of all the nodes is built at once, on the calling thread as
+    Katana's API is not thread-safe, then each node is serialized and its
+    file written by a pool of <workers> threads. At most 2 serialized files
+    per worker are waiting to be written.
+
+    ! A node inside another exported node is only written in its parent file.
+
+    Args:
+        nodes(list of (NodegraphAPI.Node or str)): nodes or node names
+        target_dir(str): path to an existing directory
+        combined_name(str or None):
+            name of the single file to write all the nodes to, without the
+            extension. If None, write one file per node, named like the node.
+        compression(str or None): key of ``Compressions``
+        workers(int or None): number of writing threads, default to
+            ``ExportWorkers``.
+
+    Returns:
+        list of dict: see ``stream_xml()``, in the order the files were queued.
+    """
+    start = time.time()
+    nodes = get_nodes(nodes)
+    xml = NodegraphAPI.BuildNodesXmlIO(nodes)
+
+    if combined_name:
+        stats = [
+            stream_xml(
+                iter_xml_chunks(xml),
+                target_path=get_xml_path(target_dir, combined_name, compression),
+                compression=compression
+            )
+        ]
+
+    else:
+        workers = workers or ExportWorkers
+        # limit the number of captured xml waiting to be written
+        pending = threading.BoundedSemaphore(workers * 2)
+        pool = ThreadPool(workers)
+        results = list()
+
+        def write(chunks, target_path):
+            try:
+                return stream_xml(chunks, target_path, compression)
+            finally:
+                pending.release()
+
+        try:
+            for name, chunks in iter_nodes_xml(xml):
+                pending.acquire()
+                results.append(pool.apply_async(
+                    write,
+                    (chunks, get_xml_path(target_dir, name, compression))
+                ))
+            stats = [result.get() for result in results]
+        finally:
+            pool.close()
+            pool.join()
+
+    print(
+        "[export_nodes] Finished. {} nodes, {} files, {} bytes written to <{}> "
+        "in {:.3f}s".format(
+            len(nodes),
+            len(stats),
+            sum(stat["bytes"] for stat in stats),
+            target_dir,
+            time.time() - start,
+        )
+    )
+    return stats
+
+
+def canonicalize_node_xml(xml, volatile_attrs=None):
+    """
+    Get the form of a node xml used to hash it, so the same node content always
+    give the same bytes. Only used as a key, the original xml is what's stored.
+
+    Katana already writes the attributes in a fixed order so only the volatile
+    attributes (like the node selection state) are removed. As quotes are
+    escaped in attribute values, the pattern can't match inside a value.
+
+    Args:
+        xml(str): a <node> of a ``BuildNodesXmlIO()`` result, serialized with
+            ``writeString()``
+        volatile_attrs(tuple of str or None): default to ``VolatileAttrs``
+
+    Returns:
+        bytes: utf-8 encoded xml
+    """
+    volatile_attrs = VolatileAttrs if volatile_attrs is None else volatile_attrs
+
+    if volatile_attrs:
+        xml = re.sub(
+            r'\s(?:{})="[^"]*"'.format("|".join(volatile_attrs)), "", xml
+        )
+    if not isinstance(xml, bytes):
+        xml = xml.encode("utf-8")
+    return xml
+
+
+def get_blob_path(store_dir, digest, compression=None):
+    """
+    Args:
+        store_dir(str): root directory of the store
+        digest(str): sha256 hexdigest of the canonical node xml
+        compression(str or None): key of ``Compressions``
+
+    Returns:
+        str: ``<store_dir>/objects/<digest[:2]>/<digest><extension>``
+    """
+    return get_xml_path(
+        os.path.join(store_dir, "objects", digest[:2]),
+        digest,
+        compression
+    )
+
+
+def write_atomic(chunks, target_path, compression=None):
+    """
+    Write to a temporary file next to <target_path> then rename it, so
+    <target_path> is never left half-written.
+
+    Returns:
+        dict: see ``stream_xml()``
+    """
+    temp_path = "{}.{}.tmp".format(target_path, os.getpid())
+    try:
+        stats = stream_xml(chunks, temp_path, compression)
+        replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    stats["path"] = target_path
+    return stats
+
+
+def store_nodes(nodes, store_dir, manifest_name, compression=None):
+    """
+    Export the given nodes to a content-addressed store, without using the
+    selection.
+
+    Each top-level node is hashed from its canonical form (see
+    ``canonicalize_node_xml()``). Its original xml is only written if the
+    store doesn't have this hash yet, so re-exporting unchanged nodes write
+    nothing except the manifest. As a consequence, a node whose volatile
+    attributes are the only change is restored with the ones of the first
+    stored version.
+
+    Store layout::
+
+        <store_dir>/objects/ab/ab12...ef.xml   one blob per node version
+        <store_dir>/manifests/<manifest_name>.json
+
+    The manifest contains the hash of each node, in export order, and the
+    stats of the export. Use ``restore_manifest()`` to rebuild a xml file
+    Katana can load.
+
+    Args:
+        nodes(list of (NodegraphAPI.Node or str)): nodes or node names
+        store_dir(str): root directory of the store, created if needed.
+        manifest_name(str): name of the manifest without the extension.
+            An existing manifest with the same name is overwritten.
+        compression(str or None): key of ``Compressions`` used for new blobs.
+
+    Returns:
+        dict: the manifest
+    """
+    start = time.time()
+    get_xml_path(store_dir, manifest_name, compression)  # check compression
+
+    nodes = get_nodes(nodes)
+    xml = NodegraphAPI.BuildNodesXmlIO(nodes)
+
+    manifest = OrderedDict()
+    manifest["root"] = OrderedDict()
+    manifest["group"] = OrderedDict()
+    manifest["compression"] = compression
+    manifest["nodes"] = OrderedDict()
+    stats = {"nodes": 0, "new": 0, "reused": 0, "bytes": 0, "xml_bytes": 0}
+
+    for name in xml.getAttrNames():
+        manifest["root"][name] = xml.getAttr(name)
+
+    for group in xml.getChildren():
+
+        for name in group.getAttrNames():
+            manifest["group"][name] = group.getAttr(name)
+
+        for element in group.getChildren():
+
+            node_xml = element.writeString()
+            digest = hashlib.sha256(canonicalize_node_xml(node_xml)).hexdigest()
+            manifest["nodes"][element.getAttr("name")] = digest
+            stats["nodes"] += 1
+
+            blob_path = get_blob_path(store_dir, digest, compression)
+            if os.path.exists(blob_path):
+                stats["reused"] += 1
+                continue
+
+            blob_dir = os.path.dirname(blob_path)
+            if not os.path.isdir(blob_dir):
+                os.makedirs(blob_dir)
+
+            blob_stats = write_atomic([node_xml], blob_path, compression)
+            stats["new"] += 1
+            stats["bytes"] += blob_stats["bytes"]
+            stats["xml_bytes"] += blob_stats["xml_bytes"]
+
+    manifest_dir = os.path.join(store_dir, "manifests")
+    if not os.path.isdir(manifest_dir):
+        os.makedirs(manifest_dir)
+
+    stats["elapsed"] = time.time() - start
+    manifest["stats"] = stats
+    write_atomic(
+        [json.dumps(manifest, indent=2)],
+        os.path.join(manifest_dir, manifest_name + ".json"),
+    )
+
+    print(
+        "[store_nodes] Finished. {} nodes, {} new blobs ({} bytes), {} reused, "
+        "manifest <{}> in {:.3f}s".format(
+            stats["nodes"],
+            stats["new"],
+            stats["bytes"],
+            stats["reused"],
+            manifest_name,
+            stats["elapsed"],
+        )
+    )
+    return manifest
+
+
+def restore_manifest(store_dir, manifest_name, target_path, compression=None):
+    """
+    Write a xml file of all the nodes of a manifest, as exported by
+    ``write_xml()``.
+
+    Args:
+        store_dir(str): root directory of the store
+        manifest_name(str): name of the manifest without the extension
+        target_path(str): path of the file to write
+        compression(str or None): key of ``Compressions`` for <target_path>
+
+    Returns:
+        dict: see ``stream_xml()``
+    """
+    manifest_path = os.path.join(
+        store_dir, "manifests", manifest_name + ".json"
+    )
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file, object_pairs_hook=OrderedDict)
+
+    blob_compression = manifest["compression"]
+
+    def iter_chunks():
+
+        for depth, (tag, attrs) in enumerate(
+                (("katana", manifest["root"]), ("node", manifest["group"]))
+        ):
+            yield "{}<{}{}>\n".format(
+                "  " * depth,
+                tag,
+                "".join(
+                    " {}={}".format(name, quoteattr(value))
+                    for name, value in attrs.items()
+                )
+            )
+
+        for digest in manifest["nodes"].values():
+            blob_path = get_blob_path(store_dir, digest, blob_compression)
+            with Compressions[blob_compression][1](blob_path, "rb") as blob:
+                yield blob.read() + b"\n"
+
+        yield "  </node>\n"
+        yield "</katana>\n"
+
+    return write_atomic(iter_chunks(), target_path, compression)
+
+
+def write_xml(target_dir, target_name, display=False, compression=None):
     """
 
     Args:
         target_dir(str): path to an existing directory
         target_name(str): name of the file to write without the extension
         display(bool): True to also print the xml file
+        compression(str or None):
+            key of ``Compressions``, the extension is added to the file name.
+
+    Returns:
+        dict: see ``stream_xml()``
     """
 
-    target_path = os.path.join(target_dir, "{}.xml".format(target_name))
+    target_path = get_xml_path(target_dir, target_name, compression)
 
     xml = get_selection_xml()
 
     if display:
         print_xml(xml)
 
-    xml.write(
-        file=target_path,
-        outputStyles=None
+    stats = stream_xml(
+        iter_xml_chunks(xml),
+        target_path=target_path,
+        compression=compression
     )
 
-    print("[write_xml] Finished. XML written to <{}>".format(target_path))
-    return
+    print(
+        "[write_xml] Finished. {} bytes ({} uncompressed) written to <{}> in "
+        "{:.3f}s".format(
+            stats["bytes"], stats["xml_bytes"], target_path, stats["elapsed"]
+        )
+    )
+    return stats
+
 
+if __name__ == "__main__" or __name__ == "__builtin__":
 
-WRITE = 0
-print_xml()
-if WRITE:
-    write_xml(
-        target_dir=r"G:\personal\code\KUI\workspace\v0001\KUI",
-        target_name="KUI_Nodes"
-    )
\ No newline at end of file
+    PRINT = 0
+    WRITE = 0
+    EXPORT = 0
+    STORE = 0
+    if PRINT:
+        print_xml()
+    if WRITE:
+        write_xml(
+            target_dir=r"G:\personal\code\KUI\workspace\v0001\KUI",
+            target_name="KUI_Nodes",
+            compression=None
+        )
+    if EXPORT:
+        export_nodes(
+            nodes=["KUI_Setup", "KUI_Instancing"],
+            target_dir=r"G:\personal\code\KUI\workspace\v0001\KUI",
+            combined_name=None,
+            compression=None
+        )
+    if STORE:
+        store_nodes(
+            nodes=["KUI_Setup", "KUI_Instancing"],
+            store_dir=r"G:\personal\code\KUI\workspace\store",
+            manifest_name="KUI_Nodes",
+            compression="gzip"
+        )
@@ -0,0 +1,100 @@
+"""
+python>3
+
+Check the code node2xml.button.py copies from node2xml.py is kept identical,
+and that node2xml.exporter.xml embeds the current node2xml.button.py.
+"""
+import ast
+import os
+import re
+from xml.sax.saxutils import unescape
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# top-level names node2xml.button.py copies from node2xml.py
+SharedNames = [
+    "replace",
+    "Compressions",
+    "ChunkSize",
+    "iter_xml_chunks",
+    "_get_open_tag",
+    "_get_close_tag",
+    "stream_xml",
+]
+
+
+def get_definitions(path):
+    """
+    Args:
+        path(str): path to a python file
+
+    Returns:
+        dict: {top-level name: list of ast dump of the statements defining it}
+    """
+    with open(path) as pyfile:
+        tree = ast.parse(pyfile.read())
+
+    definitions = dict()
+    for statement in tree.body:
+
+        names = set()
+        if isinstance(statement, (ast.FunctionDef, ast.ClassDef)):
+            names.add(statement.name)
+        else:
+            for node in ast.walk(statement):
+                if isinstance(node, ast.FunctionDef):
+                    names.add(node.name)
+                elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                    names.add(node.id)
+                elif isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store):
+                    names.add(node.value.id)
+
+        for name in names:
+            definitions.setdefault(name, []).append(ast.dump(statement))
+
+    return definitions
+
+
+def test01():
+    """
+    test the button copies of node2xml.py code are identical.
+    """
+    module = get_definitions(os.path.join(ROOT, "node2xml.py"))
+    button = get_definitions(os.path.join(ROOT, "node2xml.button.py"))
+
+    for name in SharedNames:
+        assert name in module, name
+        assert button.get(name) == module[name], (
+            "<{}> differs between node2xml.py and node2xml.button.py".format(name)
+        )
+
+    print("[test01] Finished")
+    return
+
+
+def test02():
+    """
+    test the exporter buttons run the current node2xml.button.py.
+    """
+    with open(os.path.join(ROOT, "node2xml.button.py")) as buttonfile:
+        script = buttonfile.read()
+    with open(os.path.join(ROOT, "node2xml.exporter.xml")) as xmlfile:
+        xml = xmlfile.read()
+
+    buttons = re.findall(r'<string_parameter hints="([^"]*scriptButton[^"]*)" name="(\w+)"', xml)
+    assert sorted(name for _, name in buttons) == ["export", "print"], buttons
+
+    for hints, name in buttons:
+        hints = ast.literal_eval(unescape(hints, {"&quot;": '"', "&apos;": "'"}))
+        assert hints["scriptText"] == script, (
+            "<{}> button script is not node2xml.button.py".format(name)
+        )
+
+    print("[test02] Finished")
+    return
+
+
+if __name__ == '__main__':
+
+    test01()
+    test02()
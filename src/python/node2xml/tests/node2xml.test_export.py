@@ -0,0 +1,226 @@
+"""
+python>3
+
+Export and store nodes made with the stand-in NodegraphAPI from
+standin_katana.py
+"""
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import standin_katana as standin
+
+standin.install()
+
+import node2xml
+
+NodeNames = ["lighting_rig", "lookdev_assign", "render_settings"]
+
+
+def _create_scene():
+    """
+    Returns:
+        list of standin.Node:
+    """
+    standin.reset()
+    return [
+        standin.create_node(
+            name,
+            params=[("p{}".format(index), "<{}> & \"{}\"".format(name, index)) for index in range(20)],
+        )
+        for name in NodeNames
+    ]
+
+
+def _get_node_names(path):
+    """
+    Args:
+        path(str): path to a xml file, can be gzip compressed.
+
+    Returns:
+        list of str: names of the top-level nodes exported in the file.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as xmlfile:
+        root = ElementTree.parse(xmlfile).getroot()
+    assert root.tag == "katana", root.tag
+    group, = root
+    assert group.get("name") == "__SAVE_exportedNodes", group.attrib
+    return [node.get("name") for node in group]
+
+
+def test01():
+    """
+    test exporting one file per node, a combined file and missing nodes.
+    """
+    target_dir = tempfile.mkdtemp()
+    try:
+        nodes = _create_scene()
+
+        # nodes and names can be mixed
+        stats = node2xml.export_nodes(
+            [nodes[0], "lookdev_assign", "render_settings"],
+            target_dir,
+            workers=2
+        )
+        assert [os.path.basename(stat["path"]) for stat in stats] == [
+            name + ".xml" for name in NodeNames
+        ], stats
+        for name in NodeNames:
+            path = os.path.join(target_dir, name + ".xml")
+            assert _get_node_names(path) == [name], path
+            assert os.path.getsize(path) == stats[NodeNames.index(name)]["bytes"]
+        assert standin.CALLS["BuildNodesXmlIO"] == 1, standin.CALLS
+
+        stats = node2xml.export_nodes(
+            NodeNames, target_dir, combined_name="all", compression="gzip"
+        )
+        assert len(stats) == 1, stats
+        assert stats[0]["path"] == os.path.join(target_dir, "all.xml.gz"), stats
+        assert _get_node_names(stats[0]["path"]) == NodeNames
+
+        # the combined file has the same nodes as the separated ones
+        with gzip.open(stats[0]["path"], "rb") as xmlfile:
+            combined = ElementTree.parse(xmlfile).getroot()
+        for node in combined[0]:
+            path = os.path.join(target_dir, node.get("name") + ".xml")
+            separated = ElementTree.parse(path).getroot()[0][0]
+            # only the whitespace after the element differs
+            separated.tail = node.tail = None
+            assert ElementTree.tostring(separated) == ElementTree.tostring(node)
+
+        # nothing is written if a node is missing
+        shutil.rmtree(target_dir)
+        os.mkdir(target_dir)
+        try:
+            node2xml.export_nodes(["lighting_rig", "missing", "gone"], target_dir)
+        except ValueError as excp:
+            assert "missing" in str(excp) and "gone" in str(excp), excp
+        else:
+            raise AssertionError("missing nodes should raise a ValueError")
+        assert not os.listdir(target_dir), os.listdir(target_dir)
+
+    finally:
+        shutil.rmtree(target_dir)
+
+    print("[test01] Finished")
+    return
+
+
+def test02():
+    """
+    test the canonical xml of a node doesn't depend on its selection.
+    """
+    node, = _create_scene()[:1]
+    node.params["note"] = 'selected="true"'
+
+    canonical = node2xml.canonicalize_node_xml(node.to_xml().writeString())
+    assert isinstance(canonical, bytes), type(canonical)
+    assert b" selected=" not in canonical and b"ns_errorGlow" not in canonical, canonical
+    # values are escaped so never matched
+    assert b'value="selected=&quot;true&quot;"' in canonical, canonical
+
+    node.selected = True
+    node.error_glow = 1.0
+    assert node2xml.canonicalize_node_xml(node.to_xml().writeString()) == canonical
+
+    # volatile attributes can be kept
+    assert b' selected="true"' in node2xml.canonicalize_node_xml(
+        node.to_xml().writeString(), volatile_attrs=()
+    )
+
+    print("[test02] Finished")
+    return
+
+
+def _list_blobs(store_dir):
+    return sorted(
+        filename
+        for _, _, filenames in os.walk(os.path.join(store_dir, "objects"))
+        for filename in filenames
+    )
+
+
+def test03():
+    """
+    test storing nodes only write the changed ones, and restoring a manifest.
+    """
+    store_dir = tempfile.mkdtemp()
+    try:
+        nodes = _create_scene()
+
+        manifest = node2xml.store_nodes(NodeNames, store_dir, "v001", compression="gzip")
+        assert list(manifest["nodes"]) == NodeNames, manifest["nodes"]
+        stats = manifest["stats"]
+        assert (stats["nodes"], stats["new"], stats["reused"]) == (3, 3, 0), stats
+        blobs = _list_blobs(store_dir)
+        assert len(blobs) == 3, blobs
+        assert all(blob.endswith(".xml.gz") for blob in blobs), blobs
+
+        # selection only change: nothing new is written
+        nodes[1].selected = True
+        nodes[2].error_glow = 1.0
+        manifest2 = node2xml.store_nodes(NodeNames, store_dir, "v002", compression="gzip")
+        stats = manifest2["stats"]
+        assert (stats["nodes"], stats["new"], stats["reused"], stats["bytes"]) == (3, 0, 3, 0), stats
+        assert manifest2["nodes"] == manifest["nodes"]
+        assert _list_blobs(store_dir) == blobs
+
+        # only the edited node is written
+        nodes[1].params["p0"] = "edited"
+        manifest3 = node2xml.store_nodes(NodeNames, store_dir, "v003", compression="gzip")
+        stats = manifest3["stats"]
+        assert (stats["nodes"], stats["new"], stats["reused"]) == (3, 1, 2), stats
+        assert manifest3["nodes"]["lookdev_assign"] != manifest["nodes"]["lookdev_assign"]
+        assert len(_list_blobs(store_dir)) == 4
+
+        with open(os.path.join(store_dir, "manifests", "v003.json")) as manifest_file:
+            assert json.load(manifest_file)["nodes"] == manifest3["nodes"]
+
+        # restore
+        target_path = os.path.join(store_dir, "v001.xml")
+        node2xml.restore_manifest(store_dir, "v001", target_path)
+        assert _get_node_names(target_path) == NodeNames
+        restored = ElementTree.parse(target_path).getroot()
+        assert restored.attrib == {"release": "4.5v1", "version": "4.5.1.000008"}, restored.attrib
+        lookdev = restored[0][1]
+        # the original xml is stored, volatile attributes included
+        assert lookdev.attrib["selected"] == "false", lookdev.attrib
+        assert lookdev.attrib["ns_errorGlow"] == "0.0", lookdev.attrib
+        assert lookdev[1][0].attrib == {"name": "p0", "value": '<lookdev_assign> & "0"'}
+
+        target_path = os.path.join(store_dir, "v003.xml.gz")
+        node2xml.restore_manifest(store_dir, "v003", target_path, compression="gzip")
+        with gzip.open(target_path, "rb") as xmlfile:
+            lookdev = ElementTree.parse(xmlfile).getroot()[0][1]
+        assert lookdev[1][0].attrib == {"name": "p0", "value": "edited"}
+        assert lookdev.attrib["selected"] == "true", lookdev.attrib
+
+        # nothing is written if a node is missing
+        try:
+            node2xml.store_nodes(NodeNames + ["missing"], store_dir, "v004")
+        except ValueError as excp:
+            assert "missing" in str(excp), excp
+        else:
+            raise AssertionError("missing nodes should raise a ValueError")
+        assert not os.path.exists(os.path.join(store_dir, "manifests", "v004.json"))
+        assert len(_list_blobs(store_dir)) == 4
+
+    finally:
+        shutil.rmtree(store_dir)
+
+    print("[test03] Finished")
+    return
+
+
+if __name__ == '__main__':
+
+    test01()
+    test02()
+    test03()
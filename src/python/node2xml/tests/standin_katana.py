@@ -0,0 +1,158 @@
+"""
+python>3
+
+Stand-in for Katana's ``NodegraphAPI`` and its ``XmlIO`` elements, only
+implementing what node2xml use. Allow to run node2xml outside Katana.
+
+Use ``install()`` before importing node2xml so ``from Katana import
+NodegraphAPI`` resolve to this module.
+"""
+import collections
+import sys
+import types
+from xml.sax.saxutils import quoteattr
+
+CALLS = collections.Counter()
+
+_NODES = collections.OrderedDict()  # type: dict[str, Node]
+
+
+class Element(object):
+    """
+    Stand-in for ``XmlIO.Element``, attributes are written in insertion order
+    and always double-quoted like Katana does.
+    """
+
+    def __init__(self, tag, attrs=None, children=None):
+        self.tag = tag
+        self.attrs = collections.OrderedDict(attrs or ())
+        self.children = list(children or ())
+
+    def getTag(self):
+        return self.tag
+
+    def getChildren(self):
+        return list(self.children)
+
+    def getAttrNames(self):
+        return list(self.attrs)
+
+    def getAttr(self, name):
+        return self.attrs[name]
+
+    def writeString(self, depth=0):
+        CALLS["Element.writeString"] += 1
+        indent = "  " * depth
+        attrs = "".join(
+            " {}={}".format(name, quoteattr(value, {'"': "&quot;"}))
+            for name, value in self.attrs.items()
+        )
+        if not self.children:
+            return "{}<{}{}/>\n".format(indent, self.tag, attrs)
+        return "{}<{}{}>\n{}{}</{}>\n".format(
+            indent,
+            self.tag,
+            attrs,
+            "".join(child.writeString(depth + 1) for child in self.children),
+            indent,
+            self.tag,
+        )
+
+
+class Node(object):
+
+    def __init__(self, name, params=None, selected=False):
+        self.name = name
+        self.params = collections.OrderedDict(params or ())
+        self.selected = selected
+        self.error_glow = 0.0
+
+    def getName(self):
+        return self.name
+
+    def to_xml(self):
+        """
+        Returns:
+            Element: like the node is written by ``BuildNodesXmlIO()``
+        """
+        parameters = [
+            Element("string_parameter", [("name", name), ("value", value)])
+            for name, value in self.params.items()
+        ]
+        return Element(
+            "node",
+            [
+                ("name", self.name),
+                ("ns_errorGlow", str(self.error_glow)),
+                ("selected", "true" if self.selected else "false"),
+                ("type", "Group"),
+                ("x", "0.0"),
+                ("y", "0.0"),
+            ],
+            [
+                Element("port", [("name", "out"), ("type", "out")]),
+                Element("group_parameter", [("name", self.name)], parameters),
+            ]
+        )
+
+
+def GetNode(name):
+    CALLS["GetNode"] += 1
+    return _NODES.get(name)
+
+
+def GetAllSelectedNodes():
+    CALLS["GetAllSelectedNodes"] += 1
+    return [node for node in _NODES.values() if node.selected]
+
+
+def BuildNodesXmlIO(nodes):
+    CALLS["BuildNodesXmlIO"] += 1
+    return Element(
+        "katana",
+        [("release", "4.5v1"), ("version", "4.5.1.000008")],
+        [
+            Element(
+                "node",
+                [("name", "__SAVE_exportedNodes"), ("type", "Group")],
+                [node.to_xml() for node in nodes]
+            )
+        ]
+    )
+
+
+def install():
+    """
+    Register a ``Katana`` module with this module as ``NodegraphAPI`` in
+    ``sys.modules``.
+    """
+    katana = types.ModuleType("Katana")
+    katana.NodegraphAPI = sys.modules[__name__]
+    sys.modules["Katana"] = katana
+    return
+
+
+def reset():
+    """
+    Remove all the nodes from the scene and reset the call counter.
+    """
+    _NODES.clear()
+    CALLS.clear()
+    return
+
+
+def create_node(name, params=None, selected=False):
+    """
+    Add a node to the scene.
+
+    Args:
+        name(str):
+        params(dict or None): {parameter name: string value}
+        selected(bool):
+
+    Returns:
+        Node:
+    """
+    node = Node(name, params=params, selected=selected)
+    _NODES[name] = node
+    return node